@@ -0,0 +1,240 @@
+import os
+from datetime import date, timedelta
+
+from helpers.db import get_conn
+
+# =========================
+# ARSIP attendance_raw PER BULAN
+# Raw yang sudah processed (1 dipakai / 2 tidak dipakai) dan lebih tua
+# dari horizon dipindah ke attendance_raw_YYYY_MM. Daftar partisi ada di
+# attendance_raw_archive.
+# =========================
+
+# umur raw (hari) yang tetap di tabel utama
+ARCHIVE_HORIZON_DAYS = int(os.environ.get("ATTENDANCE_ARCHIVE_DAYS") or 90)
+
+RAW_COLUMNS = (
+    "id", "tanggal", "waktu", "fingerprint_id", "no_id",
+    "tipe_scan", "status_absen", "sumber", "created_at", "processed",
+)
+
+HOT_TABLE = "attendance_raw"
+
+# baris per query cek duplikat arsip (4 variabel SQLite per baris)
+CHUNK = 200
+
+
+def archive_table(bulan):
+    """'2026-04' -> 'attendance_raw_2026_04'."""
+    tahun, bln = str(bulan).split("-")[:2]
+    return f"attendance_raw_{int(tahun):04d}_{int(bln):02d}"
+
+
+def _bulan_berikut(bulan):
+    tahun, bln = (int(x) for x in bulan.split("-"))
+    if bln == 12:
+        return f"{tahun + 1:04d}-01-01"
+    return f"{tahun:04d}-{bln + 1:02d}-01"
+
+
+def ensure_archive_table(conn, bulan):
+    nama = archive_table(bulan)
+
+    conn.executescript(f"""
+        CREATE TABLE IF NOT EXISTS {nama} (
+            id INTEGER PRIMARY KEY,
+            tanggal DATE,
+            waktu DATETIME,
+            fingerprint_id TEXT,
+            no_id TEXT,
+            tipe_scan INTEGER,
+            status_absen TEXT,
+            sumber TEXT,
+            created_at DATETIME,
+            processed INTEGER DEFAULT 1
+        );
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_{nama}_unique
+        ON {nama} (fingerprint_id, tanggal, waktu);
+        CREATE INDEX IF NOT EXISTS idx_{nama}_sumber
+        ON {nama} (sumber, tanggal, waktu);
+    """)
+
+    return nama
+
+
+def archived_months(conn):
+    """[(bulan, nama_tabel)] urut bulan naik."""
+    try:
+        return [
+            (r["bulan"], r["nama_tabel"])
+            for r in conn.execute("""
+                SELECT bulan, nama_tabel
+                FROM attendance_raw_archive
+                ORDER BY bulan
+            """).fetchall()
+        ]
+    except Exception:
+        # DB lama tanpa tabel arsip
+        return []
+
+
+def raw_tables(conn, dates=None):
+    """
+    Tabel raw yang perlu dibaca untuk daftar tanggal (None = semua).
+    Tabel utama selalu ikut: raw lama yang belum processed tidak diarsip.
+    """
+    tables = [HOT_TABLE]
+
+    if dates is not None:
+        bulan = {str(d)[:7] for d in dates if d}
+
+    for b, nama in archived_months(conn):
+        if dates is None or b in bulan:
+            tables.append(nama)
+
+    return tables
+
+
+def raw_scans(conn, tanggal_awal, tanggal_akhir):
+    """
+    Scan (fingerprint_id, tanggal, waktu) di rentang tanggal, dari tabel
+    utama + arsip. Untuk proses ulang lewat process_attendance(scans=...):
+    reset processed = 0 hanya sampai ke tabel utama.
+    """
+    awal = date.fromisoformat(tanggal_awal)
+    akhir = date.fromisoformat(tanggal_akhir)
+    dates = [
+        (awal + timedelta(days=i)).isoformat()
+        for i in range((akhir - awal).days + 1)
+    ]
+
+    scans = []
+    for table in raw_tables(conn, dates):
+        scans.extend(
+            (r["fingerprint_id"], r["tanggal"], r["waktu"])
+            for r in conn.execute(f"""
+                SELECT fingerprint_id, tanggal, waktu
+                FROM {table}
+                WHERE tanggal BETWEEN ? AND ?
+                  AND fingerprint_id IS NOT NULL
+            """, (tanggal_awal, tanggal_akhir)).fetchall()
+        )
+
+    return scans
+
+
+def archived_duplicates(conn, rows):
+    """
+    Dari baris (tanggal, waktu, fingerprint_id, ...) yang tanggalnya sudah
+    masuk bulan arsip, return set index baris yang sudah ada di arsip.
+    1 query per bulan arsip (per CHUNK baris), bukan per baris.
+    """
+    months = dict(archived_months(conn))
+    if not months:
+        return set()
+
+    per_tabel = {}
+    for i, row in enumerate(rows):
+        nama = months.get(str(row[0])[:7])
+        if nama:
+            per_tabel.setdefault(nama, []).append((i, row[2], row[0], row[1]))
+
+    duplikat = set()
+    for nama, keys in per_tabel.items():
+        for awal in range(0, len(keys), CHUNK):
+            part = keys[awal:awal + CHUNK]
+            values = ",".join("(?, ?, ?, ?)" for _ in part)
+            params = [x for key in part for x in key]
+
+            duplikat.update(
+                r[0]
+                for r in conn.execute(f"""
+                    WITH k(idx, fingerprint_id, tanggal, waktu) AS (VALUES {values})
+                    SELECT k.idx
+                    FROM k
+                    JOIN {nama} a
+                        ON a.fingerprint_id = k.fingerprint_id
+                       AND a.tanggal = k.tanggal
+                       AND a.waktu = k.waktu
+                """, params).fetchall()
+            )
+
+    return duplikat
+
+
+def archive_attendance_raw(horizon_days=None, today=None):
+    """
+    Pindahkan raw processed (1 / 2) dengan tanggal < hari ini - horizon ke tabel
+    arsip bulanan. 1 transaksi per bulan. Return jumlah baris dipindah.
+    """
+    if horizon_days is None:
+        horizon_days = ARCHIVE_HORIZON_DAYS
+
+    batas = ((today or date.today()) - timedelta(days=horizon_days)).isoformat()
+    kolom = ", ".join(RAW_COLUMNS)
+
+    db = get_conn()
+    total = 0
+
+    try:
+        months = [
+            r["bulan"]
+            for r in db.execute("""
+                SELECT DISTINCT substr(tanggal, 1, 7) AS bulan
+                FROM attendance_raw
+                WHERE processed IN (1, 2)
+                  AND tanggal < ?
+                ORDER BY bulan
+            """, (batas,)).fetchall()
+            if r["bulan"]
+        ]
+
+        for bulan in months:
+            awal = f"{bulan}-01"
+            sampai = min(batas, _bulan_berikut(bulan))
+
+            nama = ensure_archive_table(db, bulan)
+
+            db.execute("BEGIN IMMEDIATE")
+            try:
+                db.execute(f"""
+                    INSERT OR IGNORE INTO {nama} ({kolom})
+                    SELECT {kolom}
+                    FROM attendance_raw
+                    WHERE processed IN (1, 2)
+                      AND tanggal >= ?
+                      AND tanggal < ?
+                """, (awal, sampai))
+
+                moved = db.execute("""
+                    DELETE FROM attendance_raw
+                    WHERE processed IN (1, 2)
+                      AND tanggal >= ?
+                      AND tanggal < ?
+                """, (awal, sampai)).rowcount
+
+                db.execute("""
+                    INSERT INTO attendance_raw_archive (bulan, nama_tabel, sampai, jumlah)
+                    VALUES (?, ?, ?, ?)
+                    ON CONFLICT(bulan) DO UPDATE SET
+                        sampai = MAX(sampai, excluded.sampai),
+                        jumlah = jumlah + excluded.jumlah,
+                        updated_at = CURRENT_TIMESTAMP
+                """, (bulan, nama, sampai, moved))
+
+                db.commit()
+            except Exception:
+                db.rollback()
+                raise
+
+            total += moved
+            print(f"📦 Arsip raw {bulan}: {moved} baris → {nama}")
+
+    finally:
+        db.close()
+
+    return total
+
+
+if __name__ == "__main__":
+    archive_attendance_raw()
@@ -0,0 +1,161 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from zk import ZK
+from helpers.db import get_conn
+from .ingest import RawScanWriter
+from .listener import get_last_scan, sync_device
+
+# jumlah mesin yang boleh connect / download full log bersamaan
+MAX_CONCURRENT = 4
+
+# reconnect: 5, 10, 20, ... maksimal 5 menit
+BACKOFF_AWAL = 5
+BACKOFF_MAX = 300
+
+
+def load_devices():
+    db = get_conn()
+    try:
+        return [
+            dict(r)
+            for r in db.execute("""
+                SELECT *
+                FROM attendance_devices
+                WHERE aktif = 1
+                ORDER BY id
+            """).fetchall()
+        ]
+    finally:
+        db.close()
+
+
+def connect_device(device):
+    zk = ZK(
+        device["ip"],
+        port=device["port"],
+        timeout=device["timeout"],
+        password=device["password"],
+        force_udp=bool(device["force_udp"])
+    )
+    return zk.connect()
+
+
+# =========================
+# WRITER BERSAMA
+# =========================
+async def raw_writer(scan_queue, on_scans=None):
+    writer = RawScanWriter(on_scans=on_scans, auto_flush=False)
+
+    while True:
+        try:
+            att, sumber = await asyncio.wait_for(
+                scan_queue.get(),
+                writer.time_left()
+            )
+            writer.add_attendance(att, sumber)
+        except asyncio.TimeoutError:
+            pass
+
+        if not writer.should_flush():
+            continue
+
+        try:
+            hasil = await asyncio.to_thread(writer.flush)
+        except Exception as e:
+            print("❌ Gagal simpan raw:", e)
+            continue
+
+        print(f"✅ RAW: {hasil['inserted']} baru, {hasil['duplicate']} duplikat")
+
+
+# =========================
+# 1 TASK PER MESIN
+# sync live event / counter jalan di thread sendiri (listener.sync_device)
+# =========================
+def connect_locked(device, io_lock):
+    with io_lock:
+        return connect_device(device)
+
+
+async def collect_device(device, io_lock, scan_queue, executor, stop):
+    loop = asyncio.get_running_loop()
+    nama = device["nama"]
+    sumber = device["sumber"]
+    gagal = 0
+
+    def emit(att):
+        # dari thread mesin ke writer bersama
+        loop.call_soon_threadsafe(scan_queue.put_nowait, (att, sumber))
+
+    while not stop.is_set():
+        conn = None
+
+        try:
+            conn = await loop.run_in_executor(executor, connect_locked, device, io_lock)
+            print(f"✅ [{nama}] Connected {device['ip']}:{device['port']}")
+            gagal = 0
+
+            last_scan = await loop.run_in_executor(executor, get_last_scan, sumber)
+
+            await loop.run_in_executor(
+                executor, sync_device, conn, last_scan, emit, io_lock, stop
+            )
+
+        except asyncio.CancelledError:
+            stop.set()
+            raise
+
+        except Exception as e:
+            gagal += 1
+            delay = min(BACKOFF_MAX, BACKOFF_AWAL * 2 ** (gagal - 1))
+            print(f"❌ [{nama}] {e} — reconnect {delay} detik lagi")
+            await asyncio.sleep(delay)
+
+        finally:
+            if conn:
+                try:
+                    await loop.run_in_executor(executor, conn.disconnect)
+                except Exception:
+                    pass
+
+
+async def run_collector(on_scans=None):
+    devices = load_devices()
+
+    if not devices:
+        print("Tidak ada mesin absensi aktif")
+        return
+
+    io_lock = threading.BoundedSemaphore(MAX_CONCURRENT)
+    stop = threading.Event()
+    scan_queue = asyncio.Queue()
+
+    # 1 thread per mesin (sync_device blocking selama koneksi hidup)
+    executor = ThreadPoolExecutor(
+        max_workers=len(devices),
+        thread_name_prefix="absensi-mesin"
+    )
+
+    tasks = [asyncio.create_task(raw_writer(scan_queue, on_scans))]
+    tasks += [
+        asyncio.create_task(collect_device(device, io_lock, scan_queue, executor, stop))
+        for device in devices
+    ]
+
+    print(f"🚀 Collector jalan: {len(devices)} mesin")
+
+    try:
+        await asyncio.gather(*tasks)
+    finally:
+        stop.set()
+        executor.shutdown(wait=False)
+
+
+def start_collector(on_scans=None):
+    asyncio.run(run_collector(on_scans))
+
+
+if __name__ == "__main__":
+    start_collector()
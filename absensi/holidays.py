@@ -0,0 +1,109 @@
+import threading
+import time
+from datetime import datetime
+
+from helpers.db import get_conn
+
+# versi hari_libur dicek ulang paling cepat tiap N detik
+VERSION_CHECK_INTERVAL = 5
+
+
+def build_day_flags(work_date, is_hari_besar):
+    is_sabtu = False
+    is_minggu = False
+
+    if work_date:
+        try:
+            dt = datetime.strptime(str(work_date), "%Y-%m-%d")
+            is_sabtu = dt.weekday() == 5
+            is_minggu = dt.weekday() == 6
+        except:
+            pass
+
+    return {
+        "is_sabtu": is_sabtu,
+        "is_minggu": is_minggu,
+        "is_hari_besar": is_hari_besar,
+        "is_tanggal_merah": is_minggu or is_hari_besar,
+        "is_hari_khusus_lembur": is_sabtu or is_minggu or is_hari_besar,
+        "insentif_libur_umum": 20000 if (is_minggu or is_hari_besar) else 0
+    }
+
+
+class HolidayCalendar:
+    """
+    Isi hari_libur di memori (set tanggal) + DayFlags per tanggal.
+    Dimuat ulang kalau versi di cache_versions berubah (trigger hari_libur).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._tanggal = None
+        self._flags = {}
+        self._versi = None
+        self._checked_at = 0.0
+
+    def _read_version(self, db):
+        try:
+            row = db.execute("""
+                SELECT versi
+                FROM cache_versions
+                WHERE nama = 'hari_libur'
+            """).fetchone()
+        except Exception:
+            # DB lama tanpa cache_versions: anggap selalu berubah
+            return None
+        return row["versi"] if row else None
+
+    def _refresh(self):
+        now = time.monotonic()
+
+        if self._tanggal is not None and now - self._checked_at < VERSION_CHECK_INTERVAL:
+            return
+
+        db = get_conn()
+        try:
+            versi = self._read_version(db)
+
+            if self._tanggal is None or versi is None or versi != self._versi:
+                self._tanggal = {
+                    str(r["tanggal"])
+                    for r in db.execute("SELECT tanggal FROM hari_libur").fetchall()
+                }
+                self._flags = {}
+                self._versi = versi
+        finally:
+            db.close()
+
+        self._checked_at = now
+
+    def invalidate(self):
+        with self._lock:
+            self._tanggal = None
+            self._flags = {}
+
+    def is_libur(self, work_date):
+        if not work_date:
+            return False
+
+        with self._lock:
+            self._refresh()
+            return str(work_date) in self._tanggal
+
+    def day_flags(self, work_date):
+        """DayFlags (dict) untuk 1 tanggal, jangan diubah pemanggil."""
+        key = str(work_date) if work_date else None
+
+        with self._lock:
+            self._refresh()
+
+            flags = self._flags.get(key)
+            if flags is None:
+                is_hari_besar = bool(work_date) and key in self._tanggal
+                flags = build_day_flags(work_date, is_hari_besar)
+                self._flags[key] = flags
+
+            return flags
+
+
+holiday_calendar = HolidayCalendar()
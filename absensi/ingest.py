@@ -0,0 +1,136 @@
+import time
+from datetime import datetime
+
+from helpers.db import get_conn
+from .archive import archived_duplicates
+
+# flush kalau antrian sudah N scan atau scan tertua sudah X detik
+BATCH_SIZE = 200
+FLUSH_INTERVAL = 1.0
+
+
+class RawScanWriter:
+    """
+    Tampung scan mentah lalu tulis ke attendance_raw per batch
+    (executemany, 1 transaksi). flush() return jumlah baru / duplikat.
+    """
+
+    def __init__(self, batch_size=BATCH_SIZE, flush_interval=FLUSH_INTERVAL,
+                 on_scans=None, auto_flush=True):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.on_scans = on_scans
+        # False: pemanggil yang flush (mis. collector lewat to_thread)
+        self.auto_flush = auto_flush
+
+        self.pending = []
+        self.first_at = None
+
+        self.total_inserted = 0
+        self.total_duplicate = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.flush()
+
+    def add(self, fingerprint_id, waktu, status_absen, sumber, tipe_scan="fingerprint"):
+        """waktu = datetime scan. Return hasil flush kalau batch penuh."""
+        fingerprint_id = str(fingerprint_id or "").strip()
+
+        if not fingerprint_id or not waktu:
+            return None
+
+        if not self.pending:
+            self.first_at = time.monotonic()
+
+        self.pending.append((
+            waktu.strftime("%Y-%m-%d"),
+            waktu.strftime("%H:%M:%S"),
+            fingerprint_id,
+            fingerprint_id,
+            tipe_scan,
+            str(status_absen),
+            sumber
+        ))
+
+        if self.auto_flush and len(self.pending) >= self.batch_size:
+            return self.flush()
+
+        return None
+
+    def add_attendance(self, att, sumber):
+        """Record pyzk (user_id, timestamp, status)."""
+        return self.add(att.user_id, att.timestamp, att.status, sumber)
+
+    def time_left(self):
+        """Detik sampai batas waktu flush, None kalau kosong."""
+        if not self.pending:
+            return None
+        return max(0.0, self.flush_interval - (time.monotonic() - self.first_at))
+
+    def should_flush(self):
+        return bool(self.pending) and (
+            len(self.pending) >= self.batch_size
+            or self.time_left() == 0
+        )
+
+    def flush_if_due(self):
+        if self.should_flush():
+            return self.flush()
+        return None
+
+    def flush(self):
+        rows = semua = self.pending
+        self.pending = []
+        self.first_at = None
+
+        if not rows:
+            return {"inserted": 0, "duplicate": 0}
+
+        created_at = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+        db = get_conn()
+        try:
+            # scan bulan yang sudah diarsip: jangan masuk lagi ke tabel utama
+            lama = archived_duplicates(db, rows)
+            if lama:
+                rows = [r for i, r in enumerate(rows) if i not in lama]
+
+            before = db.total_changes
+            db.executemany("""
+                INSERT OR IGNORE INTO attendance_raw
+                (
+                    tanggal,
+                    waktu,
+                    fingerprint_id,
+                    no_id,
+                    tipe_scan,
+                    status_absen,
+                    sumber,
+                    created_at
+                )
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            """, [row + (created_at,) for row in rows])
+            db.commit()
+            inserted = db.total_changes - before
+        except Exception:
+            # batch gagal: kembalikan ke antrian untuk flush berikutnya
+            self.pending = semua + self.pending
+            self.first_at = time.monotonic()
+            raise
+        finally:
+            db.close()
+
+        duplicate = len(semua) - inserted
+
+        self.total_inserted += inserted
+        self.total_duplicate += duplicate
+
+        # processor idempotent: kirim semua key batch yang ada data barunya
+        if inserted and self.on_scans:
+            self.on_scans([(r[2], r[0], r[1]) for r in rows])
+
+        return {"inserted": inserted, "duplicate": duplicate}
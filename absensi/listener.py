@@ -1,26 +1,62 @@
-from zk import ZK
 import time
+from contextlib import nullcontext
 from datetime import datetime
 from helpers.db import get_conn
-
-IP = "192.168.1.201"
-PORT = 4370
+from .archive import HOT_TABLE, archived_months
+
+# =========================
+# SYNC 1 MESIN (dipakai collector, 1 thread per mesin)
+# koneksi & daftar mesin: absensi/collector.py + attendance_devices
+# =========================
+
+# live capture: mesin kirim event tiap ada scan
+LIVE_CAPTURE = True
+LIVE_TIMEOUT = 10
+
+# jarak cek jumlah record mesin
+# (mode polling = tiap cek, mode live = rekonsiliasi)
+POLL_INTERVAL = 2
+RECONCILE_INTERVAL = 15 * 60
+
+
+def _last_scan_row(db, table, sumber=None):
+    if sumber:
+        return db.execute(f"""
+            SELECT tanggal, waktu
+            FROM {table}
+            WHERE sumber = ?
+            ORDER BY tanggal DESC, waktu DESC
+            LIMIT 1
+        """, (sumber,)).fetchone()
+
+    return db.execute(f"""
+        SELECT tanggal, waktu
+        FROM {table}
+        ORDER BY tanggal DESC, waktu DESC
+        LIMIT 1
+    """).fetchone()
 
 
-def get_last_scan():
+def get_last_scan(sumber=None):
     db = get_conn()
-    cur = db.cursor()
 
-    cur.execute("""
-        SELECT tanggal, waktu
-        FROM attendance_raw
-        ORDER BY tanggal DESC, waktu DESC
-        LIMIT 1
-    """)
+    rows = [_last_scan_row(db, HOT_TABLE, sumber)]
+
+    # arsip bulan terbaru yang berisi (raw belum processed bisa lebih tua
+    # dari isi arsip, jadi tabel utama saja tidak cukup)
+    for _, nama in reversed(archived_months(db)):
+        row = _last_scan_row(db, nama, sumber)
+        if row:
+            rows.append(row)
+            break
 
-    row = cur.fetchone()
     db.close()
 
+    rows = [r for r in rows if r]
+    row = max(
+        rows, key=lambda r: (r["tanggal"] or "", r["waktu"] or "")
+    ) if rows else None
+
     if row and row["tanggal"] and row["waktu"]:
         return datetime.strptime(
             f"{row['tanggal']} {row['waktu']}",
@@ -30,126 +66,117 @@ def get_last_scan():
     return None
 
 
-def start_listener():
+def simpan_attendance(attendances, last_scan, emit, skip_lama=True):
+    """
+    Kirim record mesin ke emit(att), return scan terbaru.
+    skip_lama: buang record <= last_scan (download full log).
+    """
+    newest_scan = last_scan
 
-    last_scan = get_last_scan()
+    for att in attendances:
 
-    while True:
+        waktu = att.timestamp
 
-        conn = None
-        db = None
+        if not str(att.user_id).strip() or not waktu:
+            continue
 
-        try:
-            print("🔌 Mencoba koneksi ke mesin...")
+        if skip_lama and last_scan and waktu <= last_scan:
+            continue
 
-            # buat object baru setiap reconnect
-            zk = ZK(
-                IP,
-                port=PORT,
-                timeout=10,
-                force_udp=False
-            )
+        emit(att)
 
-            conn = zk.connect()
+        if newest_scan is None or waktu > newest_scan:
+            newest_scan = waktu
 
-            print("✅ Connected ke mesin absensi")
+    return newest_scan
 
-            while True:
 
-                try:
-                    attendances = conn.get_attendance()
+def sync_full(conn, last_scan, emit, io_lock=None):
+    """Download seluruh log mesin (dipakai saat connect & rekonsiliasi)."""
+    with io_lock or nullcontext():
+        attendances = conn.get_attendance()
 
-                except Exception as e:
-                    print("❌ Gagal baca attendance:", e)
-                    break
-
-                if not attendances:
-                    time.sleep(2)
-                    continue
+    if not attendances:
+        return last_scan
 
-                db = get_conn()
-                cur = db.cursor()
+    return simpan_attendance(attendances, last_scan, emit)
 
-                inserted = 0
-                newest_scan = last_scan
 
-                for att in attendances:
+def read_record_count(conn):
+    conn.read_sizes()
+    return conn.records
 
-                    fingerprint_id = str(att.user_id).strip()
-                    waktu = att.timestamp
 
-                    if not fingerprint_id or not waktu:
-                        continue
+def sync_device(conn, last_scan, emit, io_lock=None, stop=None):
+    """
+    Sinkron 1 mesin yang sudah connect (blocking, 1 thread per mesin).
 
-                    if last_scan and waktu <= last_scan:
-                        continue
+    emit(att)  : dipanggil per record baru
+    io_lock    : batasi download full log bersamaan antar mesin
+    stop       : threading.Event untuk berhenti rapi
 
-                    tanggal = waktu.strftime("%Y-%m-%d")
-                    jam = waktu.strftime("%H:%M:%S")
+    Full download hanya saat awal dan kalau counter mesin tidak cocok
+    dengan event yang diterima. Error koneksi di-raise, caller reconnect.
+    """
 
-                    cur.execute("""
-                        INSERT OR IGNORE INTO attendance_raw
-                        (
-                            tanggal,
-                            waktu,
-                            fingerprint_id,
-                            no_id,
-                            tipe_scan,
-                            status_absen,
-                            sumber,
-                            created_at
-                        )
-                        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-                    """, (
-                        tanggal,
-                        jam,
-                        fingerprint_id,
-                        fingerprint_id,
-                        "fingerprint",
-                        str(att.status),
-                        "mb460",
-                        datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-                    ))
+    # =========================
+    # FULL SYNC AWAL
+    # =========================
+    last_scan = sync_full(conn, last_scan, emit, io_lock)
+    # batas aman rekonsiliasi: event live bisa lebih baru
+    # dari scan yang terlewat
+    synced_until = last_scan
+    record_count = read_record_count(conn)
+    last_reconcile = time.monotonic()
 
-                    if cur.rowcount > 0:
-                        inserted += 1
-                        print("✅ MASUK RAW:", fingerprint_id, waktu)
+    while not (stop and stop.is_set()):
 
-                    if newest_scan is None or waktu > newest_scan:
-                        newest_scan = waktu
+        # =========================
+        # DELTA: LIVE EVENT / POLL COUNTER
+        # =========================
+        received = 0
 
-                db.commit()
-                db.close()
-                db = None
+        if LIVE_CAPTURE:
+            for att in conn.live_capture(new_timeout=LIVE_TIMEOUT):
 
-                if newest_scan:
-                    last_scan = newest_scan
+                if (
+                    time.monotonic() - last_reconcile >= RECONCILE_INTERVAL
+                    or (stop and stop.is_set())
+                ):
+                    conn.end_live_capture = True
 
-                if inserted == 0:
-                    print("Tidak ada data baru")
-
-                time.sleep(2)
+                if att is None:
+                    continue
 
-        except Exception as e:
-            print("❌ Koneksi putus:", e)
+                received += 1
+                last_scan = simpan_attendance(
+                    [att], last_scan, emit, skip_lama=False
+                )
+        else:
+            time.sleep(POLL_INTERVAL)
 
-        finally:
+        # =========================
+        # REKONSILIASI
+        # download full hanya kalau counter mesin
+        # tidak sesuai dengan yang sudah diterima
+        # =========================
+        count = read_record_count(conn)
 
-            try:
-                if db:
-                    db.close()
-            except:
-                pass
+        if count != record_count + received:
+            print(f"🔁 Record mesin {record_count} → {count}, sinkron ulang")
+            newest = sync_full(conn, synced_until, emit, io_lock)
+            if newest and (last_scan is None or newest > last_scan):
+                last_scan = newest
 
-            try:
-                if conn:
-                    conn.disconnect()
-            except:
-                pass
+        synced_until = last_scan
+        record_count = count
+        last_reconcile = time.monotonic()
 
-            print("🔄 Reconnect 5 detik lagi...")
-            time.sleep(5)
+    return last_scan
 
 
 if __name__ == "__main__":
-    start_listener()
+    # semua mesin di attendance_devices lewat collector
+    from .collector import start_collector
+
+    start_collector()
@@ -0,0 +1,231 @@
+from bisect import bisect_right
+
+from helpers.db import get_conn
+from helpers.query_plan import register_hot_query
+from .holidays import holiday_calendar
+from .rules import hitung_gaji_harian_rows
+
+# ukuran potongan IN (...) supaya tidak lewat batas variabel SQLite
+CHUNK = 500
+
+MES_BY_EMPLOYEE_QUERY = """
+    SELECT employee_id, tanggal_mulai, tanggal_selesai
+    FROM employee_mes_history
+    WHERE employee_id IN ({placeholders})
+"""
+
+register_hot_query(
+    "payroll_daily.mes_by_employee",
+    MES_BY_EMPLOYEE_QUERY.format(placeholders="?"),
+    ["employee_mes_history"]
+)
+
+
+class MesIndex:
+    """
+    Riwayat tinggal di mes per karyawan sebagai interval [mulai, selesai)
+    yang sudah digabung & diurutkan; cek tanggal pakai bisect.
+    Aturan sama dengan query per baris: tanggal_mulai <= tanggal
+    dan (tanggal_selesai kosong atau tanggal_selesai > tanggal).
+    """
+
+    # tanggal_selesai kosong = masih tinggal
+    TANPA_BATAS = "\uffff"
+
+    def __init__(self, rows):
+        per_employee = {}
+
+        for r in rows:
+            selesai = r["tanggal_selesai"] or self.TANPA_BATAS
+            per_employee.setdefault(r["employee_id"], []).append(
+                (str(r["tanggal_mulai"]), str(selesai))
+            )
+
+        self.starts = {}
+        self.ends = {}
+
+        for employee_id, intervals in per_employee.items():
+            intervals.sort()
+            merged = []
+
+            for mulai, selesai in intervals:
+                if mulai >= selesai:
+                    continue
+                if merged and mulai <= merged[-1][1]:
+                    if selesai > merged[-1][1]:
+                        merged[-1][1] = selesai
+                else:
+                    merged.append([mulai, selesai])
+
+            self.starts[employee_id] = [m[0] for m in merged]
+            self.ends[employee_id] = [m[1] for m in merged]
+
+    @classmethod
+    def load(cls, conn, employee_ids=None):
+        if employee_ids is None:
+            return cls(conn.execute("""
+                SELECT employee_id, tanggal_mulai, tanggal_selesai
+                FROM employee_mes_history
+            """).fetchall())
+
+        rows = []
+        for part in _chunks(sorted(set(employee_ids))):
+            placeholders = ",".join("?" for _ in part)
+            rows += conn.execute(
+                MES_BY_EMPLOYEE_QUERY.format(placeholders=placeholders),
+                part
+            ).fetchall()
+        return cls(rows)
+
+    def tinggal_di_mes(self, employee_id, work_date):
+        starts = self.starts.get(employee_id)
+        if not starts or not work_date:
+            return False
+
+        work_date = str(work_date)
+        i = bisect_right(starts, work_date) - 1
+
+        return i >= 0 and work_date < self.ends[employee_id][i]
+
+
+def _chunks(items):
+    items = list(items)
+    for i in range(0, len(items), CHUNK):
+        yield items[i:i + CHUNK]
+
+
+def _load_rows(conn, keys):
+    """Baris attendance_daily + employee untuk daftar (employee_id, work_date)."""
+    rows = []
+    for part in _chunks(sorted(keys)):
+        values = ",".join("(?, ?)" for _ in part)
+        params = [x for key in part for x in key]
+
+        rows += [
+            dict(r)
+            for r in conn.execute(f"""
+                WITH k(employee_id, work_date) AS (VALUES {values})
+                SELECT
+                    a.employee_id,
+                    a.work_date,
+                    e.bagian,
+                    COALESCE(e.gaji_harian, 100000) AS gaji_harian,
+                    a.period1_in,
+                    a.period1_out,
+                    a.period2_in,
+                    a.period2_out,
+                    a.period3_in,
+                    a.period3_out,
+                    a.status_hadir
+                FROM k
+                JOIN attendance_daily a
+                    ON a.employee_id = k.employee_id
+                   AND a.work_date = k.work_date
+                JOIN employees e
+                    ON e.id = a.employee_id
+            """, params).fetchall()
+        ]
+    return rows
+
+
+def refresh_payroll_daily(conn=None):
+    """
+    Hitung ulang payroll_daily_computed untuk baris yang ditandai
+    payroll_daily_dirty (trigger). Return jumlah baris dihitung.
+    """
+    own_conn = conn is None
+    if own_conn:
+        conn = get_conn()
+
+    try:
+        if not conn.execute("SELECT 1 FROM payroll_daily_dirty LIMIT 1").fetchone():
+            return 0
+
+        # hari_libur bisa baru berubah: jangan pakai cache lama
+        holiday_calendar.invalidate()
+
+        if not conn.in_transaction:
+            conn.execute("BEGIN IMMEDIATE")
+
+        dirty = conn.execute("""
+            SELECT employee_id, work_date
+            FROM payroll_daily_dirty
+        """).fetchall()
+
+        keys = set()
+        semua_tanggal = set()
+
+        for d in dirty:
+            if d["work_date"] == "*":
+                semua_tanggal.add(d["employee_id"])
+            else:
+                keys.add((d["employee_id"], d["work_date"]))
+
+        for part in _chunks(semua_tanggal):
+            placeholders = ",".join("?" for _ in part)
+            keys.update(
+                (r["employee_id"], r["work_date"])
+                for r in conn.execute(f"""
+                    SELECT employee_id, work_date
+                    FROM attendance_daily
+                    WHERE employee_id IN ({placeholders})
+                """, part).fetchall()
+            )
+            # tanggal yang attendance-nya sudah hilang
+            conn.execute(f"""
+                DELETE FROM payroll_daily_computed
+                WHERE employee_id IN ({placeholders})
+            """, part)
+
+        rows = _load_rows(conn, keys)
+
+        mes = MesIndex.load(conn, {r["employee_id"] for r in rows})
+
+        for r in rows:
+            r["tinggal_di_mes"] = 1 if mes.tinggal_di_mes(
+                r["employee_id"],
+                r["work_date"]
+            ) else 0
+
+        hasil = hitung_gaji_harian_rows(rows)
+
+        conn.executemany("""
+            DELETE FROM payroll_daily_computed
+            WHERE employee_id = ?
+              AND work_date = ?
+        """, sorted(keys))
+
+        conn.executemany("""
+            INSERT INTO payroll_daily_computed (
+                employee_id, work_date, tinggal_di_mes,
+                work_type, gaji_pokok, gaji_lembur, insentif,
+                potongan_telat, potongan_mes, gaji_final,
+                note, is_valid, updated_at
+            )
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
+        """, [
+            (
+                r["employee_id"], r["work_date"], r["tinggal_di_mes"],
+                h["work_type"], h["gaji_pokok"], h["gaji_lembur"], h["insentif"],
+                h["potongan_telat"], h["potongan_mes"], h["gaji_final"],
+                h["note"], 1 if h["is_valid"] else 0
+            )
+            for r, h in zip(rows, hasil)
+        ])
+
+        conn.executemany("""
+            DELETE FROM payroll_daily_dirty
+            WHERE employee_id = ?
+              AND work_date = ?
+        """, [(d["employee_id"], d["work_date"]) for d in dirty])
+
+        conn.commit()
+        return len(rows)
+
+    except Exception:
+        conn.rollback()
+        raise
+
+    finally:
+        if own_conn:
+            conn.close()
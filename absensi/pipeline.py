@@ -0,0 +1,74 @@
+import queue
+import threading
+import time
+
+from .processor import process_attendance
+
+# scan baru dari listener: (fingerprint_id, tanggal, waktu)
+scan_queue = queue.Queue()
+
+# tunggu sebentar supaya scan beruntun diproses 1 batch
+BATCH_WAIT = 0.2
+
+
+def publish_scans(scans):
+    """Dipanggil listener setelah raw scan baru ter-commit."""
+    for scan in scans:
+        scan_queue.put(scan)
+
+
+def drain_queue(first):
+    batch = [first]
+    deadline = time.monotonic() + BATCH_WAIT
+
+    while True:
+        sisa = deadline - time.monotonic()
+        if sisa <= 0:
+            break
+        try:
+            batch.append(scan_queue.get(timeout=sisa))
+        except queue.Empty:
+            break
+
+    return batch
+
+
+def processor_worker():
+    # catch-up: raw yang masuk selama pipeline mati
+    perlu_catch_up = True
+
+    while True:
+        if perlu_catch_up:
+            try:
+                process_attendance()
+                perlu_catch_up = False
+            except Exception as e:
+                print("❌ Catch-up processor gagal:", e)
+
+        first = scan_queue.get()
+        batch = drain_queue(first)
+
+        try:
+            process_attendance(scans=batch)
+        except Exception as e:
+            # raw batch ini masih processed = 0, ulangi lewat catch-up
+            print("❌ Processor gagal:", e)
+            perlu_catch_up = True
+
+
+def start_processor_worker():
+    worker = threading.Thread(
+        target=processor_worker,
+        name="absensi-processor",
+        daemon=True
+    )
+    worker.start()
+    return worker
+
+
+def start_pipeline():
+    # semua mesin di attendance_devices, 1 proses
+    from .collector import start_collector
+
+    start_processor_worker()
+    start_collector(on_scans=publish_scans)
@@ -1,583 +1,469 @@
 from helpers.db import get_conn
-from datetime import datetime, time as dt_time, timedelta
-import time
+from helpers.query_plan import register_hot_query
+from datetime import datetime, timedelta
+from .archive import raw_tables
 from .rules import apply_pagi_rules
-
-
-def parse_dt(tanggal, waktu):
-    return datetime.strptime(
-        f"{tanggal} {waktu}",
-        "%Y-%m-%d %H:%M:%S"
-    )
-
-
-def diff_minutes(dt_a, dt_b):
-    return max(0, int((dt_a - dt_b).total_seconds() // 60))
-
-
-def process_attendance():
-
-    db = get_conn()
-    cur = db.cursor()
+from .payroll_daily import refresh_payroll_daily
+from .shifts import get_shift_classifier, to_seconds, DAY_SECONDS
+
+PERIOD_KEYS = (
+    "period1_in", "period1_out",
+    "period2_in", "period2_out",
+    "period3_in", "period3_out",
+)
+
+SHIFT_BY_FINGERPRINT_QUERY = """
+    SELECT fingerprint_id, shift_default
+    FROM employees
+    WHERE status_aktif = 1
+      AND fingerprint_id IN ({placeholders})
+    ORDER BY id
+"""
+
+RAW_BY_DATES_QUERY = """
+    SELECT r.id, r.fingerprint_id, r.tanggal, r.waktu
+    FROM {table} r
+    WHERE r.tanggal IN ({placeholders})
+      AND r.fingerprint_id IN (
+            SELECT fingerprint_id
+            FROM employees
+            WHERE status_aktif = 1
+      )
+    ORDER BY r.fingerprint_id, r.tanggal, r.waktu
+"""
+
+# antrian: hanya baris di partial index idx_attendance_raw_pending
+PENDING_RAW_QUERY = """
+    SELECT DISTINCT
+        r.fingerprint_id,
+        CASE
+            WHEN UPPER(TRIM(e.shift_default)) = 'MALAM'
+                 AND r.waktu BETWEEN '00:00:00' AND '11:00:00'
+            THEN DATE(r.tanggal, '-1 day')
+
+            WHEN UPPER(TRIM(e.shift_default)) = 'SORE'
+                 AND r.waktu BETWEEN '00:00:00' AND '03:00:00'
+            THEN DATE(r.tanggal, '-1 day')
+
+            ELSE r.tanggal
+        END AS tanggal
+    FROM attendance_raw r
+    JOIN employees e
+        ON e.fingerprint_id = r.fingerprint_id
+       AND e.status_aktif = 1
+    WHERE r.processed = 0
+    ORDER BY r.fingerprint_id, tanggal
+"""
+
+# raw antri yang fingerprint-nya tidak punya karyawan aktif: tidak akan
+# pernah jadi baris harian, keluarkan dari antrian (processed = 2)
+MARK_ORPHAN_RAW_QUERY = """
+    UPDATE attendance_raw
+    SET processed = 2
+    WHERE processed = 0
+      AND NOT EXISTS (
+            SELECT 1
+            FROM employees e
+            WHERE e.fingerprint_id = attendance_raw.fingerprint_id
+              AND e.status_aktif = 1
+      )
+"""
+
+register_hot_query(
+    "processor.pending_raw",
+    PENDING_RAW_QUERY,
+    ["r"]
+)
+register_hot_query(
+    "processor.shift_by_fingerprint",
+    SHIFT_BY_FINGERPRINT_QUERY.format(placeholders="?"),
+    ["employees"]
+)
+register_hot_query(
+    "processor.raw_by_dates",
+    RAW_BY_DATES_QUERY.format(table="attendance_raw", placeholders="?"),
+    ["r"]
+)
+
+
+def next_date(tanggal):
+    return (
+        datetime.strptime(tanggal, "%Y-%m-%d") + timedelta(days=1)
+    ).strftime("%Y-%m-%d")
+
+
+def durasi_jam(p_in, p_out, lintas_hari=True):
+    """Selisih jam 2 string HH:MM:SS, lewat tengah malam kalau out < in."""
+    detik_in = to_seconds(p_in)
+    detik_out = to_seconds(p_out)
+
+    if lintas_hari and p_out < p_in:
+        detik_out += DAY_SECONDS
+
+    return max(0, (detik_out - detik_in) / 3600)
+
+
+def hitung_attendance_harian(tanggal, shift_code, scans, raw_besok, normal_hours):
+    """
+    Hitung 1 baris attendance_daily dari scan mentah (tanpa query DB).
+
+    scans     : raw scan fingerprint di tanggal kerja (urut waktu)
+    raw_besok : raw scan di tanggal berikutnya (dipakai SORE / MALAM)
+    """
+    shift = get_shift_classifier().get(shift_code)
 
     # =========================
-    # AMBIL RAW BELUM PROSES
+    # KLASIFIKASI SCAN → PERIODE
     # =========================
-    cur.execute("""
-        SELECT DISTINCT
-            r.fingerprint_id,
-            CASE
-                WHEN UPPER(TRIM(e.shift_default)) = 'MALAM'
-                     AND r.waktu BETWEEN '00:00:00' AND '11:00:00'
-                THEN DATE(r.tanggal, '-1 day')
-
-                WHEN UPPER(TRIM(e.shift_default)) = 'SORE'
-                     AND r.waktu BETWEEN '00:00:00' AND '03:00:00'
-                THEN DATE(r.tanggal, '-1 day')
-
-                ELSE r.tanggal
-            END AS tanggal
-        FROM attendance_raw r
-        JOIN employees e
-            ON e.fingerprint_id = r.fingerprint_id
-           AND e.status_aktif = 1
-        WHERE IFNULL(r.processed, 0) = 0
-        ORDER BY r.fingerprint_id, tanggal
-    """)
-
-    pending_keys = cur.fetchall()
-
-    if not pending_keys:
-        print("Tidak ada data raw baru")
-        db.close()
-        return
-
-    for key in pending_keys:
-        skip_update_processed = False
-        fingerprint_id = key["fingerprint_id"]
-        tanggal = key["tanggal"]
-
-        # =========================
-        # AMBIL SCAN
-        # =========================
-        cur.execute("""
-            SELECT *
-            FROM attendance_raw
-            WHERE fingerprint_id = ?
-              AND tanggal = ?
-            ORDER BY waktu
-        """, (fingerprint_id, tanggal))
-
-        scans = cur.fetchall()
+    if shift:
+        periods = shift.periods(
+            [s["waktu"] for s in scans],
+            [s["waktu"] for s in raw_besok]
+        )
+    else:
+        periods = dict.fromkeys(PERIOD_KEYS)
+
+    period1_in = periods["period1_in"]
+    period1_out = periods["period1_out"]
+    period2_in = periods["period2_in"]
+    period2_out = periods["period2_out"]
+    period3_in = periods["period3_in"]
+    period3_out = periods["period3_out"]
+
+    late_minutes = 0
+    early_leave_minutes = 0
+    overtime_hours = 0.0
 
-        # =========================
-        # AMBIL EMPLOYEE
-        # =========================
-        cur.execute("""
-            SELECT *
-            FROM employees
-            WHERE fingerprint_id = ?
-              AND status_aktif = 1
-            LIMIT 1
-        """, (fingerprint_id,))
-
-        emp = cur.fetchone()
+    # =========================
+    # TELAT / PULANG CEPAT
+    # =========================
+    if shift and shift.telat_setelah is not None and period1_in:
+        detik = to_seconds(period1_in)
+        if detik > shift.telat_setelah:
+            late_minutes = (detik - shift.telat_setelah) // 60
 
-        if not emp:
-            print(f"Fingerprint {fingerprint_id} tidak ditemukan")
-            continue
+    if shift and shift.pulang_sebelum is not None and period2_out:
+        detik = to_seconds(period2_out)
+        if detik < shift.pulang_sebelum:
+            early_leave_minutes = (shift.pulang_sebelum - detik) // 60
 
-        employee_id = emp["id"]
-        no_id = emp["no_id"]
-        shift_code = (emp["shift_default"] or "PAGI").upper()
+    # =========================
+    # CHECK SCAN
+    # =========================
+    first_scan = any(periods.values())
 
-        scan_times = [
-            parse_dt(s["tanggal"], s["waktu"])
-            for s in scans
-        ]
-        scan_times.sort()
+    # =========================
+    # HITUNG JAM
+    # =========================
+    actual_hours = 0.0
 
-        # =========================
-        # INIT
-        # =========================
-        period1_in = None
-        period1_out = None
-        period2_in = None
-        period2_out = None
-        period3_in = None
-        period3_out = None
+    if shift_code == "MALAM" and period1_in and period1_out:
+        # pulang selalu besok pagi
+        detik_in = to_seconds(period1_in)
+        detik_out = to_seconds(period1_out) + DAY_SECONDS
 
-        late_minutes = 0
-        early_leave_minutes = 0
-        overtime_hours = 0.0
+        actual_hours = round(max(0, (detik_out - detik_in) / 3600), 2)
 
-        # =========================
-        # SHIFT PAGI
-        # =========================
-        if shift_code == "PAGI":
+        batas_normal = shift.jam_pulang + DAY_SECONDS
 
-            masuk_pagi = []
-            keluar_siang = []
-            masuk_siang = []
-            pulang_normal = []
-            scan_lembur = []
+        if detik_out > batas_normal:
+            overtime_hours = round((detik_out - batas_normal) / 3600, 2)
+        else:
+            overtime_hours = 0.0
 
-            for dt in scan_times:
-                t = dt.time()
+    else:
+        if period1_in and period1_out:
+            actual_hours += durasi_jam(period1_in, period1_out, lintas_hari=False)
 
-                if dt_time(6, 30) <= t <= dt_time(9, 0):
-                    masuk_pagi.append(dt)
-                elif dt_time(10, 0) <= t <= dt_time(12, 34):
-                    keluar_siang.append(dt)
-                elif dt_time(12, 35) <= t <= dt_time(14, 29):
-                    masuk_siang.append(dt)
-                elif dt_time(14, 30) <= t <= dt_time(18, 1):
-                    pulang_normal.append(dt)
-                elif dt_time(18, 1) <= t <= dt_time(23, 59):
-                    scan_lembur.append(dt)
+        if period2_in and period2_out:
+            actual_hours += durasi_jam(period2_in, period2_out)
 
-            if masuk_pagi:
-                period1_in = masuk_pagi[0].strftime("%H:%M:%S")
+        if period3_in and period3_out:
+            actual_hours += durasi_jam(period3_in, period3_out)
 
-            if keluar_siang:
-                period1_out = keluar_siang[-1].strftime("%H:%M:%S")
+        actual_hours = round(actual_hours, 2)
 
-            if masuk_siang:
-                period2_in = masuk_siang[0].strftime("%H:%M:%S")
+    # =========================
+    # NORMAL HOURS
+    # =========================
+    if shift_code != "MALAM":
+        overtime_calc = max(0, round(actual_hours - normal_hours, 2))
+    else:
+        overtime_calc = overtime_hours
 
-            if pulang_normal:
-                period2_out = pulang_normal[-1].strftime("%H:%M:%S")
+    # =========================
+    # FINAL OVERRIDE RULE PAGI
+    # =========================
+    if shift_code == "PAGI" and period1_in:
+        hasil = apply_pagi_rules(period1_in)
 
-            if not period2_in and period2_out:
-                period2_in = "13:00:00"
+        if hasil["lembur_p1"] > 0:
+            overtime_hours = 1.0
+        else:
+            overtime_hours = overtime_calc
+    else:
+        overtime_hours = overtime_calc
+
+    return {
+        **periods,
+        "normal_hours": normal_hours,
+        "actual_hours": actual_hours,
+        "overtime_hours": overtime_hours,
+        "late_minutes": late_minutes,
+        "early_leave_minutes": early_leave_minutes,
+        "status_hadir": "hadir" if first_scan else "tidak_hadir",
+    }
+
+
+def raw_ids_to_mark(shift_code, tanggal, scans, raw_besok):
+    """
+    Raw scan yang ikut "dipakai" oleh 1 baris harian,
+    sama dengan aturan UPDATE processed per shift.
+    """
+    if shift_code == "MALAM":
+        return (
+            [s["id"] for s in scans if "21:00:00" <= s["waktu"] <= "23:59:59"]
+            + [s["id"] for s in raw_besok if "00:00:00" <= s["waktu"] <= "11:00:00"]
+        )
+
+    if shift_code == "SORE":
+        return (
+            [s["id"] for s in scans]
+            + [s["id"] for s in raw_besok if "00:00:00" <= s["waktu"] <= "03:00:00"]
+        )
+
+    return [s["id"] for s in scans]
+
+
+def raw_ids_unused(shift_code, tanggal, scans, raw_besok, marked):
+    """
+    Raw milik tanggal kerja ini (lihat work_date_for_scan) yang tidak ikut
+    dipakai, mis. scan MALAM 11:00 - 21:00. Scan yang milik tanggal kerja
+    lain tidak disentuh.
+    """
+    return [
+        s["id"]
+        for s in list(scans) + list(raw_besok)
+        if s["id"] not in marked
+        and work_date_for_scan(shift_code, s["tanggal"], s["waktu"]) == tanggal
+    ]
+
+
+def work_date_for_scan(shift_default, tanggal, waktu):
+    """
+    Tanggal kerja untuk 1 scan, sama dengan CASE di query pending:
+    scan dini hari shift MALAM / SORE milik hari sebelumnya.
+    """
+    shift = (shift_default or "").strip().upper()
+
+    if (
+        (shift == "MALAM" and "00:00:00" <= waktu <= "11:00:00")
+        or (shift == "SORE" and "00:00:00" <= waktu <= "03:00:00")
+    ):
+        return (
+            datetime.strptime(tanggal, "%Y-%m-%d") - timedelta(days=1)
+        ).strftime("%Y-%m-%d")
+
+    return tanggal
+
+
+def affected_keys(cur, scans):
+    """
+    Pasangan (fingerprint_id, work_date) yang perlu dihitung ulang
+    dari daftar scan baru (fingerprint_id, tanggal, waktu).
+    """
+    fingerprints = sorted({s[0] for s in scans})
+    if not fingerprints:
+        return []
+
+    placeholders = ",".join("?" for _ in fingerprints)
+
+    shifts = {}
+    for emp in cur.execute(
+        SHIFT_BY_FINGERPRINT_QUERY.format(placeholders=placeholders),
+        fingerprints
+    ).fetchall():
+        shifts.setdefault(emp["fingerprint_id"], emp["shift_default"])
+
+    keys = set()
+    for fingerprint_id, tanggal, waktu in scans:
+        if fingerprint_id not in shifts:
+            continue
+        keys.add((
+            fingerprint_id,
+            work_date_for_scan(shifts[fingerprint_id], tanggal, waktu)
+        ))
 
-            if len(scan_lembur) >= 2:
-                period3_in = scan_lembur[0].strftime("%H:%M:%S")
-                period3_out = scan_lembur[-1].strftime("%H:%M:%S")
-            elif len(scan_lembur) == 1:
-                period3_in = scan_lembur[0].strftime("%H:%M:%S")
-                period3_out = scan_lembur[0].strftime("%H:%M:%S")
+    return sorted(keys)
 
-            if period1_in:
-                jadwal = parse_dt(tanggal, "08:00:00")
-                actual = parse_dt(tanggal, period1_in)
-                telat_menit = diff_minutes(actual, jadwal)
 
+def process_attendance(keys=None, scans=None):
+    """
+    Tanpa argumen: proses semua raw yang belum processed.
+    keys  : hanya hitung ulang pasangan (fingerprint_id, work_date) ini.
+    scans : scan baru (fingerprint_id, tanggal, waktu), key dicari otomatis.
+    """
 
-            if period2_out:
-                jadwal_pulang = parse_dt(tanggal, "17:30:00")
-                actual_pulang = parse_dt(tanggal, period2_out)
-                if actual_pulang < jadwal_pulang:
-                    early_leave_minutes = diff_minutes(jadwal_pulang, actual_pulang)
+    db = get_conn()
+    cur = db.cursor()
 
-            hasil = apply_pagi_rules(period1_in)
-            lembur_p1 = hasil["lembur_p1"]
+    if scans is not None:
+        keys = affected_keys(cur, scans)
 
-            if lembur_p1 > 0:
-                overtime_hours = lembur_p1
+    if keys is not None:
+        pending_keys = sorted(set(keys))
 
+    else:
         # =========================
-        # SHIFT BORONGAN
+        # AMBIL RAW BELUM PROSES
         # =========================
-        elif shift_code == "BORONGAN":
-
-            masuk_pagi = []
-            keluar_siang = []
-            masuk_siang = []
-            pulang_normal = []
-            scan_malam = []
-
-            for dt in scan_times:
-                t = dt.time()
-
-                if dt_time(6, 0) <= t <= dt_time(9, 0):
-                    masuk_pagi.append(dt)
-                elif dt_time(10, 30) <= t <= dt_time(12, 30):
-                    keluar_siang.append(dt)
-                elif dt_time(12, 30) <= t <= dt_time(14, 30):
-                    masuk_siang.append(dt)
-                elif dt_time(14, 30) <= t <= dt_time(18, 0):
-                    pulang_normal.append(dt)
-                elif dt_time(18, 0) <= t <= dt_time(23, 59):
-                    scan_malam.append(dt)
-
-            if masuk_pagi:
-                period1_in = masuk_pagi[0].strftime("%H:%M:%S")
-
-            if keluar_siang:
-                period1_out = keluar_siang[-1].strftime("%H:%M:%S")
-
-            if masuk_siang:
-                period2_in = masuk_siang[0].strftime("%H:%M:%S")
-
-            if pulang_normal:
-                period2_out = pulang_normal[-1].strftime("%H:%M:%S")
-
-            if not period2_in and period2_out:
-                period2_in = "12:30:00"
-
-            if len(scan_malam) >= 2:
-                period3_in = scan_malam[0].strftime("%H:%M:%S")
-                period3_out = scan_malam[-1].strftime("%H:%M:%S")
-            elif len(scan_malam) == 1:
-                period3_in = scan_malam[0].strftime("%H:%M:%S")
-                period3_out = scan_malam[0].strftime("%H:%M:%S")
-
-            if period1_in:
-                jadwal_masuk = parse_dt(tanggal, "08:00:00")
-                actual_masuk = parse_dt(tanggal, period1_in)
-                if actual_masuk > jadwal_masuk:
-                    late_minutes = diff_minutes(actual_masuk, jadwal_masuk)
-
-            if period2_out:
-                jadwal_pulang = parse_dt(tanggal, "17:00:00")
-                actual_pulang = parse_dt(tanggal, period2_out)
-                if actual_pulang < jadwal_pulang:
-                    early_leave_minutes = diff_minutes(jadwal_pulang, actual_pulang)
+        cur.execute(PENDING_RAW_QUERY)
 
-        # =========================
-        # SHIFT SORE
-        # P1 = sesi sore
-        # P2 = 18:00 sampai selesai
-        # lembur dihitung jika P2 OUT > 22:00
-        # P2 bisa lanjut sampai besok 02:00
-        # =========================
-        elif shift_code == "SORE":
-
-            sore_masuk = []
-            sore_pulang = []
-            malam_masuk = []
-            malam_pulang = []
-
-            besok = (
-                    datetime.strptime(tanggal, "%Y-%m-%d") + timedelta(days=1)
-            ).strftime("%Y-%m-%d")
-
-            cur.execute("""
-                SELECT *
-                FROM attendance_raw
-                WHERE fingerprint_id = ?
-                  AND tanggal = ?
-                ORDER BY waktu
-            """, (fingerprint_id, besok))
-
-            raw_besok = cur.fetchall()
-
-            next_day_scans = []
-            for s in raw_besok:
-                dt_besok = parse_dt(s["tanggal"], s["waktu"])
-                if dt_time(0, 0) <= dt_besok.time() <= dt_time(3, 0):
-                    next_day_scans.append(dt_besok)
-
-            all_scans = scan_times + next_day_scans
-            all_scans.sort()
-
-            for dt in all_scans:
-                t = dt.time()
-                scan_date = dt.strftime("%Y-%m-%d")
-
-                if scan_date == tanggal and dt_time(12, 0) <= t <= dt_time(15, 0):
-                    sore_masuk.append(dt)
-
-                elif scan_date == tanggal and dt_time(16, 30) <= t <= dt_time(18, 30):
-                    sore_pulang.append(dt)
-                # MASUK SORE
-                elif scan_date == tanggal and dt_time(18, 0) <= t < dt_time(22, 0):
-                    malam_masuk.append(dt)
-                # KELUAR NORMAL + LEMBUR (hari yang sama)
-                elif scan_date == tanggal and t >= dt_time(22, 0):
-                    malam_pulang.append(dt)
-                # LEMBUR LANJUT (hari berikutnya sampai jam 4)
-                elif scan_date == besok and dt_time(0, 0) <= t <= dt_time(4, 0):
-                    malam_pulang.append(dt)
-            if sore_masuk:
-                period1_in = sore_masuk[0].strftime("%H:%M:%S")
-
-            if sore_pulang:
-                period1_out = sore_pulang[-1].strftime("%H:%M:%S")
-
-            if malam_masuk:
-                period2_in = malam_masuk[0].strftime("%H:%M:%S")
-
-            if malam_pulang:
-                period2_out = malam_pulang[-1].strftime("%H:%M:%S")
-
-            if period2_out and not period2_in:
-                period2_in = "19:00:00"
-
-            period3_in = None
-            period3_out = None
-
-        elif shift_code == "MALAM":
-
-            malam_masuk = []
-            pagi_pulang = []
-
-            besok = (
-                    datetime.strptime(tanggal, "%Y-%m-%d") + timedelta(days=1)
-            ).strftime("%Y-%m-%d")
-
-            cur.execute("""
-                SELECT *
-                FROM attendance_raw
-                WHERE fingerprint_id = ?
-                AND tanggal = ?
-                ORDER BY waktu
-            """, (fingerprint_id, besok))
-
-            raw_besok = cur.fetchall()
-
-            next_day_scans = []
-            for s in raw_besok:
-                dt_besok = parse_dt(s["tanggal"], s["waktu"])
-                if dt_time(0, 0) <= dt_besok.time() <= dt_time(11, 0):
-                    next_day_scans.append(dt_besok)
-
-            # PENTING:
-            # Kalau belum ada scan pulang besok pagi,
-            # jangan proses dulu shift malam hari ini.
-            all_scans = scan_times.copy()
-
-            if next_day_scans:
-                all_scans.extend(next_day_scans)
-
-            all_scans.sort()
-
-            all_scans = scan_times + next_day_scans
-            all_scans.sort()
-
-            for dt in all_scans:
-                t = dt.time()
-                scan_date = dt.strftime("%Y-%m-%d")
-
-                if scan_date == tanggal and dt_time(21, 0) <= t <= dt_time(23, 59):
-                    malam_masuk.append(dt)
-                elif scan_date == besok and dt_time(0, 0) <= t <= dt_time(11, 0):
-                    pagi_pulang.append(dt)
-
-            if malam_masuk:
-                period1_in = malam_masuk[0].strftime("%H:%M:%S")
-
-            if pagi_pulang:
-                period1_out = pagi_pulang[-1].strftime("%H:%M:%S")
-
-            period2_in = None
-            period2_out = None
-            period3_in = None
-            period3_out = None
-        # =========================
-        # CHECK SCAN
-        # =========================
-        all_valid = [
-            x for x in [
-                period1_in, period1_out,
-                period2_in, period2_out,
-                period3_in, period3_out
-            ] if x
+        pending_keys = [
+            (r["fingerprint_id"], r["tanggal"])
+            for r in cur.fetchall()
         ]
 
-        first_scan = all_valid[0] if all_valid else None
-
-        # =========================
-        # HITUNG JAM
-        # =========================
-        actual_hours = 0.0
-
-        if shift_code == "SORE":
-            if period1_in and period1_out:
-                dt1 = parse_dt(tanggal, period1_in)
-                dt2 = parse_dt(tanggal, period1_out)
-                actual_hours += max(0, (dt2 - dt1).total_seconds() / 3600)
-
-            if period2_in and period2_out:
-                dt1 = parse_dt(tanggal, period2_in)
-
-                if period2_out < period2_in:
-                    dt2 = parse_dt(
-                        (datetime.strptime(tanggal, "%Y-%m-%d") + timedelta(days=1)).strftime("%Y-%m-%d"),
-                        period2_out
-                    )
-                else:
-                    dt2 = parse_dt(tanggal, period2_out)
-
-                actual_hours += max(0, (dt2 - dt1).total_seconds() / 3600)
-
-                batas_lembur = parse_dt(tanggal, "22:00:00")
-                if dt2 > batas_lembur:
-                    overtime_hours = round((dt2 - batas_lembur).total_seconds() / 3600, 2)
-                else:
-                    overtime_hours = 0.0
-
-            actual_hours = round(actual_hours, 2)
-
-        elif shift_code == "MALAM" and period1_in and period1_out:
-            dt_in = parse_dt(tanggal, period1_in)
-            dt_out = parse_dt(
-                (datetime.strptime(tanggal, "%Y-%m-%d") + timedelta(days=1)).strftime("%Y-%m-%d"),
-                period1_out
-            )
-
-            actual_hours = round(max(0, (dt_out - dt_in).total_seconds() / 3600), 2)
-
-            batas_normal = parse_dt(
-                (datetime.strptime(tanggal, "%Y-%m-%d") + timedelta(days=1)).strftime("%Y-%m-%d"),
-                "08:00:00"
-            )
-
-            if dt_out > batas_normal:
-                overtime_hours = round((dt_out - batas_normal).total_seconds() / 3600, 2)
-            else:
-                overtime_hours = 0.0
-
-        else:
-            if period1_in and period1_out:
-                dt1 = parse_dt(tanggal, period1_in)
-                dt2 = parse_dt(tanggal, period1_out)
-                actual_hours += max(0, (dt2 - dt1).total_seconds() / 3600)
-
-            if period2_in and period2_out:
-                dt1 = parse_dt(tanggal, period2_in)
-
-                if period2_out < period2_in:
-                    dt2 = parse_dt(
-                        (datetime.strptime(tanggal, "%Y-%m-%d") + timedelta(days=1)).strftime("%Y-%m-%d"),
-                        period2_out
-                    )
-                else:
-                    dt2 = parse_dt(tanggal, period2_out)
-
-                actual_hours += max(0, (dt2 - dt1).total_seconds() / 3600)
+    orphan = cur.execute(MARK_ORPHAN_RAW_QUERY).rowcount
 
-            if period3_in and period3_out:
-                dt1 = parse_dt(tanggal, period3_in)
+    if not pending_keys:
+        db.commit()
+        if orphan:
+            print(f"Processor: {orphan} raw tanpa karyawan aktif")
+        print("Tidak ada data raw baru")
+        db.close()
+        return
 
-                if period3_out < period3_in:
-                    dt2 = parse_dt(
-                        (datetime.strptime(tanggal, "%Y-%m-%d") + timedelta(days=1)).strftime("%Y-%m-%d"),
-                        period3_out
-                    )
-                else:
-                    dt2 = parse_dt(tanggal, period3_out)
+    # =========================
+    # BULK LOAD: EMPLOYEE, SHIFT, RAW
+    # =========================
+    employees = {}
+    for emp in cur.execute("""
+        SELECT *
+        FROM employees
+        WHERE status_aktif = 1
+        ORDER BY id
+    """).fetchall():
+        employees.setdefault(emp["fingerprint_id"], emp)
+
+    classifier = get_shift_classifier()
+
+    dates = set()
+    for _, tanggal in pending_keys:
+        dates.add(tanggal)
+        dates.add(next_date(tanggal))
+
+    dates = sorted(dates)
+    placeholders = ",".join("?" for _ in dates)
+
+    # tanggal lama bisa ada di tabel arsip bulanan
+    tables = raw_tables(cur, dates)
+
+    raw_map = {}
+    for table in tables:
+        for r in cur.execute(
+            RAW_BY_DATES_QUERY.format(table=table, placeholders=placeholders),
+            dates
+        ).fetchall():
+            raw_map.setdefault((r["fingerprint_id"], r["tanggal"]), []).append(r)
+
+    if len(tables) > 1:
+        for scans in raw_map.values():
+            scans.sort(key=lambda r: r["waktu"])
 
-                actual_hours += max(0, (dt2 - dt1).total_seconds() / 3600)
+    # =========================
+    # HITUNG SEMUA BARIS HARIAN DI MEMORI
+    # =========================
+    daily_rows = []
+    processed_ids = set()
+    unused_ids = set()
 
-            actual_hours = round(actual_hours, 2)
+    for fingerprint_id, tanggal in pending_keys:
 
-        # =========================
-        # NORMAL HOURS
-        # =========================
-        cur.execute("""
-            SELECT normal_hours
-            FROM shift_definitions
-            WHERE shift_code = ?
-        """, (shift_code,))
+        emp = employees.get(fingerprint_id)
 
-        shift = cur.fetchone()
-        normal_hours = shift["normal_hours"] if shift else 0
+        if not emp:
+            print(f"Fingerprint {fingerprint_id} tidak ditemukan")
+            continue
 
-        if shift_code != "MALAM":
-            overtime_calc = max(0, round(actual_hours - normal_hours, 2))
-        else:
-            overtime_calc = overtime_hours
+        shift_code = (emp["shift_default"] or "PAGI").upper()
 
-        # =========================
-        # FINAL OVERRIDE RULE PAGI
-        # =========================
-        if shift_code == "PAGI" and period1_in:
-            hasil = apply_pagi_rules(period1_in)
+        scans = raw_map.get((fingerprint_id, tanggal), [])
+        shift = classifier.get(shift_code)
 
-            if hasil["lembur_p1"] > 0:
-                overtime_hours = 1.0
-            else:
-                overtime_hours = overtime_calc
-        else:
-            overtime_hours = overtime_calc
+        raw_besok = []
+        if shift and shift.max_hari >= 1:
+            raw_besok = raw_map.get((fingerprint_id, next_date(tanggal)), [])
 
-        # =========================
-        # STATUS
-        # =========================
-        status_hadir = "hadir" if first_scan else "tidak_hadir"
+        h = hitung_attendance_harian(
+            tanggal,
+            shift_code,
+            scans,
+            raw_besok,
+            classifier.normal_hours(shift_code)
+        )
 
-        # =========================
-        # INSERT DAILY
-        # =========================
-        cur.execute("""
-            INSERT OR REPLACE INTO attendance_daily
-            (
-                employee_id, fingerprint_id, work_date, shift_code,
-                period1_in, period1_out,
-                period2_in, period2_out,
-                period3_in, period3_out,
-                normal_hours, actual_hours, overtime_hours,
-                late_minutes, early_leave_minutes,
-                status_hadir, sumber, catatan, created_at
-            )
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
-        """, (
-            employee_id,
+        daily_rows.append((
+            emp["id"],
             fingerprint_id,
             tanggal,
             shift_code,
-            period1_in, period1_out,
-            period2_in, period2_out,
-            period3_in, period3_out,
-            normal_hours,
-            actual_hours,
-            overtime_hours,
-            late_minutes,
-            early_leave_minutes,
-            status_hadir,
+            h["period1_in"], h["period1_out"],
+            h["period2_in"], h["period2_out"],
+            h["period3_in"], h["period3_out"],
+            h["normal_hours"],
+            h["actual_hours"],
+            h["overtime_hours"],
+            h["late_minutes"],
+            h["early_leave_minutes"],
+            h["status_hadir"],
             "processor",
             f"Scan count: {len(scans)}"
         ))
 
-        # =========================
-        # UPDATE PROCESSED
-        # =========================
-        if shift_code == "MALAM":
-            besok = (
-                    datetime.strptime(tanggal, "%Y-%m-%d") + timedelta(days=1)
-            ).strftime("%Y-%m-%d")
-
-            cur.execute("""
-                UPDATE attendance_raw
-                SET processed = 1
-                WHERE fingerprint_id = ?
-                  AND (
-                        (tanggal = ? AND waktu BETWEEN '21:00:00' AND '23:59:59')
-                     OR (tanggal = ? AND waktu BETWEEN '00:00:00' AND '11:00:00')
-                  )
-            """, (fingerprint_id, tanggal, besok))
-
-
-        elif shift_code == "SORE":
-            besok = (
-                    datetime.strptime(tanggal, "%Y-%m-%d") + timedelta(days=1)
-            ).strftime("%Y-%m-%d")
-
-            cur.execute("""
-                UPDATE attendance_raw
-                SET processed = 1
-                WHERE fingerprint_id = ?
-                  AND (
-                        tanggal = ?
-                     OR (tanggal = ? AND waktu BETWEEN '00:00:00' AND '03:00:00')
-                  )
-            """, (fingerprint_id, tanggal, besok))
+        marked = raw_ids_to_mark(shift_code, tanggal, scans, raw_besok)
+        processed_ids.update(marked)
+        unused_ids.update(raw_ids_unused(shift_code, tanggal, scans, raw_besok, set(marked)))
 
-        else:
-            cur.execute("""
-                UPDATE attendance_raw
-                SET processed = 1
-                WHERE fingerprint_id = ?
-                  AND tanggal = ?
-                  AND IFNULL(processed, 0) = 0
-            """, (fingerprint_id, tanggal))
+    # =========================
+    # TULIS SEKALIGUS
+    # =========================
+    cur.executemany("""
+        INSERT OR REPLACE INTO attendance_daily
+        (
+            employee_id, fingerprint_id, work_date, shift_code,
+            period1_in, period1_out,
+            period2_in, period2_out,
+            period3_in, period3_out,
+            normal_hours, actual_hours, overtime_hours,
+            late_minutes, early_leave_minutes,
+            status_hadir, sumber, catatan, created_at
+        )
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
+    """, daily_rows)
+
+    cur.executemany("""
+        UPDATE attendance_raw
+        SET processed = 1
+        WHERE id = ?
+          AND processed = 0
+    """, [(raw_id,) for raw_id in sorted(processed_ids)])
+
+    cur.executemany("""
+        UPDATE attendance_raw
+        SET processed = 2
+        WHERE id = ?
+          AND processed = 0
+    """, [(raw_id,) for raw_id in sorted(unused_ids - processed_ids)])
 
     db.commit()
+
+    # gaji harian ikut dihitung ulang (dirty dari trigger attendance_daily)
+    refresh_payroll_daily(db)
     db.close()
 
+    print(f"Processor: {len(daily_rows)} baris harian, {len(processed_ids)} raw diproses")
+
 if __name__ == "__main__":
-    while True:
-        process_attendance()
-        time.sleep(10)
\ No newline at end of file
+    # proses ulang manual; realtime lewat absensi.pipeline
+    process_attendance()
@@ -1,24 +1,48 @@
 from datetime import datetime, time, timedelta
-from helpers.db import DB_PATH
-import sqlite3
+from functools import lru_cache
+from .holidays import holiday_calendar
+from .shifts import get_shift_classifier, format_seconds
 # =========================
 # HELPER
 # =========================
 def parse_time_only(t):
     if not t:
         return None
+    return _parse_time_cached(t)
+
+
+@lru_cache(maxsize=4096)
+def _parse_time_cached(t):
+    # datetime immutable, aman dipakai bersama
     return datetime.strptime(t, "%H:%M:%S")
 
-def apply_potongan_mes(r, hasil):
+
+# =========================
+# AMBANG ATURAN GAJI HARIAN
+# satu-satunya sumber angka, dipakai versi row maupun batch
+# =========================
+GAJI_HARIAN_DEFAULT = 100000
+GAJI_BORONGAN = 50000
+POTONGAN_TELAT = 10000
+INSENTIF_LIBUR = {"full": 20000, "half": 10000}
+POTONGAN_MES = {"full": 10000, "half": 5000}
+INSENTIF_LEMBUR_WEEKEND = 10000
+INSENTIF_P3_BORONGAN = 10000
+
+DETIK_HARI = 24 * 3600
+JAM_LEMBUR_P3 = 19 * 3600
+# lembur masuk pagi: <= 07:10 -> 10rb, 07:11 - 07:35 -> 5rb
+LEMBUR_PAGI_PENUH = 7 * 3600 + 10 * 60
+LEMBUR_PAGI_SETENGAH = (7 * 3600 + 11 * 60, 7 * 3600 + 35 * 60)
+
+
+def apply_potongan_mes(s, hasil):
     potongan_mes = 0
 
-    tinggal_di_mes = int(r.get("tinggal_di_mes") or 0)
+    tinggal_di_mes = int(s["tinggal_di_mes"] or 0)
 
     if tinggal_di_mes == 1:
-        if hasil["work_type"] == "full":
-            potongan_mes = 10000
-        elif hasil["work_type"] == "half":
-            potongan_mes = 5000
+        potongan_mes = POTONGAN_MES.get(hasil["work_type"], 0)
 
     hasil["potongan_mes"] = potongan_mes
     hasil["gaji_final"] = (
@@ -31,12 +55,8 @@ def apply_potongan_mes(r, hasil):
 
     return hasil
 
-def apply_insentif_lembur_weekend(r, hasil, flags):
-    bagian = (r.get("bagian") or "").strip().lower()
-
-    p3_out = parse_time_only(r.get("period3_out"))
-    p2_out = parse_time_only(r.get("period2_out"))
-    p1_out = parse_time_only(r.get("period1_out"))
+def apply_insentif_lembur_weekend(s, hasil, jadwal):
+    flags = s["flags"]
 
     if not (
         flags["is_sabtu"]
@@ -45,34 +65,24 @@ def apply_insentif_lembur_weekend(r, hasil, flags):
     ):
         return hasil
 
-    if bagian == "kebersihan":
-        return hasil
+    bagian = s["bagian"]
 
     if bagian in ["produksi", "beku", "training", "umum"]:
-        batas = parse_time_only("19:00:00")
-        if p3_out:
-            menit = int(diff_hours(batas, p3_out) * 60)
-            if menit >= 34:
-                hasil["insentif"] += 10000
-        return hasil
-
-    if bagian == "coldroom":
-        batas = parse_time_only("22:00:00")
-        if p2_out:
-            menit = int(diff_hours(batas, p2_out) * 60)
-            if menit >= 30:
-                hasil["insentif"] += 10000
-        return hasil
-
-    if bagian == "malam":
-        batas = parse_time_only("08:00:00")
-        if p1_out:
-            menit = int(diff_hours(batas, p1_out) * 60)
-            if menit >= 30:
-                hasil["insentif"] += 10000
+        batas, scan, menit_min = JAM_LEMBUR_P3, s["p3_out"], 34
+    elif bagian == "coldroom":
+        batas, scan, menit_min = jadwal["pulang_sore"], s["p2_out"], 30
+    elif bagian == "malam":
+        batas, scan, menit_min = jadwal["pulang_malam"], s["p1_out"], 30
+    else:
+        # kebersihan / borongan tidak dapat insentif lembur weekend
         return hasil
 
+    if scan is not None:
+        menit = int(selisih_jam(batas, scan) * 60)
+        if menit >= menit_min:
+            hasil["insentif"] += INSENTIF_LEMBUR_WEEKEND
     return hasil
+
 def hitung_insentif_libur(r, p1_in, p2_out, work_type):
     """
     Minggu / hari libur / tanggal merah:
@@ -80,50 +90,18 @@ def hitung_insentif_libur(r, p1_in, p2_out, work_type):
     - half day = 10.000
     - tidak hadir / none = 0
     """
-    work_date = r.get("work_date")
-    is_minggu = False
-    is_hari_besar = False
-
-    if work_date:
-        try:
-            dt = datetime.strptime(str(work_date), "%Y-%m-%d")
-            is_minggu = dt.weekday() == 6
-        except:
-            pass
-
-    # nanti kalau ada tabel hari libur:
-    is_hari_besar = cek_libur(work_date)
+    flags = get_day_flags(r.get("work_date"))
+    is_minggu = flags["is_minggu"]
+    is_hari_besar = flags["is_hari_besar"]
 
     if not (is_minggu or is_hari_besar):
         return 0
 
-    if work_type == "full":
-        return 20000
-
-    if work_type == "half":
-        return 10000
-
-    return 0
+    return INSENTIF_LIBUR.get(work_type, 0)
 
 
 def cek_libur(work_date):
-    if not work_date:
-        return False
-
-    conn = sqlite3.connect(DB_PATH)
-    cur = conn.cursor()
-
-    cur.execute("""
-        SELECT 1
-        FROM hari_libur
-        WHERE tanggal = ?
-        LIMIT 1
-    """, (work_date,))
-
-    ada = cur.fetchone() is not None
-    conn.close()
-
-    return ada
+    return holiday_calendar.is_libur(work_date)
 
 def diff_hours(t1, t2):
     if not t1 or not t2:
@@ -139,6 +117,14 @@ def diff_hours(t1, t2):
     return max(0.0, (dt2 - dt1).total_seconds() / 3600)
 
 
+def selisih_jam(batas, detik):
+    """diff_hours untuk jam dalam detik sejak 00:00, lintas tengah malam."""
+    selisih = detik - batas
+    if selisih < 0:
+        selisih += DETIK_HARI
+    return max(0.0, selisih / 3600)
+
+
 def round_half_hour(hours):
     """Pembulatan ke 0.5 jam terdekat."""
     if not hours or hours <= 0:
@@ -153,18 +139,22 @@ def lembur_to_uang(hours):
 
 
 def get_shift_start(shift_code):
-    shift_code = (shift_code or "").strip().upper()
+    """Jam masuk shift dari shift_definitions (default 08:00)."""
+    detik = get_shift_classifier().shift_start(shift_code)
+    return parse_time_only(format_seconds(detik))
 
-    if shift_code == "PAGI":
-        return parse_time_only("08:00:00")
-    elif shift_code == "BORONGAN":
-        return parse_time_only("08:00:00")
-    elif shift_code == "SORE":
-        return parse_time_only("13:00:00")
-    elif shift_code == "MALAM":
-        return parse_time_only("22:00:00")
 
-    return parse_time_only("08:00:00")
+def get_jadwal_shift():
+    """Jam masuk / pulang shift (detik) yang dipakai rule gaji."""
+    classifier = get_shift_classifier()
+    return {
+        "pagi": classifier.shift_start("PAGI"),
+        "borongan": classifier.shift_start("BORONGAN"),
+        "sore": classifier.shift_start("SORE"),
+        "malam": classifier.shift_start("MALAM"),
+        "pulang_sore": classifier.get("SORE").jam_pulang,
+        "pulang_malam": classifier.get("MALAM").jam_pulang,
+    }
 
 
 # =========================
@@ -178,7 +168,7 @@ def apply_pagi_rules(period1_in):
         }
 
     actual_in = parse_time_only(period1_in)
-    jadwal = parse_time_only("08:00:00")
+    jadwal = get_shift_start("PAGI")
 
     lembur_p1 = 0.0
     potongan_telat = 0
@@ -191,48 +181,30 @@ def apply_pagi_rules(period1_in):
     # telat > 1 menit = potong 10rb
     telat_menit = int((actual_in - jadwal).total_seconds() // 60)
     if telat_menit >= 1:
-        potongan_telat = 10000
+        potongan_telat = POTONGAN_TELAT
 
     return {
         "lembur_p1": lembur_p1,
         "potongan_telat": potongan_telat
     }
 
-def rule_produksi_beku_umum(r, hasil):
-    bagian = (r.get("bagian") or "").strip().lower()
-    gaji_harian = int(r.get("gaji_harian") or 100000)
-
-    p1_in = parse_time_only(r.get("period1_in"))
-    p1_out = parse_time_only(r.get("period1_out"))
-    p2_in = parse_time_only(r.get("period2_in"))
-    p2_out = parse_time_only(r.get("period2_out"))
-    p3_in = parse_time_only(r.get("period3_in"))
-    p3_out = parse_time_only(r.get("period3_out"))
-
-    flags = get_day_flags(r.get("work_date"))
-
-    batas_p1_masuk = parse_time_only("08:00:00")
 
-    if not p1_in:
-        hasil["work_type"] = "none"
-        hasil["gaji_pokok"] = 0
-        hasil["is_valid"] = False
-        hasil["note"] = "Tidak scan masuk P1"
-        return apply_potongan_mes(r, hasil)
-
-    telat_menit = int((p1_in - batas_p1_masuk).total_seconds() // 60)
-    if telat_menit >= 1:
-        hasil["potongan_telat"] = 10000
+# =========================
+# RULE PER BAGIAN
+# s = scan satu karyawan-hari (lihat scan_row), jam dalam detik
+# =========================
+def tidak_valid(s, hasil, note):
+    hasil["is_valid"] = False
+    hasil["note"] = note
+    return apply_potongan_mes(s, hasil)
 
-    if not p1_out:
-        hasil["work_type"] = "none"
-        hasil["gaji_pokok"] = 0
-        hasil["insentif"] = 0
-        hasil["is_valid"] = False
-        hasil["note"] = "Tidak checkout P1, gaji tidak dihitung"
-        return apply_potongan_mes(r, hasil)
+def apply_full_half(s, hasil):
+    gaji_harian = s["gaji_harian"]
 
-    if p1_in and p1_out and p2_in and p2_out:
+    if (
+        s["p1_in"] is not None and s["p1_out"] is not None
+        and s["p2_in"] is not None and s["p2_out"] is not None
+    ):
         hasil["work_type"] = "full"
         hasil["gaji_pokok"] = gaji_harian
     else:
@@ -240,276 +212,193 @@ def rule_produksi_beku_umum(r, hasil):
         hasil["gaji_pokok"] = int(gaji_harian / 2)
         hasil["note"] = "Kerja setengah hari"
 
-    # lembur masuk pagi
-    if p1_in <= parse_time_only("07:10:00"):
-        hasil["gaji_lembur"] += 10000
-    elif parse_time_only("07:11:00") <= p1_in <= parse_time_only("07:35:00"):
-        hasil["gaji_lembur"] += 5000
-
-    # lembur P3
-    if p3_in and p3_out:
-        batas_p3 = parse_time_only("19:00:00")
-        if p3_out > batas_p3:
-            jam_p3 = diff_hours(batas_p3, p3_out)
-            hasil["gaji_lembur"] += lembur_to_uang(jam_p3)
-
-    hasil = apply_insentif_libur(r, hasil)
-    hasil = apply_insentif_lembur_weekend(r, hasil, flags)
-    return apply_potongan_mes(r, hasil)
-
-def rule_borongan(r, hasil):
-    p1_in = parse_time_only(r.get("period1_in"))
-    p1_out = parse_time_only(r.get("period1_out"))
-    p2_in = parse_time_only(r.get("period2_in"))
-    p2_out = parse_time_only(r.get("period2_out"))
-    p3_in = parse_time_only(r.get("period3_in"))
-    p3_out = parse_time_only(r.get("period3_out"))
-
-    flags = get_day_flags(r.get("work_date"))
-
-    if not p1_in or not p1_out:
-        hasil["work_type"] = "none"
-        hasil["gaji_pokok"] = 0
-        hasil["gaji_lembur"] = 0
-        hasil["insentif"] = 0
-        hasil["is_valid"] = False
-        hasil["note"] = "Borongan wajib P1 in dan P1 out"
-        return apply_potongan_mes(r, hasil)
-    batas_p1_masuk = parse_time_only("08:00:00")
-    hasil = apply_potongan_telat(p1_in, batas_p1_masuk, hasil)
-    hasil["gaji_pokok"] = 50000
-
-    if p2_in and p2_out:
-        hasil["work_type"] = "full"
-    else:
-        hasil["work_type"] = "half"
+    return hasil
 
+def apply_lembur_p3(s, hasil):
+    p3_out = s["p3_out"]
+    if s["p3_in"] is not None and p3_out is not None and p3_out > JAM_LEMBUR_P3:
+        hasil["gaji_lembur"] += lembur_to_uang(selisih_jam(JAM_LEMBUR_P3, p3_out))
+    return hasil
 
-    hasil = apply_insentif_libur(r, hasil)
-    hasil = apply_insentif_lembur_weekend(r, hasil, flags)
-    hasil = apply_potongan_telat(p1_in, batas_p1_masuk, hasil)
-    if p3_in and p3_out:
-        hasil["insentif"] += 10000
+def rule_produksi_beku_umum(s, hasil, jadwal):
+    if s["p1_in"] is None:
+        return tidak_valid(s, hasil, "Tidak scan masuk P1")
 
-    return apply_potongan_mes(r, hasil)
+    hasil = apply_potongan_telat(s["p1_in"], jadwal["pagi"], hasil)
 
-def rule_coldroom_sore(r, hasil):
-    gaji_harian = int(r.get("gaji_harian") or 100000)
+    if s["p1_out"] is None:
+        return tidak_valid(s, hasil, "Tidak checkout P1, gaji tidak dihitung")
 
-    p1_in = parse_time_only(r.get("period1_in"))
-    p1_out = parse_time_only(r.get("period1_out"))
-    p2_in = parse_time_only(r.get("period2_in"))
-    p2_out = parse_time_only(r.get("period2_out"))
+    hasil = apply_full_half(s, hasil)
 
-    flags = get_day_flags(r.get("work_date"))
+    # lembur masuk pagi
+    p1_in = s["p1_in"]
+    if p1_in <= LEMBUR_PAGI_PENUH:
+        hasil["gaji_lembur"] += 10000
+    elif LEMBUR_PAGI_SETENGAH[0] <= p1_in <= LEMBUR_PAGI_SETENGAH[1]:
+        hasil["gaji_lembur"] += 5000
 
-    batas_masuk = parse_time_only("13:00:00")
-    batas_lembur = parse_time_only("22:00:00")
+    hasil = apply_lembur_p3(s, hasil)
+    hasil = apply_insentif_libur(s, hasil)
+    hasil = apply_insentif_lembur_weekend(s, hasil, jadwal)
+    return apply_potongan_mes(s, hasil)
 
-    if not p1_in:
-        hasil["work_type"] = "none"
-        hasil["gaji_pokok"] = 0
-        hasil["is_valid"] = False
-        hasil["note"] = "Tidak scan masuk P1"
-        return apply_potongan_mes(r, hasil)
+def rule_borongan(s, hasil, jadwal):
+    if s["p1_in"] is None or s["p1_out"] is None:
+        return tidak_valid(s, hasil, "Borongan wajib P1 in dan P1 out")
 
-    if not p1_out:
-        hasil["work_type"] = "none"
-        hasil["gaji_pokok"] = 0
-        hasil["is_valid"] = False
-        hasil["note"] = "Tidak checkout P1"
-        return apply_potongan_mes(r, hasil)
+    hasil = apply_potongan_telat(s["p1_in"], jadwal["borongan"], hasil)
+    hasil["gaji_pokok"] = GAJI_BORONGAN
 
-    if p1_in and p1_out and p2_in and p2_out:
+    if s["p2_in"] is not None and s["p2_out"] is not None:
         hasil["work_type"] = "full"
-        hasil["gaji_pokok"] = gaji_harian
     else:
         hasil["work_type"] = "half"
-        hasil["gaji_pokok"] = int(gaji_harian / 2)
-        hasil["note"] = "Kerja setengah hari"
 
-    if p2_out:
-        jam_lembur = diff_hours(batas_lembur, p2_out)
-        if jam_lembur > 0:
-            hasil["gaji_lembur"] += lembur_to_uang(jam_lembur)
+    hasil = apply_insentif_libur(s, hasil)
+    if s["p3_in"] is not None and s["p3_out"] is not None:
+        hasil["insentif"] += INSENTIF_P3_BORONGAN
 
-    hasil = apply_insentif_libur(r, hasil)
-    hasil = apply_insentif_lembur_weekend(r, hasil, flags)
-    hasil = apply_potongan_telat(p1_in, batas_masuk, hasil)
-    return apply_potongan_mes(r, hasil)
+    return apply_potongan_mes(s, hasil)
 
-def rule_malam(r, hasil):
-    gaji_harian = int(r.get("gaji_harian") or 100000)
+def rule_coldroom_sore(s, hasil, jadwal):
+    if s["p1_in"] is None:
+        return tidak_valid(s, hasil, "Tidak scan masuk P1")
 
-    p1_in = parse_time_only(r.get("period1_in"))
-    p1_out = parse_time_only(r.get("period1_out"))
+    if s["p1_out"] is None:
+        return tidak_valid(s, hasil, "Tidak checkout P1")
 
-    flags = get_day_flags(r.get("work_date"))
+    hasil = apply_full_half(s, hasil)
 
-    batas_masuk = parse_time_only("22:00:00")
-    batas_normal_pulang = parse_time_only("08:00:00")
+    if s["p2_out"] is not None:
+        jam_lembur = selisih_jam(jadwal["pulang_sore"], s["p2_out"])
+        if jam_lembur > 0:
+            hasil["gaji_lembur"] += lembur_to_uang(jam_lembur)
 
-    if not p1_in:
-        hasil["work_type"] = "none"
-        hasil["gaji_pokok"] = 0
-        hasil["is_valid"] = False
-        hasil["note"] = "Tidak scan masuk malam"
-        return apply_potongan_mes(r, hasil)
+    hasil = apply_insentif_libur(s, hasil)
+    hasil = apply_insentif_lembur_weekend(s, hasil, jadwal)
+    hasil = apply_potongan_telat(s["p1_in"], jadwal["sore"], hasil)
+    return apply_potongan_mes(s, hasil)
 
+def rule_malam(s, hasil, jadwal):
+    if s["p1_in"] is None:
+        return tidak_valid(s, hasil, "Tidak scan masuk malam")
 
-    if not p1_out:
-        hasil["work_type"] = "none"
-        hasil["gaji_pokok"] = 0
-        hasil["is_valid"] = False
-        hasil["note"] = "Shift malam belum checkout"
-        return apply_potongan_mes(r, hasil)
+    if s["p1_out"] is None:
+        return tidak_valid(s, hasil, "Shift malam belum checkout")
 
     hasil["work_type"] = "full"
-    hasil["gaji_pokok"] = gaji_harian
-    hasil = apply_potongan_telat(p1_in, batas_masuk, hasil)
-    jam_lembur = diff_hours(batas_normal_pulang, p1_out)
-    menit_lembur = int(jam_lembur * 60)
+    hasil["gaji_pokok"] = s["gaji_harian"]
+    hasil = apply_potongan_telat(s["p1_in"], jadwal["malam"], hasil)
 
+    menit_lembur = int(selisih_jam(jadwal["pulang_malam"], s["p1_out"]) * 60)
     if menit_lembur >= 15:
         hasil["gaji_lembur"] += ((menit_lembur - 15) // 30 + 1) * 5000
 
-    hasil = apply_insentif_libur(r, hasil)
-    hasil = apply_insentif_lembur_weekend(r, hasil, flags)
-    return apply_potongan_mes(r, hasil)
-
-def rule_training(r, hasil):
-    gaji_harian = int(r.get("gaji_harian") or 100000)
-
-    p1_in = parse_time_only(r.get("period1_in"))
-    p1_out = parse_time_only(r.get("period1_out"))
-    p2_in = parse_time_only(r.get("period2_in"))
-    p2_out = parse_time_only(r.get("period2_out"))
-    p3_in = parse_time_only(r.get("period3_in"))
-    p3_out = parse_time_only(r.get("period3_out"))
-
-    flags = get_day_flags(r.get("work_date"))
-
-    batas_p1_masuk = parse_time_only("08:00:00")
+    hasil = apply_insentif_libur(s, hasil)
+    hasil = apply_insentif_lembur_weekend(s, hasil, jadwal)
+    return apply_potongan_mes(s, hasil)
 
-    if not p1_in:
-        hasil["is_valid"] = False
-        hasil["note"] = "Tidak scan masuk P1"
-        return apply_potongan_mes(r, hasil)
+def rule_training(s, hasil, jadwal):
+    if s["p1_in"] is None:
+        return tidak_valid(s, hasil, "Tidak scan masuk P1")
 
-    if not p1_out:
-        hasil["is_valid"] = False
-        hasil["note"] = "Tidak checkout P1, gaji tidak dihitung"
-        return apply_potongan_mes(r, hasil)
+    if s["p1_out"] is None:
+        return tidak_valid(s, hasil, "Tidak checkout P1, gaji tidak dihitung")
 
-    if p1_in and p1_out and p2_in and p2_out:
-        hasil["work_type"] = "full"
-        hasil["gaji_pokok"] = gaji_harian
-    else:
-        hasil["work_type"] = "half"
-        hasil["gaji_pokok"] = int(gaji_harian / 2)
-        hasil["note"] = "Kerja setengah hari"
+    hasil = apply_full_half(s, hasil)
 
     # tidak ada lembur pagi untuk training
+    hasil = apply_lembur_p3(s, hasil)
+    hasil = apply_potongan_telat(s["p1_in"], jadwal["pagi"], hasil)
+    hasil = apply_insentif_lembur_weekend(s, hasil, jadwal)
+    hasil = apply_insentif_libur(s, hasil)
 
-    if p3_in and p3_out:
-        batas_p3 = parse_time_only("19:00:00")
-        if p3_out > batas_p3:
-            jam_p3 = diff_hours(batas_p3, p3_out)
-            hasil["gaji_lembur"] += lembur_to_uang(jam_p3)
-    hasil = apply_potongan_telat(p1_in, batas_p1_masuk, hasil)
-    hasil = apply_insentif_lembur_weekend(r, hasil, flags)
-    hasil = apply_insentif_libur(r, hasil)
-
-    return apply_potongan_mes(r, hasil)
-
-def rule_kebersihan(r, hasil):
-    gaji_harian = int(r.get("gaji_harian") or 100000)
-
-    p1_in = parse_time_only(r.get("period1_in"))
-    p1_out = parse_time_only(r.get("period1_out"))
-    p2_in = parse_time_only(r.get("period2_in"))
-    p2_out = parse_time_only(r.get("period2_out"))
-
-    flags = get_day_flags(r.get("work_date"))
-
-    batas_p1_masuk = parse_time_only("08:00:00")
+    return apply_potongan_mes(s, hasil)
 
-    if not p1_in:
-        hasil["is_valid"] = False
-        hasil["note"] = "Tidak scan masuk P1"
-        return apply_potongan_mes(r, hasil)
+def rule_kebersihan(s, hasil, jadwal):
+    if s["p1_in"] is None:
+        return tidak_valid(s, hasil, "Tidak scan masuk P1")
 
-    if not p1_out:
-        hasil["is_valid"] = False
-        hasil["note"] = "Tidak checkout P1, gaji tidak dihitung"
-        return apply_potongan_mes(r, hasil)
+    if s["p1_out"] is None:
+        return tidak_valid(s, hasil, "Tidak checkout P1, gaji tidak dihitung")
 
-    if p1_in and p1_out and p2_in and p2_out:
-        hasil["work_type"] = "full"
-        hasil["gaji_pokok"] = gaji_harian
-    else:
-        hasil["work_type"] = "half"
-        hasil["gaji_pokok"] = int(gaji_harian / 2)
-        hasil["note"] = "Kerja setengah hari"
+    hasil = apply_full_half(s, hasil)
 
     # kebersihan tidak ada lembur sama sekali
-    hasil = apply_potongan_telat(p1_in, batas_p1_masuk, hasil)
-    hasil = apply_insentif_libur(r, hasil)
-    return apply_potongan_mes(r, hasil)
+    hasil = apply_potongan_telat(s["p1_in"], jadwal["pagi"], hasil)
+    hasil = apply_insentif_libur(s, hasil)
+    return apply_potongan_mes(s, hasil)
 
 def get_day_flags(work_date):
-    is_sabtu = False
-    is_minggu = False
-    is_hari_besar = False
+    # cache bersama (hari_libur dimuat sekali), jangan diubah
+    return holiday_calendar.day_flags(work_date)
 
-    if work_date:
-        try:
-            dt = datetime.strptime(str(work_date), "%Y-%m-%d")
-            is_sabtu = dt.weekday() == 5
-            is_minggu = dt.weekday() == 6
-        except:
-            pass
 
-    # nanti bisa sambung ke DB hari libur
-    is_hari_besar = cek_libur(work_date)
+def apply_insentif_libur(s, hasil):
+    flags = s["flags"]
 
-    return {
-        "is_sabtu": is_sabtu,
-        "is_minggu": is_minggu,
-        "is_hari_besar": is_hari_besar,
-        "is_tanggal_merah": is_minggu or is_hari_besar,
-        "is_hari_khusus_lembur": is_sabtu or is_minggu or is_hari_besar,
-        "insentif_libur_umum": 20000 if (is_minggu or is_hari_besar) else 0
-    }
-def apply_insentif_libur(r, hasil):
-    work_date = r.get("work_date")
-
-    is_minggu = False
-    is_hari_besar = False
-
-    if work_date:
-        try:
-            dt = datetime.strptime(str(work_date), "%Y-%m-%d")
-            is_minggu = dt.weekday() == 6
-        except:
-            pass
+    if not (flags["is_minggu"] or flags["is_hari_besar"]):
+        return hasil
 
-    is_hari_besar = cek_libur(work_date)
+    hasil["insentif"] += INSENTIF_LIBUR.get(hasil["work_type"], 0)
+    return hasil
 
-    if not (is_minggu or is_hari_besar):
+def apply_potongan_telat(p1_in, batas_masuk, hasil):
+    if p1_in is None:
         return hasil
 
-    if hasil["work_type"] == "full":
-        hasil["insentif"] += 20000
-    elif hasil["work_type"] == "half":
-        hasil["insentif"] += 10000
+    telat_menit = (p1_in - batas_masuk) // 60
+    if telat_menit >= 1:
+        hasil["potongan_telat"] = POTONGAN_TELAT
 
     return hasil
+
+
+BAGIAN_RULE = {
+    "produksi": rule_produksi_beku_umum,
+    "beku": rule_produksi_beku_umum,
+    "umum": rule_produksi_beku_umum,
+    "borongan": rule_borongan,
+    "coldroom": rule_coldroom_sore,
+    "training": rule_training,
+    "kebersihan": rule_kebersihan,
+    "malam": rule_malam,
+}
+
+
 # =========================
 # HITUNG GAJI FINAL HARIAN
 # =========================
-def hitung_gaji_harian_row(r):
+def jam_detik(cache, t):
+    # None / "" -> None; "00:00:00" -> 0 (tetap dianggap ada scan)
+    if not t:
+        return None
+    detik = cache.get(t)
+    if detik is None:
+        dt = parse_time_only(t)
+        detik = dt.hour * 3600 + dt.minute * 60 + dt.second
+        cache[t] = detik
+    return detik
 
+
+def scan_row(r, jam_cache, flags):
+    """Normalisasi satu baris absensi untuk rule per bagian."""
+    return {
+        "bagian": (r.get("bagian") or "").strip().lower(),
+        "gaji_harian": int(r.get("gaji_harian") or GAJI_HARIAN_DEFAULT),
+        "tinggal_di_mes": r.get("tinggal_di_mes"),
+        "flags": flags,
+        "p1_in": jam_detik(jam_cache, r.get("period1_in")),
+        "p1_out": jam_detik(jam_cache, r.get("period1_out")),
+        "p2_in": jam_detik(jam_cache, r.get("period2_in")),
+        "p2_out": jam_detik(jam_cache, r.get("period2_out")),
+        "p3_in": jam_detik(jam_cache, r.get("period3_in")),
+        "p3_out": jam_detik(jam_cache, r.get("period3_out")),
+    }
+
+
+def hitung_gaji_scan(r, s, jadwal):
     hasil = {
         "work_type": "none",
         "gaji_pokok": 0,
@@ -526,29 +415,32 @@ def hitung_gaji_harian_row(r):
         hasil["note"] = "Tidak hadir"
         return hasil
 
-    bagian = (r.get("bagian") or "").strip().lower()
-    if bagian in ["produksi", "beku", "umum"]:
-        return rule_produksi_beku_umum(r, hasil)
-    if bagian == "borongan":
-        return rule_borongan(r, hasil)
-    if bagian == "coldroom":
-        return rule_coldroom_sore(r, hasil)
-    if bagian == "training":
-        return rule_training(r, hasil)
-    if bagian == "kebersihan":
-        return rule_kebersihan(r, hasil)
-    if bagian == "malam":
-        return rule_malam(r, hasil)
-    hasil["is_valid"] = False
-    hasil["note"] = f"Rule bagian belum terdaftar: {bagian}"
-    return apply_potongan_mes(r, hasil)
+    rule = BAGIAN_RULE.get(s["bagian"])
+    if rule is None:
+        return tidak_valid(s, hasil, f"Rule bagian belum terdaftar: {s['bagian']}")
+    return rule(s, hasil, jadwal)
 
-def apply_potongan_telat(p1_in, batas_masuk, hasil):
-    if not p1_in:
-        return hasil
-
-    telat_menit = int((p1_in - batas_masuk).total_seconds() // 60)
-    if telat_menit >= 1:
-        hasil["potongan_telat"] = 10000
 
-    return hasil
+# =========================
+# HITUNG GAJI (BATCH)
+# satu-satunya entry point (payroll_daily); jam di-parse sekali per
+# string unik, flag hari sekali per tanggal, jadwal shift sekali per batch.
+# =========================
+def hitung_gaji_harian_rows(rows):
+    """list of dict absensi + employee -> list hasil gaji harian, urutan sama."""
+    jadwal = get_jadwal_shift()
+    jam_cache = {}
+    flag_cache = {}
+    out = []
+
+    for r in rows:
+        work_date = r.get("work_date")
+        flags = flag_cache.get(work_date)
+        if flags is None:
+            flags = get_day_flags(work_date)
+            flag_cache[work_date] = flags
+
+        s = scan_row(r, jam_cache, flags)
+        out.append(hitung_gaji_scan(r, s, jadwal))
+
+    return out
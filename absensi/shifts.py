@@ -0,0 +1,365 @@
+import threading
+import time
+from bisect import bisect_right
+
+from helpers.db import get_conn
+
+DAY_SECONDS = 24 * 3600
+
+
+def to_seconds(waktu):
+    """'HH:MM:SS' / 'HH:MM' -> detik sejak 00:00."""
+    if not waktu:
+        return None
+    parts = str(waktu).split(":")
+    detik = int(parts[0]) * 3600 + int(parts[1]) * 60
+    if len(parts) > 2:
+        detik += int(parts[2])
+    return detik
+
+
+def format_seconds(detik):
+    detik %= DAY_SECONDS
+    return f"{detik // 3600:02d}:{detik % 3600 // 60:02d}:{detik % 60:02d}"
+
+
+# =========================
+# WINDOW SCAN PER SHIFT
+# (patokan, dari, sampai, kolom): patokan = kolom jam di shift_definitions
+# (jam_masuk / break_start / break_end / jam_pulang), dari/sampai = selisih
+# "±HH:MM[:SS]" dari patokan, inklusif. Jam yang lewat 24:00 masuk hari
+# berikutnya (hari 1 = besok); jam_pulang <= jam_masuk = pulang besok.
+# Window yang tumpang tindih: yang ditulis lebih dulu menang.
+# Kolom *_in ambil scan pertama, *_out scan terakhir,
+# p3 = scan pertama & terakhir (p3_in / p3_out).
+# Nilai di komentar = hasil dengan shift_definitions bawaan.
+# =========================
+SHIFT_WINDOWS = {
+    "PAGI": {
+        "windows": [
+            ("jam_masuk", "-01:30", "+01:00", "p1_in"),         # 06:30 - 09:00
+            ("break_start", "-02:00", "+00:34", "p1_out"),      # 10:00 - 12:34
+            ("break_start", "+00:35", "+02:29", "p2_in"),       # 12:35 - 14:29
+            ("jam_pulang", "-03:00", "+00:31", "p2_out"),       # 14:30 - 18:01
+            ("jam_pulang", "+00:31", "+06:29", "p3"),           # 18:01 - 23:59
+        ],
+        "default_p2_in": ("break_start", "+01:00"),             # 13:00
+        "pulang_sebelum": ("jam_pulang", "+00:00"),             # 17:30
+    },
+    "BORONGAN": {
+        "windows": [
+            ("jam_masuk", "-02:00", "+01:00", "p1_in"),         # 06:00 - 09:00
+            ("break_start", "-01:30", "+00:30", "p1_out"),      # 10:30 - 12:30
+            ("break_start", "+00:30", "+02:30", "p2_in"),       # 12:30 - 14:30
+            ("jam_pulang", "-03:00", "+00:30", "p2_out"),       # 14:30 - 18:00
+            ("jam_pulang", "+00:30", "+06:29", "p3"),           # 18:00 - 23:59
+        ],
+        "default_p2_in": ("break_end", "+00:00"),               # 12:30
+        "telat_setelah": ("jam_masuk", "+00:00"),               # 08:00
+        "pulang_sebelum": ("jam_pulang", "-00:30"),             # 17:00
+    },
+    # P2 bisa lanjut sampai besok dini hari (lembur)
+    "SORE": {
+        "windows": [
+            ("jam_masuk", "-01:00", "+02:00", "p1_in"),         # 12:00 - 15:00
+            ("break_start", "-01:00", "+01:00", "p1_out"),      # 16:30 - 18:30
+            ("break_end", "-01:00", "+02:59:59", "p2_in"),      # 18:00 - 21:59:59
+            ("jam_pulang", "+00:00", "+05:00", "p2_out"),       # 22:00 - besok 03:00
+        ],
+        "default_p2_in": ("break_end", "+00:00"),               # 19:00
+    },
+    # masuk malam ini, pulang besok pagi
+    "MALAM": {
+        "windows": [
+            ("jam_masuk", "-01:00", "+01:59", "p1_in"),         # 21:00 - 23:59
+            ("jam_pulang", "-08:00", "+03:00", "p1_out"),       # besok 00:00 - 11:00
+        ],
+    },
+}
+
+# fallback kalau shift_definitions belum ada / kolomnya kosong
+# (jam_masuk, jam_pulang, normal_hours, break_start, break_end)
+DEFAULT_DEFINITIONS = {
+    "PAGI": ("08:00", "17:30", 8.0, "12:00", "13:30"),
+    "SORE": ("13:00", "22:00", 7.5, "17:30", "19:00"),
+    "MALAM": ("22:00", "08:00", 10.0, None, None),
+    "BORONGAN": ("08:00", "17:30", 8.0, "12:00", "12:30"),
+}
+
+PATOKAN = ("jam_masuk", "jam_pulang", "normal_hours", "break_start", "break_end")
+
+# versi shift_definitions dicek ulang paling cepat tiap N detik
+VERSION_CHECK_INTERVAL = 5
+
+
+def _selisih(teks):
+    """'-01:30' -> -5400 detik."""
+    tanda = -1 if teks.startswith("-") else 1
+    return tanda * to_seconds(teks.lstrip("+-"))
+
+
+def _patokan(definition, default):
+    """Jam patokan (detik dari 00:00 hari shift) 1 shift."""
+    jam = {}
+    for i, nama in enumerate(PATOKAN):
+        if nama == "normal_hours":
+            continue
+        nilai = definition[i] if i < len(definition) and definition[i] else default[i]
+        jam[nama] = to_seconds(nilai)
+
+    if jam["jam_pulang"] is not None and jam["jam_masuk"] is not None \
+            and jam["jam_pulang"] <= jam["jam_masuk"]:
+        jam["jam_pulang"] += DAY_SECONDS
+
+    return jam
+
+
+def _per_hari(mulai, sampai):
+    """Rentang detik absolut -> [(hari, mulai, sampai)] dipotong di 24:00."""
+    hasil = []
+    while mulai <= sampai:
+        hari = mulai // DAY_SECONDS
+        akhir = min(sampai, (hari + 1) * DAY_SECONDS - 1)
+        hasil.append((hari, mulai - hari * DAY_SECONDS, akhir - hari * DAY_SECONDS))
+        mulai = akhir + 1
+    return hasil
+
+
+class ShiftWindows:
+    """Window 1 shift, dipecah jadi segmen tidak tumpang tindih untuk bisect."""
+
+    def __init__(self, shift_code, spec, definition):
+        """definition: (jam_masuk, jam_pulang, normal_hours, break_start, break_end)."""
+        default = DEFAULT_DEFINITIONS[shift_code]
+        jam = _patokan(definition, default)
+
+        self.shift_code = shift_code
+        self.jam_masuk = jam["jam_masuk"]
+        self.jam_pulang = jam["jam_pulang"] % DAY_SECONDS
+        self.normal_hours = definition[2]
+
+        def titik(nama):
+            if nama not in spec:
+                return None
+            patokan, selisih = spec[nama]
+            return (jam[patokan] + _selisih(selisih)) % DAY_SECONDS
+
+        default_p2_in = titik("default_p2_in")
+        self.default_p2_in = format_seconds(default_p2_in) if default_p2_in is not None else None
+        self.telat_setelah = titik("telat_setelah")
+        self.pulang_sebelum = titik("pulang_sebelum")
+
+        # per hari: starts (untuk bisect), ends, kolom
+        self.segments = {}
+        taken = {}
+
+        for patokan, dari, sampai, kolom in spec["windows"]:
+            if jam[patokan] is None:
+                continue
+            mulai = jam[patokan] + _selisih(dari)
+            akhir = jam[patokan] + _selisih(sampai)
+
+            for hari, a0, b0 in _per_hari(mulai, akhir):
+                for a, b in self._sisa(taken.setdefault(hari, []), a0, b0):
+                    self.segments.setdefault(hari, []).append((a, b, kolom))
+                    taken[hari].append((a, b))
+
+        self.lookup = {}
+        for hari, segs in self.segments.items():
+            segs.sort()
+            self.lookup[hari] = (
+                [a for a, _, _ in segs],
+                [b for _, b, _ in segs],
+                [k for _, _, k in segs],
+            )
+
+        # SORE / MALAM butuh scan besok
+        self.max_hari = max(self.segments) if self.segments else 0
+        self.besok_sampai = max(
+            (b for _, b, _ in self.segments.get(1, [])),
+            default=None
+        )
+
+    @staticmethod
+    def _sisa(taken, a, b):
+        """Bagian [a, b] yang belum dipakai window sebelumnya."""
+        parts = [(a, b)]
+        for ta, tb in taken:
+            baru = []
+            for pa, pb in parts:
+                if tb < pa or ta > pb:
+                    baru.append((pa, pb))
+                    continue
+                if pa < ta:
+                    baru.append((pa, ta - 1))
+                if pb > tb:
+                    baru.append((tb + 1, pb))
+            parts = baru
+        return parts
+
+    def classify(self, hari, detik):
+        """Kolom untuk scan (hari, detik), None kalau di luar window."""
+        lookup = self.lookup.get(hari)
+        if not lookup:
+            return None
+
+        starts, ends, kolom = lookup
+        i = bisect_right(starts, detik) - 1
+
+        if i >= 0 and detik <= ends[i]:
+            return kolom[i]
+
+        return None
+
+    def periods(self, waktu_hari_ini, waktu_besok=()):
+        """
+        waktu_* = list 'HH:MM:SS'. Return dict period1_in .. period3_out.
+        """
+        scans = [(0, to_seconds(w)) for w in waktu_hari_ini]
+        if self.max_hari >= 1:
+            scans += [(1, to_seconds(w)) for w in waktu_besok]
+        scans.sort()
+
+        first = {}
+        last = {}
+
+        for hari, detik in scans:
+            kolom = self.classify(hari, detik)
+            if kolom is None:
+                continue
+            first.setdefault(kolom, detik)
+            last[kolom] = detik
+
+        hasil = {
+            "period1_in": first.get("p1_in"),
+            "period1_out": last.get("p1_out"),
+            "period2_in": first.get("p2_in"),
+            "period2_out": last.get("p2_out"),
+            "period3_in": first.get("p3"),
+            "period3_out": last.get("p3"),
+        }
+
+        hasil = {
+            k: format_seconds(v) if v is not None else None
+            for k, v in hasil.items()
+        }
+
+        if self.default_p2_in and hasil["period2_out"] and not hasil["period2_in"]:
+            hasil["period2_in"] = self.default_p2_in
+
+        return hasil
+
+
+class ShiftClassifier:
+
+    def __init__(self, definitions, versi=None):
+        """definitions: {shift_code: (jam_masuk, jam_pulang, normal_hours, break_start, break_end)}"""
+        self.definitions = definitions
+        self.versi = versi
+        self.shifts = {}
+
+        for shift_code, spec in SHIFT_WINDOWS.items():
+            self.shifts[shift_code] = ShiftWindows(
+                shift_code, spec, self._definition(shift_code)
+            )
+
+    def _definition(self, shift_code):
+        return self.definitions.get(shift_code) or DEFAULT_DEFINITIONS.get(shift_code)
+
+    def get(self, shift_code):
+        return self.shifts.get((shift_code or "").strip().upper())
+
+    def normal_hours(self, shift_code):
+        d = self._definition((shift_code or "").strip().upper())
+        return d[2] if d else 0
+
+    def shift_start(self, shift_code):
+        """Jam masuk (detik) dari shift_definitions, default 08:00."""
+        d = self._definition((shift_code or "").strip().upper())
+        return to_seconds(d[0]) if d else to_seconds("08:00")
+
+
+def _read_version(db):
+    try:
+        row = db.execute("""
+            SELECT versi
+            FROM cache_versions
+            WHERE nama = 'shift_definitions'
+        """).fetchone()
+    except Exception:
+        return None
+    return row["versi"] if row else None
+
+
+def load_definitions(db=None):
+    """Return (definitions, versi)."""
+    tutup = db is None
+    try:
+        if db is None:
+            db = get_conn()
+    except Exception:
+        return dict(DEFAULT_DEFINITIONS), None
+
+    try:
+        versi = _read_version(db)
+        rows = db.execute("""
+            SELECT shift_code, jam_masuk, jam_pulang, normal_hours,
+                   break_start, break_end
+            FROM shift_definitions
+        """).fetchall()
+    except Exception:
+        return dict(DEFAULT_DEFINITIONS), None
+    finally:
+        if tutup:
+            db.close()
+
+    return {
+        r["shift_code"]: (
+            r["jam_masuk"], r["jam_pulang"], r["normal_hours"],
+            r["break_start"], r["break_end"]
+        )
+        for r in rows
+    }, versi
+
+
+_classifier = None
+_checked_at = 0.0
+_lock = threading.Lock()
+
+
+def get_shift_classifier():
+    """
+    Classifier dari shift_definitions. Dibangun ulang kalau versi di
+    cache_versions berubah (trigger shift_definitions), dicek paling cepat
+    tiap VERSION_CHECK_INTERVAL detik.
+    """
+    global _classifier, _checked_at
+
+    with _lock:
+        now = time.monotonic()
+
+        if _classifier is not None and now - _checked_at < VERSION_CHECK_INTERVAL:
+            return _classifier
+
+        if _classifier is not None and _classifier.versi is not None:
+            db = get_conn()
+            try:
+                versi = _read_version(db)
+            finally:
+                db.close()
+
+            if versi == _classifier.versi:
+                _checked_at = now
+                return _classifier
+
+        _classifier = ShiftClassifier(*load_definitions())
+        _checked_at = now
+        return _classifier
+
+
+def reload_shift_classifier():
+    """Paksa baca ulang shift_definitions (dipanggil setelah shift diedit)."""
+    global _classifier
+    with _lock:
+        _classifier = None
+    return get_shift_classifier()
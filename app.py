@@ -14,6 +14,7 @@ from receiving.service import update_receiving
 from receiving.routes import receiving_bp
 from helpers.db import init_db, get_conn
 from karyawan.routes import karyawan_bp
+from absensi.shifts import reload_shift_classifier
 
 
 # init database
@@ -168,6 +169,12 @@ def admin_db_table_view(table_name):
 
     finally:
         conn.close()
+def after_admin_edit(table):
+    # proses ini langsung pakai shift baru; proses lain lewat cache_versions
+    if table == "shift_definitions":
+        reload_shift_classifier()
+
+
 @app.post("/admin/db/delete/<table_name>/<int:row_id>")
 def admin_db_delete(table_name, row_id):
 
@@ -190,6 +197,7 @@ def admin_db_delete(table_name, row_id):
         )
 
         conn.commit()
+        after_admin_edit(table_name)
 
         return {"ok": True}
 
@@ -214,6 +222,7 @@ def admin_db_add(table):
         )
 
         conn.commit()
+        after_admin_edit(table)
 
         return redirect(f"/admin/db/table/{table}")
 
@@ -243,6 +252,7 @@ def admin_db_edit(table,id):
         )
 
         conn.commit()
+        after_admin_edit(table)
 
         return redirect(f"/admin/db/table/{table}")
 
@@ -29,13 +29,22 @@ try:
         WHERE receiving_id IN ({placeholders})
     """, receiving_ids)
 
-    # 4️⃣ Hapus receiving_item
+    # 4️⃣ Hapus timbangan per keranjang (tanpa PRAGMA foreign_keys, cascade tidak jalan)
+    cur.execute(f"""
+        DELETE FROM receiving_weighing
+        WHERE item_id IN (
+            SELECT id FROM receiving_item
+            WHERE header_id IN ({placeholders})
+        )
+    """, receiving_ids)
+
+    # 5️⃣ Hapus receiving_item
     cur.execute(f"""
         DELETE FROM receiving_item
         WHERE header_id IN ({placeholders})
     """, receiving_ids)
 
-    # 5️⃣ Hapus receiving_header
+    # 6️⃣ Hapus receiving_header
     cur.execute(f"""
         DELETE FROM receiving_header
         WHERE id IN ({placeholders})
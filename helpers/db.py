@@ -1,5 +1,9 @@
 import sqlite3
 import os
+import threading
+import time
+
+from helpers.query_plan import check_query_plans
 
 
 # 1️⃣ Cek environment variable dulu
@@ -13,12 +17,215 @@ if not DB_PATH:
 print("🗄️ Database aktif:", DB_PATH)
 
 
+# Jumlah maksimal koneksi idle yang disimpan di pool
+POOL_SIZE = int(os.environ.get("RECEIVING_DB_POOL_SIZE") or 8)
+
+# Jumlah maksimal koneksi yang terbuka sekaligus (dipinjam + idle)
+POOL_MAX_OPEN = int(os.environ.get("RECEIVING_DB_POOL_MAX_OPEN") or 32)
+
+# Lama menunggu koneksi bebas kalau semua sedang dipinjam (detik)
+POOL_TIMEOUT = float(os.environ.get("RECEIVING_DB_POOL_TIMEOUT") or 30)
+
+
+class PooledConnection:
+    """
+    Pembungkus koneksi sqlite dari pool.
+    Dipakai persis seperti sqlite3.Connection, bedanya close()
+    mengembalikan koneksi ke pool, bukan menutupnya.
+    Setelah close(), handle ini mati (tidak bisa dipakai lagi),
+    jadi close() dua kali tetap aman.
+    """
+
+    __slots__ = ("_conn", "_pool")
+
+    def __init__(self, conn, pool):
+        object.__setattr__(self, "_conn", conn)
+        object.__setattr__(self, "_pool", pool)
+
+    def _raw(self):
+        conn = self._conn
+        if conn is None:
+            raise sqlite3.ProgrammingError("Cannot operate on a closed database.")
+        return conn
+
+    def __getattr__(self, name):
+        if name in PooledConnection.__slots__:
+            raise AttributeError(name)
+        return getattr(self._raw(), name)
+
+    def __setattr__(self, name, value):
+        # contoh: conn.row_factory = ...
+        setattr(self._raw(), name, value)
+
+    def __enter__(self):
+        self._raw().__enter__()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return self._raw().__exit__(exc_type, exc, tb)
+
+    def close(self):
+        conn = self._conn
+        if conn is None:
+            return
+        object.__setattr__(self, "_conn", None)
+        self._pool.release(conn)
+
+    def __del__(self):
+        # koneksi yang lupa di-close tetap balik ke pool
+        try:
+            self.close()
+        except Exception:
+            pass
+
+
+class ConnectionPool:
+    """
+    Pool koneksi sqlite yang dipakai bersama oleh semua blueprint
+    dan worker absensi (thread-safe).
+
+    - PRAGMA di-set sekali saat koneksi fisik dibuat
+    - koneksi dicek (SELECT 1) sebelum dipinjamkan
+    - maksimal `max_open` koneksi dipinjam sekaligus; acquire() menunggu
+      (paling lama `timeout` detik) sampai ada yang dikembalikan
+    - maksimal `size` koneksi idle, sisanya langsung ditutup
+
+    Koneksi baru hanya dibuat kalau tidak ada yang idle, jadi total
+    koneksi terbuka tidak pernah lebih dari `max_open`.
+    """
+
+    def __init__(self, db_path, size=POOL_SIZE, max_open=POOL_MAX_OPEN, timeout=POOL_TIMEOUT):
+        self.db_path = db_path
+        self.size = min(size, max_open)
+        self.max_open = max_open
+        self.timeout = timeout
+        self._idle = []
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(max_open)
+
+    def _connect(self):
+        # check_same_thread=False: koneksi boleh dipinjam thread lain
+        # setelah dikembalikan, tapi tetap dipakai 1 thread dalam 1 waktu
+        conn = sqlite3.connect(self.db_path, timeout=30, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA foreign_keys = ON;")
+        conn.execute("PRAGMA journal_mode = WAL;")
+        register_functions(conn)
+        return conn
+
+    @staticmethod
+    def _is_healthy(conn):
+        try:
+            conn.execute("SELECT 1").fetchone()
+            return True
+        except sqlite3.Error:
+            return False
+
+    def acquire(self):
+        if not self._slots.acquire(timeout=self.timeout):
+            raise sqlite3.OperationalError(
+                f"Pool koneksi penuh ({self.max_open} dipinjam), "
+                f"tidak ada yang kembali dalam {self.timeout:g} detik"
+            )
+
+        try:
+            while True:
+                with self._lock:
+                    conn = self._idle.pop() if self._idle else None
+
+                if conn is None:
+                    conn = self._connect()
+                    break
+
+                if self._is_healthy(conn):
+                    break
+
+                self._discard(conn)
+        except BaseException:
+            self._slots.release()
+            raise
+
+        return PooledConnection(conn, self)
+
+    def release(self, conn):
+        try:
+            self._simpan_idle(conn)
+        finally:
+            self._slots.release()
+
+    def _simpan_idle(self, conn):
+        try:
+            # sama seperti close(): transaksi yang belum di-commit dibuang
+            if conn.in_transaction:
+                conn.rollback()
+            conn.row_factory = sqlite3.Row
+        except sqlite3.Error:
+            self._discard(conn)
+            return
+
+        with self._lock:
+            if len(self._idle) < self.size:
+                self._idle.append(conn)
+                return
+
+        self._discard(conn)
+
+    @staticmethod
+    def _discard(conn):
+        try:
+            conn.close()
+        except sqlite3.Error:
+            pass
+
+    def close_all(self):
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for conn in idle:
+            self._discard(conn)
+
+
+_pool = ConnectionPool(DB_PATH)
+
+
+def py_round(value):
+    # pembulatan sama dengan int(round(x or 0)) di Python (banker's rounding)
+    return int(round(value or 0))
+
+
+def register_functions(conn):
+    """Fungsi SQL tambahan: PY_ROUND(x)."""
+    conn.create_function("PY_ROUND", 1, py_round, deterministic=True)
+
+
 def get_conn():
-    conn = sqlite3.connect(DB_PATH, timeout=30)
-    conn.row_factory = sqlite3.Row
-    conn.execute("PRAGMA foreign_keys = ON;")
-    conn.execute("PRAGMA journal_mode = WAL;")
-    return conn
+    """
+    Pinjam koneksi dari pool. Panggil conn.close() seperti biasa
+    untuk mengembalikannya.
+    """
+    return _pool.acquire()
+
+
+# BEGIN IMMEDIATE: ulangi kalau DB masih dikunci penulis lain
+BUSY_RETRIES = 5
+BUSY_BACKOFF = 0.05
+
+
+def begin_immediate(conn, retries=BUSY_RETRIES):
+    """Mulai transaksi tulis (kunci di awal), retry dengan backoff kalau busy."""
+    for percobaan in range(retries + 1):
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            return
+        except sqlite3.OperationalError as e:
+            pesan = str(e).lower()
+            if percobaan >= retries or ("locked" not in pesan and "busy" not in pesan):
+                raise
+            time.sleep(BUSY_BACKOFF * 2 ** percobaan)
+
+
+def close_pool():
+    _pool.close_all()
+
 
 def ensure_column(conn, table, column, definition):
     cols = [r["name"] for r in conn.execute(f"PRAGMA table_info({table})").fetchall()]
@@ -597,13 +804,34 @@ ON attendance_raw (fingerprint_id, tanggal, waktu);
         SET mode='manual_grade'
         WHERE LOWER(nama)='kupasan'
         """)
-        conn.execute("""INSERT OR REPLACE INTO shift_definitions
+        # upsert hanya kalau beda: trigger shift_definitions (cache + gaji dirty)
+        # tidak ikut jalan tiap start
+        conn.execute("""INSERT INTO shift_definitions
         (shift_code, nama_shift, jam_masuk, jam_pulang, break_start, break_end, lintas_hari, normal_hours, toleransi_telat_menit, minimal_lembur_menit)
         VALUES
         ('PAGI',  'Shift Pagi',  '08:00', '17:30', '12:00', '13:30', 0, 8.0, 10, 30),
         ( 'SORE',  'Shift Sore',  '13:00', '22:00', '17:30', '19:00', 0, 7.5, 10, 30),
         ('MALAM', 'Shift Malam', '22:00', '08:00', NULL,    NULL,    1, 10.0, 10, 30),
-        ('BORONGAN', 'Shift Borongan', '08:00', '17:30', '12:00', '12:30', 0, 8.0, 10, 30);""")
+        ('BORONGAN', 'Shift Borongan', '08:00', '17:30', '12:00', '12:30', 0, 8.0, 10, 30)
+        ON CONFLICT(shift_code) DO UPDATE SET
+            nama_shift = excluded.nama_shift,
+            jam_masuk = excluded.jam_masuk,
+            jam_pulang = excluded.jam_pulang,
+            break_start = excluded.break_start,
+            break_end = excluded.break_end,
+            lintas_hari = excluded.lintas_hari,
+            normal_hours = excluded.normal_hours,
+            toleransi_telat_menit = excluded.toleransi_telat_menit,
+            minimal_lembur_menit = excluded.minimal_lembur_menit
+        WHERE (
+            nama_shift, jam_masuk, jam_pulang, break_start, break_end,
+            lintas_hari, normal_hours, toleransi_telat_menit, minimal_lembur_menit
+        ) IS NOT (
+            excluded.nama_shift, excluded.jam_masuk, excluded.jam_pulang,
+            excluded.break_start, excluded.break_end, excluded.lintas_hari,
+            excluded.normal_hours, excluded.toleransi_telat_menit,
+            excluded.minimal_lembur_menit
+        );""")
         conn.execute("""
             UPDATE master_jenis
             SET mode='udang_size'
@@ -621,9 +849,413 @@ ON attendance_raw (fingerprint_id, tanggal, waktu);
         ensure_column(conn, "employees", "gaji_harian", "INTEGER DEFAULT 0")
         ensure_column(conn, "employees", "tinggal_di_mes", "INTEGER DEFAULT 0")
         ensure_column(conn, "payroll_history","status","TEXT DEFAULT 'draft'")
+        # =========================
+        # mesin absensi (collector)
+        # =========================
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS attendance_devices (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                nama TEXT NOT NULL,
+                ip TEXT NOT NULL,
+                port INTEGER NOT NULL DEFAULT 4370,
+                timeout INTEGER NOT NULL DEFAULT 10,
+                force_udp INTEGER NOT NULL DEFAULT 0,
+                password INTEGER NOT NULL DEFAULT 0,
+                sumber TEXT NOT NULL DEFAULT 'mb460',
+                aktif INTEGER NOT NULL DEFAULT 1,
+                created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+                UNIQUE(ip, port)
+            )
+        """)
+        conn.execute("""
+            INSERT OR IGNORE INTO attendance_devices (nama, ip, port, sumber)
+            VALUES ('MB460', '192.168.1.201', 4370, 'mb460')
+        """)
+        # sumber = watermark get_last_scan per mesin (absensi/collector.py):
+        # 2 mesin dengan sumber sama saling menggeser watermark dan scan
+        # lama mesin lain ikut terlewat. Duplikat lama dibuat unik
+        # (sumber_id); watermark mesin itu mulai dari awal, scan yang sudah
+        # ada diabaikan oleh idx_attendance_raw_unique.
+        conn.executescript("""
+            UPDATE attendance_devices
+            SET sumber = sumber || '_' || id
+            WHERE id NOT IN (
+                SELECT MIN(id)
+                FROM attendance_devices
+                GROUP BY sumber
+            );
+
+            CREATE UNIQUE INDEX IF NOT EXISTS idx_attendance_devices_sumber
+            ON attendance_devices (sumber);
+        """)
+        # =========================
+        # versi cache (naik otomatis lewat trigger)
+        # =========================
+        conn.executescript("""
+            CREATE TABLE IF NOT EXISTS cache_versions (
+                nama TEXT PRIMARY KEY,
+                versi INTEGER NOT NULL DEFAULT 0
+            );
+            INSERT OR IGNORE INTO cache_versions (nama, versi) VALUES ('hari_libur', 0);
+
+            CREATE TRIGGER IF NOT EXISTS trg_hari_libur_ins AFTER INSERT ON hari_libur
+            BEGIN
+                UPDATE cache_versions SET versi = versi + 1 WHERE nama = 'hari_libur';
+            END;
+            CREATE TRIGGER IF NOT EXISTS trg_hari_libur_upd AFTER UPDATE ON hari_libur
+            BEGIN
+                UPDATE cache_versions SET versi = versi + 1 WHERE nama = 'hari_libur';
+            END;
+            CREATE TRIGGER IF NOT EXISTS trg_hari_libur_del AFTER DELETE ON hari_libur
+            BEGIN
+                UPDATE cache_versions SET versi = versi + 1 WHERE nama = 'hari_libur';
+            END;
+
+            -- window shift dibangun dari shift_definitions (absensi/shifts.py)
+            INSERT OR IGNORE INTO cache_versions (nama, versi) VALUES ('shift_definitions', 0);
+
+            CREATE TRIGGER IF NOT EXISTS trg_shift_definitions_ins AFTER INSERT ON shift_definitions
+            BEGIN
+                UPDATE cache_versions SET versi = versi + 1 WHERE nama = 'shift_definitions';
+            END;
+            CREATE TRIGGER IF NOT EXISTS trg_shift_definitions_upd AFTER UPDATE ON shift_definitions
+            BEGIN
+                UPDATE cache_versions SET versi = versi + 1 WHERE nama = 'shift_definitions';
+            END;
+            CREATE TRIGGER IF NOT EXISTS trg_shift_definitions_del AFTER DELETE ON shift_definitions
+            BEGIN
+                UPDATE cache_versions SET versi = versi + 1 WHERE nama = 'shift_definitions';
+            END;
+
+            -- versi per periode untuk cache slip / receipt (karyawan/slip_cache.py),
+            -- termasuk edit langsung; periode lain tidak ikut berubah
+            CREATE TABLE IF NOT EXISTS payroll_period_versions (
+                tanggal_awal TEXT NOT NULL,
+                tanggal_akhir TEXT NOT NULL,
+                versi INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (tanggal_awal, tanggal_akhir)
+            );
+
+            CREATE TRIGGER IF NOT EXISTS trg_ppv_payroll_history_ins AFTER INSERT ON payroll_history
+            BEGIN
+                INSERT INTO payroll_period_versions (tanggal_awal, tanggal_akhir, versi)
+                VALUES (NEW.tanggal_awal, NEW.tanggal_akhir, 1)
+                ON CONFLICT(tanggal_awal, tanggal_akhir) DO UPDATE SET versi = versi + 1;
+            END;
+            CREATE TRIGGER IF NOT EXISTS trg_ppv_payroll_history_upd AFTER UPDATE ON payroll_history
+            BEGIN
+                INSERT INTO payroll_period_versions (tanggal_awal, tanggal_akhir, versi)
+                VALUES (OLD.tanggal_awal, OLD.tanggal_akhir, 1)
+                ON CONFLICT(tanggal_awal, tanggal_akhir) DO UPDATE SET versi = versi + 1;
+                INSERT INTO payroll_period_versions (tanggal_awal, tanggal_akhir, versi)
+                VALUES (NEW.tanggal_awal, NEW.tanggal_akhir, 1)
+                ON CONFLICT(tanggal_awal, tanggal_akhir) DO UPDATE SET versi = versi + 1;
+            END;
+            CREATE TRIGGER IF NOT EXISTS trg_ppv_payroll_history_del AFTER DELETE ON payroll_history
+            BEGIN
+                INSERT INTO payroll_period_versions (tanggal_awal, tanggal_akhir, versi)
+                VALUES (OLD.tanggal_awal, OLD.tanggal_akhir, 1)
+                ON CONFLICT(tanggal_awal, tanggal_akhir) DO UPDATE SET versi = versi + 1;
+            END;
+            CREATE TRIGGER IF NOT EXISTS trg_ppv_payroll_items_ins AFTER INSERT ON payroll_items
+            BEGIN
+                INSERT INTO payroll_period_versions (tanggal_awal, tanggal_akhir, versi)
+                SELECT tanggal_awal, tanggal_akhir, 1
+                FROM payroll_history
+                WHERE id = NEW.payroll_id
+                ON CONFLICT(tanggal_awal, tanggal_akhir) DO UPDATE SET versi = versi + 1;
+            END;
+            CREATE TRIGGER IF NOT EXISTS trg_ppv_payroll_items_upd AFTER UPDATE ON payroll_items
+            BEGIN
+                INSERT INTO payroll_period_versions (tanggal_awal, tanggal_akhir, versi)
+                SELECT tanggal_awal, tanggal_akhir, 1
+                FROM payroll_history
+                WHERE id = OLD.payroll_id
+                ON CONFLICT(tanggal_awal, tanggal_akhir) DO UPDATE SET versi = versi + 1;
+                INSERT INTO payroll_period_versions (tanggal_awal, tanggal_akhir, versi)
+                SELECT tanggal_awal, tanggal_akhir, 1
+                FROM payroll_history
+                WHERE id = NEW.payroll_id
+                ON CONFLICT(tanggal_awal, tanggal_akhir) DO UPDATE SET versi = versi + 1;
+            END;
+            CREATE TRIGGER IF NOT EXISTS trg_ppv_payroll_items_del AFTER DELETE ON payroll_items
+            BEGIN
+                INSERT INTO payroll_period_versions (tanggal_awal, tanggal_akhir, versi)
+                SELECT tanggal_awal, tanggal_akhir, 1
+                FROM payroll_history
+                WHERE id = OLD.payroll_id
+                ON CONFLICT(tanggal_awal, tanggal_akhir) DO UPDATE SET versi = versi + 1;
+            END;
+        """)
+        # =========================
+        # payroll_daily_computed
+        # hasil rule gaji per (employee, tanggal), di-refresh dari dirty
+        # =========================
+        conn.executescript("""
+            CREATE TABLE IF NOT EXISTS payroll_daily_computed (
+                employee_id INTEGER NOT NULL,
+                work_date TEXT NOT NULL,
+                tinggal_di_mes INTEGER NOT NULL DEFAULT 0,
+                work_type TEXT NOT NULL DEFAULT 'none',
+                gaji_pokok INTEGER NOT NULL DEFAULT 0,
+                gaji_lembur INTEGER NOT NULL DEFAULT 0,
+                insentif INTEGER NOT NULL DEFAULT 0,
+                potongan_telat INTEGER NOT NULL DEFAULT 0,
+                potongan_mes INTEGER NOT NULL DEFAULT 0,
+                gaji_final INTEGER NOT NULL DEFAULT 0,
+                note TEXT,
+                is_valid INTEGER NOT NULL DEFAULT 1,
+                updated_at TEXT DEFAULT CURRENT_TIMESTAMP,
+                PRIMARY KEY (employee_id, work_date)
+            );
+            CREATE INDEX IF NOT EXISTS idx_payroll_daily_computed_date
+            ON payroll_daily_computed (work_date);
+
+            -- work_date '*' = semua tanggal karyawan tsb
+            CREATE TABLE IF NOT EXISTS payroll_daily_dirty (
+                employee_id INTEGER NOT NULL,
+                work_date TEXT NOT NULL,
+                PRIMARY KEY (employee_id, work_date)
+            );
+
+            CREATE TRIGGER IF NOT EXISTS trg_pdc_attendance_ins AFTER INSERT ON attendance_daily
+            BEGIN
+                INSERT OR IGNORE INTO payroll_daily_dirty VALUES (NEW.employee_id, NEW.work_date);
+            END;
+            CREATE TRIGGER IF NOT EXISTS trg_pdc_attendance_upd AFTER UPDATE ON attendance_daily
+            BEGIN
+                INSERT OR IGNORE INTO payroll_daily_dirty VALUES (OLD.employee_id, OLD.work_date);
+                INSERT OR IGNORE INTO payroll_daily_dirty VALUES (NEW.employee_id, NEW.work_date);
+            END;
+            CREATE TRIGGER IF NOT EXISTS trg_pdc_attendance_del AFTER DELETE ON attendance_daily
+            BEGIN
+                INSERT OR IGNORE INTO payroll_daily_dirty VALUES (OLD.employee_id, OLD.work_date);
+            END;
+
+            CREATE TRIGGER IF NOT EXISTS trg_pdc_employee_upd
+            AFTER UPDATE OF bagian, gaji_harian ON employees
+            BEGIN
+                INSERT OR IGNORE INTO payroll_daily_dirty VALUES (NEW.id, '*');
+            END;
+
+            CREATE TRIGGER IF NOT EXISTS trg_pdc_mes_ins AFTER INSERT ON employee_mes_history
+            BEGIN
+                INSERT OR IGNORE INTO payroll_daily_dirty VALUES (NEW.employee_id, '*');
+            END;
+            CREATE TRIGGER IF NOT EXISTS trg_pdc_mes_upd AFTER UPDATE ON employee_mes_history
+            BEGIN
+                INSERT OR IGNORE INTO payroll_daily_dirty VALUES (OLD.employee_id, '*');
+                INSERT OR IGNORE INTO payroll_daily_dirty VALUES (NEW.employee_id, '*');
+            END;
+            CREATE TRIGGER IF NOT EXISTS trg_pdc_mes_del AFTER DELETE ON employee_mes_history
+            BEGIN
+                INSERT OR IGNORE INTO payroll_daily_dirty VALUES (OLD.employee_id, '*');
+            END;
+
+            CREATE TRIGGER IF NOT EXISTS trg_pdc_libur_ins AFTER INSERT ON hari_libur
+            BEGIN
+                INSERT OR IGNORE INTO payroll_daily_dirty
+                SELECT employee_id, work_date FROM attendance_daily WHERE work_date = NEW.tanggal;
+            END;
+            CREATE TRIGGER IF NOT EXISTS trg_pdc_libur_upd AFTER UPDATE ON hari_libur
+            BEGIN
+                INSERT OR IGNORE INTO payroll_daily_dirty
+                SELECT employee_id, work_date FROM attendance_daily
+                WHERE work_date IN (OLD.tanggal, NEW.tanggal);
+            END;
+            CREATE TRIGGER IF NOT EXISTS trg_pdc_libur_del AFTER DELETE ON hari_libur
+            BEGIN
+                INSERT OR IGNORE INTO payroll_daily_dirty
+                SELECT employee_id, work_date FROM attendance_daily WHERE work_date = OLD.tanggal;
+            END;
+
+            -- jam shift dipakai rule gaji per bagian (rules.get_jadwal_shift),
+            -- bukan per shift_default: semua karyawan dihitung ulang
+            CREATE TRIGGER IF NOT EXISTS trg_pdc_shift_ins AFTER INSERT ON shift_definitions
+            BEGIN
+                INSERT OR IGNORE INTO payroll_daily_dirty SELECT id, '*' FROM employees;
+            END;
+            CREATE TRIGGER IF NOT EXISTS trg_pdc_shift_upd AFTER UPDATE ON shift_definitions
+            BEGIN
+                INSERT OR IGNORE INTO payroll_daily_dirty SELECT id, '*' FROM employees;
+            END;
+            CREATE TRIGGER IF NOT EXISTS trg_pdc_shift_del AFTER DELETE ON shift_definitions
+            BEGIN
+                INSERT OR IGNORE INTO payroll_daily_dirty SELECT id, '*' FROM employees;
+            END;
+
+            -- data lama yang belum pernah dihitung
+            INSERT OR IGNORE INTO payroll_daily_dirty (employee_id, work_date)
+            SELECT a.employee_id, a.work_date
+            FROM attendance_daily a
+            LEFT JOIN payroll_daily_computed c
+                ON c.employee_id = a.employee_id
+               AND c.work_date = a.work_date
+            WHERE c.employee_id IS NULL;
+        """)
+
+        # =========================
+        # TIMBANGAN PER KERANJANG (receiving/weighing.py)
+        # pengganti receiving_item.timbangan_json
+        # =========================
+        conn.executescript("""
+            CREATE TABLE IF NOT EXISTS receiving_weighing (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                item_id INTEGER NOT NULL,
+                urutan INTEGER NOT NULL,
+                berat REAL NOT NULL,
+                UNIQUE (item_id, urutan),
+                FOREIGN KEY(item_id)
+                    REFERENCES receiving_item(id)
+                    ON DELETE CASCADE
+            );
+
+            -- migrasi data lama: JSON -> baris, hanya partai yang belum punya
+            -- baris timbangan; berat <= 0 / bukan angka dibuang
+            -- (sama dengan hitung_partai)
+            INSERT INTO receiving_weighing (item_id, urutan, berat)
+            SELECT
+                item_id,
+                ROW_NUMBER() OVER (PARTITION BY item_id ORDER BY pos),
+                berat
+            FROM (
+                SELECT
+                    i.id AS item_id,
+                    j.key AS pos,
+                    CAST(REPLACE(TRIM(j.value), ',', '.') AS REAL) AS berat
+                FROM receiving_item i, json_each(i.timbangan_json) j
+                WHERE i.timbangan_json IS NOT NULL
+                  AND json_valid(i.timbangan_json)
+                  AND json_type(i.timbangan_json) = 'array'
+                  AND NOT EXISTS (
+                        SELECT 1
+                        FROM receiving_weighing w
+                        WHERE w.item_id = i.id
+                  )
+            )
+            WHERE berat > 0;
+
+            -- sudah dipindah: kosongkan supaya tidak dimigrasi ulang;
+            -- JSON rusak / bukan array dibiarkan untuk dicek manual
+            UPDATE receiving_item
+            SET timbangan_json = NULL
+            WHERE timbangan_json IS NOT NULL
+              AND json_valid(timbangan_json)
+              AND json_type(timbangan_json) = 'array';
+        """)
+
+        # =========================
+        # NOMOR DOKUMEN (helpers/sequences.py)
+        # nilai = nomor terakhir yang sudah dipakai
+        # =========================
+        conn.executescript("""
+            CREATE TABLE IF NOT EXISTS sequences (
+                nama TEXT PRIMARY KEY,
+                nilai INTEGER NOT NULL DEFAULT 0
+            );
+
+            INSERT OR IGNORE INTO sequences (nama, nilai)
+            VALUES ('receiving_no', 0);
+
+            -- jangan sampai di belakang data yang sudah ada
+            UPDATE sequences
+            SET nilai = MAX(
+                nilai,
+                (SELECT COALESCE(MAX(receiving_no), 0) FROM receiving_header)
+            )
+            WHERE nama = 'receiving_no';
+        """)
+
+        # =========================
+        # DAFTAR PARTISI ARSIP attendance_raw (absensi/archive.py)
+        # sampai = raw processed dengan tanggal < sampai sudah diarsip
+        # =========================
+        conn.executescript("""
+            CREATE TABLE IF NOT EXISTS attendance_raw_archive (
+                bulan TEXT PRIMARY KEY,
+                nama_tabel TEXT NOT NULL,
+                sampai TEXT NOT NULL,
+                jumlah INTEGER NOT NULL DEFAULT 0,
+                updated_at DATETIME DEFAULT CURRENT_TIMESTAMP
+            );
+        """)
+
+        # =========================
+        # INDEX QUERY ABSENSI / PAYROLL
+        # (borongan_logs(tanggal, no_id) sudah ada dari UNIQUE)
+        # =========================
+        conn.executescript("""
+            CREATE INDEX IF NOT EXISTS idx_attendance_daily_work_date
+            ON attendance_daily (work_date);
+
+            -- antrian raw belum diproses: partial index, isinya hanya
+            -- baris processed = 0 (processed NULL diisi 0 oleh trigger)
+            DROP INDEX IF EXISTS idx_attendance_raw_processed;
+
+            UPDATE attendance_raw
+            SET processed = 0
+            WHERE processed IS NULL;
+
+            CREATE TRIGGER IF NOT EXISTS trg_attendance_raw_processed_ins
+            AFTER INSERT ON attendance_raw
+            WHEN NEW.processed IS NULL
+            BEGIN
+                UPDATE attendance_raw SET processed = 0 WHERE id = NEW.id;
+            END;
+            CREATE TRIGGER IF NOT EXISTS trg_attendance_raw_processed_upd
+            AFTER UPDATE OF processed ON attendance_raw
+            WHEN NEW.processed IS NULL
+            BEGIN
+                UPDATE attendance_raw SET processed = 0 WHERE id = NEW.id;
+            END;
+
+            CREATE INDEX IF NOT EXISTS idx_attendance_raw_pending
+            ON attendance_raw (fingerprint_id, tanggal, waktu)
+            WHERE processed = 0;
+
+            -- processed: 0 = antri, 1 = dipakai baris harian, 2 = sudah
+            -- diperiksa tapi tidak dipakai (fingerprint tanpa karyawan aktif,
+            -- scan MALAM di luar jendela shift). 2 keluar dari antrian dan
+            -- ikut diarsip; masuk antrian lagi kalau karyawannya berubah.
+            CREATE TRIGGER IF NOT EXISTS trg_attendance_raw_unused_emp_ins
+            AFTER INSERT ON employees
+            WHEN NEW.fingerprint_id IS NOT NULL
+            BEGIN
+                UPDATE attendance_raw SET processed = 0
+                WHERE fingerprint_id = NEW.fingerprint_id
+                  AND processed = 2;
+            END;
+            CREATE TRIGGER IF NOT EXISTS trg_attendance_raw_unused_emp_upd
+            AFTER UPDATE OF fingerprint_id, status_aktif, shift_default ON employees
+            WHEN NEW.fingerprint_id IS NOT NULL
+             AND (
+                    NEW.fingerprint_id IS NOT OLD.fingerprint_id
+                    OR NEW.status_aktif IS NOT OLD.status_aktif
+                    OR NEW.shift_default IS NOT OLD.shift_default
+             )
+            BEGIN
+                UPDATE attendance_raw SET processed = 0
+                WHERE fingerprint_id = NEW.fingerprint_id
+                  AND processed = 2;
+            END;
+
+            CREATE INDEX IF NOT EXISTS idx_employee_items_status_tanggal
+            ON employee_items (status, tanggal, employee_id);
+
+            CREATE INDEX IF NOT EXISTS idx_employee_mes_history_employee
+            ON employee_mes_history (employee_id, tanggal_mulai);
+
+            CREATE INDEX IF NOT EXISTS idx_employees_fingerprint
+            ON employees (fingerprint_id, status_aktif);
+
+            CREATE INDEX IF NOT EXISTS idx_payroll_history_periode
+            ON payroll_history (tanggal_awal, tanggal_akhir);
+        """)
         seed_master_data(conn)
         conn.commit()
         print("✅ Database baru siap:", DB_PATH)
+
+        check_query_plans(conn)
     finally:
         conn.close()
 
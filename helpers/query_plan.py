@@ -0,0 +1,53 @@
+import re
+
+# =========================
+# QUERY PANAS + CEK EXPLAIN QUERY PLAN
+# Modul pemilik query mendaftarkan SQL-nya; init_db() mengecek
+# semuanya saat start dan memberi peringatan kalau ada full scan.
+# =========================
+
+# {nama: (sql, tabel/alias yang tidak boleh full scan)}
+HOT_QUERIES = {}
+
+SCAN_RE = re.compile(r"^SCAN (?:TABLE )?(\S+)(.*)$")
+
+
+def register_hot_query(nama, sql, tables):
+    """tables: nama tabel / alias di query yang harus lewat index."""
+    HOT_QUERIES[nama] = (sql, tuple(tables))
+    return sql
+
+
+def full_scans(conn, sql, tables):
+    """Tabel dari `tables` yang di-SCAN tanpa index menurut EXPLAIN QUERY PLAN."""
+    params = [None] * sql.count("?")
+
+    hasil = []
+    for row in conn.execute("EXPLAIN QUERY PLAN " + sql, params).fetchall():
+        m = SCAN_RE.match(row[3])
+        if not m:
+            continue
+
+        tabel, sisa = m.groups()
+        if tabel in tables and "USING" not in sisa:
+            hasil.append(tabel)
+
+    return hasil
+
+
+def check_query_plans(conn):
+    """Return {nama: [tabel full scan]} dan print peringatan."""
+    masalah = {}
+
+    for nama, (sql, tables) in HOT_QUERIES.items():
+        try:
+            scans = full_scans(conn, sql, tables)
+        except Exception as e:
+            print(f"⚠️ Query plan {nama}: gagal dicek ({e})")
+            continue
+
+        if scans:
+            masalah[nama] = scans
+            print(f"⚠️ Query plan {nama}: full scan {', '.join(scans)}")
+
+    return masalah
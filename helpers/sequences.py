@@ -0,0 +1,22 @@
+def next_sequence(conn, nama):
+    """
+    Ambil nomor berikutnya dari tabel sequences (O(1), tanpa MAX()).
+    Panggil di dalam transaksi tulis (begin_immediate) yang sama dengan
+    INSERT dokumennya, supaya nomor tidak bentrok antar stasiun.
+    """
+    row = conn.execute("""
+        UPDATE sequences
+        SET nilai = nilai + 1
+        WHERE nama = ?
+        RETURNING nilai
+    """, (nama,)).fetchone()
+
+    if row is None:
+        # sequence baru
+        conn.execute("""
+            INSERT INTO sequences (nama, nilai)
+            VALUES (?, 1)
+        """, (nama,))
+        return 1
+
+    return row[0]
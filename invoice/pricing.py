@@ -1,3 +1,8 @@
+import json
+from bisect import bisect_left
+from functools import lru_cache
+
+
 def div_round(n, d):
     if d <= 0:
         raise ValueError("d must be > 0")
@@ -5,41 +10,137 @@ def div_round(n, d):
         return (n + d // 2) // d
     return -((-n + d // 2) // d)
 
-def interpolate_price(size, points):
+# jarak titik harga patokan (size 60, 70, 80, ...)
+PRICE_STEP = 10
+
+
+def price_bucket(size):
     """
-    points: {60:60000, 70:55000}
-    size: 65 -> 57500
+    Titik harga yang dipakai 1 size.
+    - size 65 -> (60, 70)
+    - size 70 -> (70,)
     """
+    lo = (size // PRICE_STEP) * PRICE_STEP
+    if size % PRICE_STEP == 0:
+        return (lo,)
+    return (lo, lo + PRICE_STEP)
+
+
+def _to_size(size):
     if size is None:
         return None
     try:
-        size = int(size)
+        return int(size)
     except (TypeError, ValueError):
         return None
 
+
+def _normalize_points(points):
     pts = {}
-    for k, v in points.items():
+    for k, v in (points or {}).items():
         if v is None or str(v).strip() == "":
             continue
         try:
             pts[int(k)] = int(v)
         except (TypeError, ValueError):
             pass
+    return pts
 
-    if size in pts:
-        return pts[size]
 
-    lo = (size // 10) * 10
-    hi = lo + 10
-    if lo not in pts or hi not in pts:
-        return None
+class PriceCurve:
+    """
+    Harga per size dari price_points 1 invoice. Titik dinormalisasi sekali;
+    price() cuma lookup titik persis / 2 titik bucket, hasil per size diingat.
+    """
+
+    def __init__(self, points):
+        self.points = _normalize_points(points)
+        self.keys = sorted(self.points)
+        self._harga = {}
+
+    def __bool__(self):
+        return bool(self.points)
+
+    def _interpolate(self, size):
+        pts = self.points
+
+        if size in pts:
+            return pts[size]
+
+        bucket = price_bucket(size)
+        if len(bucket) < 2:
+            return None
+
+        lo, hi = bucket
+        if lo not in pts or hi not in pts:
+            return None
+
+        p_lo = pts[lo]
+        p_hi = pts[hi]
+
+        num = (p_lo - p_hi) * (size - lo)  # integer
+        adj = div_round(num, PRICE_STEP)   # round
+        return p_lo - adj
+
+    def _nearest(self, size):
+        # titik terdekat; seri = titik yang lebih kecil
+        i = bisect_left(self.keys, size)
+        kandidat = self.keys[max(0, i - 1):i + 1]
+        return self.points[min(kandidat, key=lambda k: abs(k - size))]
+
+    def price(self, size, nearest=False):
+        """
+        Harga/kg untuk size (None kalau tidak bisa dihitung).
+        nearest=True: kalau interpolasi gagal pakai titik terdekat.
+        """
+        size = _to_size(size)
+        if size is None:
+            return None
+
+        key = (size, nearest)
+        if key not in self._harga:
+            harga = self._interpolate(size)
+            if harga is None and nearest and self.keys:
+                harga = self._nearest(size)
+            self._harga[key] = harga
+
+        return self._harga[key]
+
+
+@lru_cache(maxsize=256)
+def _curve_from_json(points_json):
+    try:
+        points = json.loads(points_json or "{}")
+    except ValueError:
+        points = {}
+    return PriceCurve(points if isinstance(points, dict) else {})
+
+
+def price_curve(points):
+    """
+    PriceCurve dari dict price_points atau price_points_json, di-cache per
+    JSON-nya: rebuild berulang untuk invoice yang sama pakai kurva yang sama.
+    """
+    if isinstance(points, PriceCurve):
+        return points
+
+    if not isinstance(points, str):
+        points = json.dumps(
+            {str(k): v for k, v in _normalize_points(points).items()},
+            sort_keys=True
+        )
+
+    return _curve_from_json(points)
+
+
+def interpolate_price(size, points):
+    """
+    points: {60:60000, 70:55000}
+    size: 65 -> 57500
+    """
+    return price_curve(points).price(size)
 
-    p_lo = pts[lo]
-    p_hi = pts[hi]
 
-    num = (p_lo - p_hi) * (size - lo)  # integer
-    adj = div_round(num, 10)           # round
-    return p_lo - adj
 def resolve_price(item, mode, price_map):
     """
     mode:
@@ -50,7 +151,7 @@ def resolve_price(item, mode, price_map):
 
     if mode == "udang_size":
         rs = item.get("round_size")
-        return interpolate_price(rs, price_map)
+        return price_curve(price_map).price(rs)
 
     if mode == "manual_grade":
         g = (item.get("grade_manual") or "").strip()
@@ -44,96 +44,82 @@ def insert_invoice_header(
 ):
     conn = get_conn()
     try:
-
-        price_points_json = json.dumps(
-            {str(k): int(v) for k, v in (price_points or {}).items()},
-            ensure_ascii=False
-        )
-        rec = conn.execute("""
-            SELECT tanggal
-            FROM receiving_header
-            WHERE id = ?
-        """, (receiving_id,)).fetchone()
-
-        tanggal_invoice = rec["tanggal"] if rec else None
-        grade_prices_json = json.dumps(
-            {str(k): int(v) for k, v in (grade_prices or {}).items()},
-            ensure_ascii=False
-        ) if grade_prices else None
-        cur = conn.execute(
-            """
-            INSERT INTO invoice_header
-            (tanggal,
-             receiving_id, supplier,
-             price_points_json, grade_prices_json,
-             payment_type,
-             tempo_hari, due_date,
-             cash_deduct_per_kg_rp, cash_deduct_total_rp,
-             pph_rate_bp, pph_amount_rp,
-             subtotal_rp, total_payable_rp, total_paid_g,
-             status)
-            VALUES (?, ?, ?, ?, ?,
-                    ?, ?, ?,
-                    ?, 0,
-                    0, 0,
-                    0, 0, 0,
-                    'draft')
-            """,
-            (
-                tanggal_invoice,  # ← ambil dari receiving
-                int(receiving_id),
-                supplier,
-                price_points_json,
-                grade_prices_json,
-                payment_type,
-                int(tempo_hari or 0),
-                due_date,
-                int(cash_deduct_per_kg_rp or 0),
-            ),
+        invoice_id = insert_invoice_header_conn(
+            conn,
+            receiving_id=receiving_id,
+            supplier=supplier,
+            price_points=price_points,
+            payment_type=payment_type,
+            cash_deduct_per_kg_rp=cash_deduct_per_kg_rp,
+            tempo_hari=tempo_hari,
+            due_date=due_date,
+            grade_prices=grade_prices,
         )
         conn.commit()
-        return int(cur.lastrowid)
+        return invoice_id
 
     finally:
         conn.close()
 
 
-def insert_invoice_line(
-    invoice_id,
-    receiving_item_id,
-    partai_no,
-    net_g,
-    paid_g,
-    round_size,
-    price_per_kg_rp,
-    line_total_rp,
-    note,
+def insert_invoice_header_conn(
+    conn,
+    receiving_id,
+    supplier,
+    price_points,
+    payment_type,
+    cash_deduct_per_kg_rp=0,
+    tempo_hari=0,
+    due_date=None,
+    grade_prices=None,
 ):
-    conn = get_conn()
-    try:
-        conn.execute(
-            """
-            INSERT INTO invoice_line
-            (invoice_id, receiving_item_id, partai_no,
-             net_g, paid_g, round_size,
-             price_per_kg_rp, line_total_rp, note)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-            """,
-            (
-                int(invoice_id),
-                int(receiving_item_id),
-                int(partai_no),
-                int(net_g),
-                int(paid_g),
-                int(round_size) if round_size is not None else None,
-                int(price_per_kg_rp),
-                int(line_total_rp),
-                note,
-            ),
-        )
-        conn.commit()
-    finally:
-        conn.close()
+    price_points_json = json.dumps(
+        {str(k): int(v) for k, v in (price_points or {}).items()},
+        ensure_ascii=False
+    )
+    rec = conn.execute("""
+        SELECT tanggal
+        FROM receiving_header
+        WHERE id = ?
+    """, (receiving_id,)).fetchone()
+
+    tanggal_invoice = rec["tanggal"] if rec else None
+    grade_prices_json = json.dumps(
+        {str(k): int(v) for k, v in (grade_prices or {}).items()},
+        ensure_ascii=False
+    ) if grade_prices else None
+    cur = conn.execute(
+        """
+        INSERT INTO invoice_header
+        (tanggal,
+         receiving_id, supplier,
+         price_points_json, grade_prices_json,
+         payment_type,
+         tempo_hari, due_date,
+         cash_deduct_per_kg_rp, cash_deduct_total_rp,
+         pph_rate_bp, pph_amount_rp,
+         subtotal_rp, total_payable_rp, total_paid_g,
+         status)
+        VALUES (?, ?, ?, ?, ?,
+                ?, ?, ?,
+                ?, 0,
+                0, 0,
+                0, 0, 0,
+                'draft')
+        """,
+        (
+            tanggal_invoice,  # ← ambil dari receiving
+            int(receiving_id),
+            supplier,
+            price_points_json,
+            grade_prices_json,
+            payment_type,
+            int(tempo_hari or 0),
+            due_date,
+            int(cash_deduct_per_kg_rp or 0),
+        ),
+    )
+    return int(cur.lastrowid)
 
 
 def get_invoice_header(invoice_id):
@@ -176,23 +162,46 @@ def get_invoice_by_receiving_conn(conn, receiving_id):
     return dict(row) if row else None
 
 
+def fetch_invoice_lines_by_item_conn(conn, invoice_id, item_ids=None):
+    """{receiving_item_id: baris invoice_line}; item_ids None = semua baris."""
+    sql = "SELECT * FROM invoice_line WHERE invoice_id=?"
+    params = [int(invoice_id)]
+
+    if item_ids is not None:
+        ids = [int(i) for i in item_ids]
+        if not ids:
+            return {}
+        sql += f" AND receiving_item_id IN ({','.join('?' * len(ids))})"
+        params += ids
+
+    return {
+        int(r["receiving_item_id"]): dict(r)
+        for r in conn.execute(sql, params).fetchall()
+    }
+
+
 def delete_invoice_lines_conn(conn, invoice_id):
     conn.execute("DELETE FROM invoice_line WHERE invoice_id=?", (int(invoice_id),))
 
 
-def insert_invoice_line_conn(
-    conn,
-    invoice_id,
-    receiving_item_id,
-    partai_no,
-    net_g,
-    paid_g,
-    round_size,
-    price_per_kg_rp,
-    line_total_rp,
-    note,
-):
-    conn.execute(
+def _line_values(line):
+    return (
+        int(line["partai_no"]),
+        int(line["net_g"]),
+        int(line["paid_g"]),
+        int(line["round_size"]) if line.get("round_size") is not None else None,
+        int(line["price_per_kg_rp"]),
+        int(line["line_total_rp"]),
+        line.get("note"),
+    )
+
+
+def insert_invoice_lines_conn(conn, invoice_id, lines):
+    """lines: dict hasil service.hitung_invoice, 1 executemany."""
+    if not lines:
+        return
+
+    conn.executemany(
         """
         INSERT INTO invoice_line
         (invoice_id, receiving_item_id, partai_no,
@@ -200,17 +209,36 @@ def insert_invoice_line_conn(
          price_per_kg_rp, line_total_rp, note)
         VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
         """,
-        (
-            int(invoice_id),
-            int(receiving_item_id),
-            int(partai_no),
-            int(net_g),
-            int(paid_g),
-            int(round_size) if round_size is not None else None,
-            int(price_per_kg_rp),
-            int(line_total_rp),
-            note,
-        ),
+        [
+            (int(invoice_id), int(line["receiving_item_id"]), *_line_values(line))
+            for line in lines
+        ],
+    )
+
+
+def update_invoice_lines_conn(conn, rows):
+    """rows: [(invoice_line.id, line dict)], 1 executemany."""
+    if not rows:
+        return
+
+    conn.executemany(
+        """
+        UPDATE invoice_line
+        SET partai_no=?, net_g=?, paid_g=?, round_size=?,
+            price_per_kg_rp=?, line_total_rp=?, note=?
+        WHERE id=?
+        """,
+        [(*_line_values(line), int(line_id)) for line_id, line in rows],
+    )
+
+
+def delete_invoice_lines_by_id_conn(conn, line_ids):
+    if not line_ids:
+        return
+
+    conn.executemany(
+        "DELETE FROM invoice_line WHERE id=?",
+        [(int(i),) for i in line_ids],
     )
 
 
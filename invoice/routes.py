@@ -4,7 +4,7 @@ import json
 from .repository import get_jenis_mode
 from . import invoice_bp
 from .service import create_invoice_from_receiving, rebuild_invoice_lines, kg_to_g
-from .pricing import interpolate_price
+from .pricing import interpolate_price, price_bucket
 from . import repository as repo
 from datetime import time, timedelta, datetime
 
@@ -71,36 +71,13 @@ def needed_price_keys(partai_rows):
         except (TypeError, ValueError):
             continue
 
-        lo = (s // 10) * 10
-        hi = lo + 10
-
-        if s % 10 == 0:
-            keys.add(lo)
-        else:
-            keys.add(lo)
-            keys.add(hi)
+        keys.update(price_bucket(s))
 
     return sorted(keys)
 
 
 def _price_keys_from_lines(lines):
-    keys = set()
-    for r in lines:
-        rs = r.get("round_size")
-        if rs is None:
-            continue
-        try:
-            s = int(rs)
-        except:
-            continue
-        lo = (s // 10) * 10
-        hi = lo + 10
-        if s % 10 == 0:
-            keys.add(lo)
-        else:
-            keys.add(lo)
-            keys.add(hi)
-    return sorted(keys)
+    return needed_price_keys(lines)
 
 
 # -----------------------------
@@ -491,7 +468,6 @@ def invoice_edit(invoice_id):
             int(invoice_id),
         ))
 
-        conn.execute("DELETE FROM invoice_line WHERE invoice_id=?", (int(invoice_id),))
         conn.commit()
     except Exception:
         conn.rollback()
@@ -499,7 +475,7 @@ def invoice_edit(invoice_id):
     finally:
         conn.close()
 
-    # rebuild lines + totals
+    # rebuild lines + totals (hanya baris yang berubah ditulis)
     rebuild_invoice_lines(
         invoice_id=invoice_id,
         receiving_id=receiving_id,
@@ -1,5 +1,5 @@
 from datetime import datetime, timedelta
-from .pricing import interpolate_price, div_round
+from .pricing import price_curve, div_round
 from . import repository as repo
 import json
 from .pricing import resolve_price
@@ -25,6 +25,171 @@ def mul_div_round(a, b, d):
     # pembulatan sesuai div_round kamu
     return div_round(a * b, d)
 
+
+# =========================
+# INTI HITUNG INVOICE (tanpa DB)
+# Dipakai create, edit (rebuild_invoice_lines) dan update dari receiving.
+# =========================
+
+# kolom invoice_line selain invoice_id / receiving_item_id
+LINE_COLUMNS = (
+    "partai_no", "net_g", "paid_g", "round_size",
+    "price_per_kg_rp", "line_total_rp", "note",
+)
+
+
+def cek_grade_prices(items, grade_prices):
+    """Validasi manual_grade: semua grade di partai harus punya harga > 0."""
+    if not isinstance(grade_prices, dict):
+        raise ValueError("Manual grade butuh grade_prices (dict).")
+
+    required_grades = sorted({
+        (it.get("grade_manual") or "").strip()
+        for it in items
+        if (it.get("grade_manual") or "").strip()
+    })
+
+    if not required_grades:
+        raise ValueError("Tidak ada grade_manual pada receiving_item. Isi grade per partai dulu.")
+
+    missing = [g for g in required_grades if int(grade_prices.get(g) or 0) <= 0]
+    if missing:
+        raise ValueError(f"Harga untuk grade {', '.join(missing)} wajib diisi dan > 0.")
+
+
+def harga_partai(
+    it,
+    is_manual,
+    price_points=None,
+    grade_prices=None,
+    fallback_price=0,
+    nearest=False,
+):
+    """
+    Harga/kg 1 partai.
+    - manual_grade: grade_prices[grade_manual]; grade_prices None = harga lama
+    - udang_size: interpolasi price_points (dict / PriceCurve), nearest=True
+      pakai titik terdekat, lalu harga lama (fallback_price) kalau masih gagal
+    """
+    partai_no = int(it["partai_no"])
+
+    if is_manual:
+        if grade_prices is None:
+            if fallback_price > 0:
+                return int(fallback_price)
+            raise ValueError(
+                f"Invoice manual_grade tidak punya harga untuk partai {partai_no}. "
+                f"Edit invoice lalu isi harga grade."
+            )
+
+        g = (it.get("grade_manual") or "").strip()
+        used_price = int(grade_prices.get(g) or 0)
+        if used_price <= 0:
+            raise ValueError(f"Partai {partai_no}: harga grade '{g}' belum diisi.")
+        return used_price
+
+    rs = it.get("round_size")
+
+    # nearest: fallback titik terdekat jika interpolate gagal tapi ada price_points
+    base_price = price_curve(price_points or {}).price(rs, nearest=nearest)
+
+    if base_price is None and fallback_price > 0:
+        base_price = fallback_price
+
+    if base_price is None:
+        raise ValueError(f"Harga tidak bisa dihitung untuk round_size={rs} (partai {partai_no}).")
+
+    return int(base_price)
+
+
+def hitung_total(subtotal_rp, total_paid_g, payment_type, cash_deduct_per_kg_rp, pph_amount_rp=0):
+    """Total header invoice dari subtotal + berat bayar."""
+    payment_type = (payment_type or "transfer").strip().lower()
+    cash_deduct_per_kg_rp = int(cash_deduct_per_kg_rp or 0)
+
+    cash_deduct_total = 0
+    if payment_type == "cash" and cash_deduct_per_kg_rp > 0:
+        cash_deduct_total = mul_div_round(int(total_paid_g), cash_deduct_per_kg_rp, 1000)
+
+    pph_amount = int(pph_amount_rp or 0)
+
+    return {
+        "subtotal_rp": int(subtotal_rp),
+        "total_paid_g": int(total_paid_g),
+        "cash_deduct_total_rp": int(cash_deduct_total),
+        "pph_amount_rp": pph_amount,
+        "total_payable_rp": int(subtotal_rp) - int(cash_deduct_total) - pph_amount,
+    }
+
+
+def hitung_invoice(
+    items,
+    is_manual,
+    price_points=None,
+    grade_prices=None,
+    partai_overrides=None,
+    fallback_prices=None,
+    nearest=False,
+    payment_type="transfer",
+    cash_deduct_per_kg_rp=0,
+):
+    """
+    items receiving_item (dict) -> (lines, totals).
+    partai_overrides: {partai_no: {paid_g, note}},
+    fallback_prices: {receiving_item_id: harga lama}.
+    """
+    partai_overrides = partai_overrides or {}
+    fallback_prices = fallback_prices or {}
+
+    # kurva harga dibangun sekali per invoice, bukan per partai
+    curve = None if is_manual else price_curve(price_points or {})
+
+    lines = []
+    subtotal_rp = 0
+    total_paid_g = 0
+
+    for it in items:
+        rid = int(it["id"])
+        partai_no = int(it["partai_no"])
+
+        used_price = harga_partai(
+            it,
+            is_manual,
+            price_points=curve,
+            grade_prices=grade_prices,
+            fallback_price=int(fallback_prices.get(rid) or 0),
+            nearest=nearest,
+        )
+
+        # berat
+        net_g = kg_to_g(it.get("netto"))
+        paid_g = net_g
+
+        ov = partai_overrides.get(partai_no) or {}
+        if ov.get("paid_g") is not None:
+            paid_g = int(ov["paid_g"])
+
+        line_total = mul_div_round(int(paid_g), int(used_price), 1000)
+
+        lines.append({
+            "receiving_item_id": rid,
+            "partai_no": partai_no,
+            "net_g": int(net_g),
+            "paid_g": int(paid_g),
+            "round_size": it.get("round_size"),
+            "price_per_kg_rp": int(used_price),
+            "line_total_rp": int(line_total),
+            "note": ov.get("note") or it.get("note"),
+        })
+
+        subtotal_rp += int(line_total)
+        total_paid_g += int(paid_g)
+
+    totals = hitung_total(subtotal_rp, total_paid_g, payment_type, cash_deduct_per_kg_rp)
+
+    return lines, totals
+
+
 def create_invoice_from_receiving(
     receiving_id,
     price_points,
@@ -73,140 +238,50 @@ def create_invoice_from_receiving(
         due_date = None
 
     # =========================
-    # VALIDASI MANUAL GRADE
+    # HITUNG (validasi dulu, belum ada yang ditulis)
     # =========================
     if is_manual:
-        if not isinstance(grade_prices, dict):
-            raise ValueError("Manual grade butuh grade_prices (dict).")
-
-        required_grades = sorted({
-            (it.get("grade_manual") or "").strip()
-            for it in items
-            if (it.get("grade_manual") or "").strip()
-        })
-
-        if not required_grades:
-            raise ValueError("Tidak ada grade_manual pada receiving_item. Isi grade per partai dulu.")
-
-        missing = [g for g in required_grades if int(grade_prices.get(g) or 0) <= 0]
-        if missing:
-            raise ValueError(f"Harga untuk grade {', '.join(missing)} wajib diisi dan > 0.")
-
-    # =========================
-    # INSERT HEADER
-    # (NOTE: grade_prices akan disimpan kalau repo kamu support)
-    # =========================
-    invoice_id = repo.insert_invoice_header(
-        receiving_id=receiving_id,
-        supplier=supplier,
-        price_points=price_points or {},
+        cek_grade_prices(items, grade_prices)
+
+    lines, totals = hitung_invoice(
+        items,
+        is_manual,
+        price_points=price_points,
+        grade_prices=grade_prices,
+        partai_overrides=partai_overrides,
+        nearest=True,
         payment_type=payment_type,
         cash_deduct_per_kg_rp=cash_deduct_per_kg_rp,
-        tempo_hari=tempo_hari,
-        due_date=due_date,
-        grade_prices=(grade_prices if is_manual else None),
     )
 
-    if not items:
-        repo.update_invoice_totals(
-            invoice_id=invoice_id,
-            subtotal_rp=0,
-            total_paid_g=0,
-            cash_deduct_total_rp=0,
-            pph_amount_rp=0,
-            total_payable_rp=0,
-        )
-        return invoice_id
-
-    partai_overrides = partai_overrides or {}
-
-    subtotal_rp = 0
-    total_paid_g = 0
-
     # =========================
-    # BUILD LINES
+    # SIMPAN: header + semua line + total, 1 transaksi
     # =========================
-    for it in items:
-        partai_no = int(it["partai_no"])
-
-        # berat
-        net_g = kg_to_g(it.get("netto"))
-        paid_g = net_g
-
-        ov = partai_overrides.get(partai_no) or {}
-        if ov.get("paid_g") is not None:
-            paid_g = int(ov["paid_g"])
-
-        # harga/kg
-        if is_manual:
-            g = (it.get("grade_manual") or "").strip()
-            used_price = int(grade_prices.get(g) or 0)
-            if used_price <= 0:
-                raise ValueError(f"Partai {partai_no}: harga grade_manual '{g}' tidak valid.")
-        else:
-            rs = it.get("round_size")
-            try:
-                rs_int = int(rs) if rs is not None and str(rs).strip() != "" else None
-            except:
-                rs_int = None
-
-            base_price = interpolate_price(rs_int, price_points) if rs_int is not None else None
-
-            # fallback nearest jika interpolate gagal tapi ada price_points
-            if base_price is None and price_points and rs_int is not None:
-                nearest = min(price_points.keys(), key=lambda k: abs(int(k) - rs_int))
-                base_price = price_points[nearest]
-
-            if base_price is None:
-                raise ValueError(f"Harga tidak bisa dihitung untuk round_size={rs} (partai {partai_no}).")
-
-            used_price = int(base_price)
-
-        line_total = mul_div_round(int(paid_g), int(used_price), 1000)
-        note = ov.get("note") or it.get("note")
-
-        repo.insert_invoice_line(
-            invoice_id=invoice_id,
-            receiving_item_id=int(it["id"]),
-            partai_no=partai_no,
-            net_g=int(net_g),
-            paid_g=int(paid_g),
-            round_size=it.get("round_size"),
-            price_per_kg_rp=int(used_price),
-            line_total_rp=int(line_total),
-            note=note,
+    conn = repo.get_conn()
+    try:
+        invoice_id = repo.insert_invoice_header_conn(
+            conn,
+            receiving_id=receiving_id,
+            supplier=supplier,
+            price_points=price_points or {},
+            payment_type=payment_type,
+            cash_deduct_per_kg_rp=cash_deduct_per_kg_rp,
+            tempo_hari=tempo_hari,
+            due_date=due_date,
+            grade_prices=(grade_prices if is_manual else None),
         )
+        repo.insert_invoice_lines_conn(conn, invoice_id, lines)
+        repo.update_invoice_totals_conn(conn, invoice_id, **totals)
 
-        subtotal_rp += int(line_total)
-        total_paid_g += int(paid_g)
-
-    # =========================
-    # totals
-    # =========================
-    cash_deduct_total = 0
-    if payment_type == "cash" and cash_deduct_per_kg_rp > 0:
-        cash_deduct_total = mul_div_round(total_paid_g, cash_deduct_per_kg_rp, 1000)
-
-    pph_amount = 0
-    total_payable = subtotal_rp - cash_deduct_total - pph_amount
-
-    repo.update_invoice_totals(
-        invoice_id=invoice_id,
-        subtotal_rp=subtotal_rp,
-        total_paid_g=total_paid_g,
-        cash_deduct_total_rp=cash_deduct_total,
-        pph_amount_rp=pph_amount,
-        total_payable_rp=total_payable,
-    )
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
 
     return invoice_id
 
-def mul_div_round(a, b, d):
-    return div_round(a * b, d)
-
-from . import repository as repo
-from .pricing import interpolate_price, div_round
-
 def rebuild_invoice_lines(
     invoice_id: int,
     receiving_id: int,
@@ -219,7 +294,7 @@ def rebuild_invoice_lines(
 ):
     """
     Rebuild invoice_line + totals berdasarkan receiving_item terbaru.
-    - Mode 'udang_size': pakai interpolate_price dari price_points
+    - Mode 'udang_size': pakai PriceCurve dari price_points
     - Mode 'manual_grade': pakai grade_manual + grade_prices
       Jika grade_prices None → ambil dari invoice_header.grade_prices_json
     """
@@ -250,101 +325,29 @@ def rebuild_invoice_lines(
 
     # validasi manual
     if is_manual:
-        if not isinstance(grade_prices, dict):
-            raise ValueError("Manual grade butuh grade_prices (dict).")
-
-        required_grades = sorted({
-            (it.get("grade_manual") or "").strip()
-            for it in items
-            if (it.get("grade_manual") or "").strip()
-        })
-
-        if not required_grades:
-            raise ValueError("Tidak ada grade pada partai. Isi grade per partai dulu.")
-
-        missing = [g for g in required_grades if int(grade_prices.get(g) or 0) <= 0]
-        if missing:
-            raise ValueError(f"Harga untuk grade {', '.join(missing)} wajib diisi dan > 0.")
-
-    subtotal_rp = 0
-    total_paid_g = 0
+        cek_grade_prices(items, grade_prices)
+
+    lines, totals = hitung_invoice(
+        items,
+        is_manual,
+        price_points=price_points,
+        grade_prices=grade_prices,
+        partai_overrides=partai_overrides,
+        payment_type=payment_type,
+        cash_deduct_per_kg_rp=cash_deduct_per_kg_rp,
+    )
 
     conn = repo.get_conn()
     try:
-        # hapus lines lama dulu (aman karena receiving_item_id UNIQUE)
-        conn.execute("DELETE FROM invoice_line WHERE invoice_id=?", (int(invoice_id),))
-
-        for it in items:
-            partai_no = int(it["partai_no"])
-            rs = it.get("round_size")
-
-            # tentukan harga/kg
-            if is_manual:
-                g = (it.get("grade_manual") or "").strip()
-                used_price = int(grade_prices.get(g) or 0)
-                if used_price <= 0:
-                    raise ValueError(f"Partai {partai_no}: harga grade '{g}' belum diisi.")
-            else:
-                base_price = interpolate_price(rs, price_points)
-                if base_price is None:
-                    raise ValueError(f"Harga tidak bisa dihitung untuk round_size={rs} (partai {partai_no}).")
-                used_price = int(base_price)
-
-            net_g = kg_to_g(it.get("netto"))
-            paid_g = net_g
-
-            ov = partai_overrides.get(partai_no) or {}
-            if ov.get("paid_g") is not None:
-                paid_g = int(ov["paid_g"])
-
-            line_total = mul_div_round(int(paid_g), int(used_price), 1000)
-            note = ov.get("note") or it.get("note")
-
-            conn.execute("""
-                INSERT INTO invoice_line (
-                    invoice_id, receiving_item_id, partai_no,
-                    net_g, paid_g, round_size, price_per_kg_rp, line_total_rp, note
-                ) VALUES (?,?,?,?,?,?,?,?,?)
-            """, (
-                int(invoice_id),
-                int(it["id"]),
-                int(partai_no),
-                int(net_g),
-                int(paid_g),
-                rs,
-                int(used_price),
-                int(line_total),
-                note
-            ))
-
-            subtotal_rp += int(line_total)
-            total_paid_g += int(paid_g)
-
-        # cash deduct
-        cash_deduct_total = 0
-        if (payment_type or "").strip().lower() == "cash" and int(cash_deduct_per_kg_rp or 0) > 0:
-            cash_deduct_total = mul_div_round(total_paid_g, int(cash_deduct_per_kg_rp), 1000)
-
-        # pph belum dipakai
-        pph_amount = 0
-        total_payable = subtotal_rp - cash_deduct_total - pph_amount
-
-        conn.execute("""
-            UPDATE invoice_header
-            SET subtotal_rp=?,
-                total_paid_g=?,
-                cash_deduct_total_rp=?,
-                pph_amount_rp=?,
-                total_payable_rp=?
-            WHERE id=?
-        """, (
-            int(subtotal_rp),
-            int(total_paid_g),
-            int(cash_deduct_total),
-            int(pph_amount),
-            int(total_payable),
-            int(invoice_id)
-        ))
+        # hanya baris yang berubah yang ditulis; baris partai yang sudah
+        # tidak ada ikut dihapus
+        old_lines = repo.fetch_invoice_lines_by_item_conn(conn, invoice_id)
+        removed = set(old_lines) - {line["receiving_item_id"] for line in lines}
+
+        apply_invoice_lines(conn, invoice_id, lines, old_lines, removed)
+
+        # semua baris dihitung ulang: total langsung dari hasil hitung
+        repo.update_invoice_totals_conn(conn, invoice_id, **totals)
 
         conn.commit()
     except Exception:
@@ -353,15 +356,99 @@ def rebuild_invoice_lines(
     finally:
         conn.close()
 
-def rebuild_invoice_from_receiving_if_exists(conn, receiving_id: int):
+
+# =========================
+# ENGINE INVOICE INKREMENTAL
+# Baris baru dibandingkan dengan invoice_line tersimpan; hanya baris yang
+# berubah ditulis dan total header digeser sebesar selisihnya.
+# =========================
+
+def apply_invoice_lines(conn, invoice_id, lines, old_lines, removed_ids=()):
+    """
+    lines: hasil hitung_invoice, old_lines: {receiving_item_id: baris lama},
+    removed_ids: baris yang dihapus.
+    Return (selisih subtotal_rp, selisih total_paid_g, jumlah baris ditulis).
+    """
+    d_sub = 0
+    d_paid = 0
+
+    baru = []
+    ubah = []
+    hapus = []
+
+    for line in lines:
+        old = old_lines.get(int(line["receiving_item_id"]))
+
+        if old is None:
+            baru.append(line)
+        elif any(old[k] != line[k] for k in LINE_COLUMNS):
+            ubah.append((old["id"], line))
+            d_sub -= int(old["line_total_rp"] or 0)
+            d_paid -= int(old["paid_g"] or 0)
+        else:
+            continue
+
+        d_sub += int(line["line_total_rp"])
+        d_paid += int(line["paid_g"])
+
+    for rid in removed_ids:
+        old = old_lines.get(int(rid))
+        if old is None:
+            continue
+
+        hapus.append(old["id"])
+        d_sub -= int(old["line_total_rp"] or 0)
+        d_paid -= int(old["paid_g"] or 0)
+
+    repo.insert_invoice_lines_conn(conn, invoice_id, baru)
+    repo.update_invoice_lines_conn(conn, ubah)
+    repo.delete_invoice_lines_by_id_conn(conn, hapus)
+
+    return d_sub, d_paid, len(baru) + len(ubah) + len(hapus)
+
+
+def shift_invoice_totals(conn, invoice_id, d_subtotal, d_paid_g):
+    """
+    Geser subtotal_rp / total_paid_g sebesar selisih, lalu hitung ulang
+    potongan cash + total bayar dengan cara bayar di header.
+    """
+    inv = conn.execute("""
+        SELECT subtotal_rp, total_paid_g, payment_type,
+               cash_deduct_per_kg_rp, pph_amount_rp
+        FROM invoice_header
+        WHERE id=?
+    """, (int(invoice_id),)).fetchone()
+
+    if not inv:
+        return
+
+    totals = hitung_total(
+        int(inv["subtotal_rp"] or 0) + int(d_subtotal),
+        int(inv["total_paid_g"] or 0) + int(d_paid_g),
+        inv["payment_type"],
+        inv["cash_deduct_per_kg_rp"],
+        inv["pph_amount_rp"],
+    )
+
+    repo.update_invoice_totals_conn(conn, invoice_id, **totals)
+
+
+def rebuild_invoice_from_receiving_if_exists(
+    conn,
+    receiving_id: int,
+    item_ids=None,
+    removed_ids=(),
+):
     """
     Jika invoice untuk receiving ini sudah ada:
-    - rebuild ulang invoice_line dari receiving_item terbaru
+    - hitung ulang invoice_line untuk item_ids (None = semua partai)
+    - hapus invoice_line untuk removed_ids
+    - hanya baris yang berubah ditulis, total header digeser selisihnya
     - harga lama dipakai sebagai fallback
     """
 
     inv = conn.execute("""
-        SELECT id, price_points_json, payment_type, cash_deduct_per_kg_rp
+        SELECT id, price_points_json
         FROM invoice_header
         WHERE receiving_id=?
         LIMIT 1
@@ -395,147 +482,56 @@ def rebuild_invoice_from_receiving_if_exists(conn, receiving_id: int):
     is_manual = (mode == "manual_grade")
 
     # =========================
-    # load price_points
-    # =========================
-    price_points = {}
-
-    try:
-        pts = json.loads(inv["price_points_json"] or "{}")
-        price_points = {int(k): int(v) for k, v in pts.items()}
-    except:
-        price_points = {}
-
-    # =========================
-    # harga lama invoice_line
-    # =========================
-    old_prices = {}
-
-    for r in conn.execute("""
-        SELECT receiving_item_id, price_per_kg_rp
-        FROM invoice_line
-        WHERE invoice_id=?
-    """, (invoice_id,)).fetchall():
-
-        old_prices[int(r["receiving_item_id"])] = int(r["price_per_kg_rp"] or 0)
-
-    # =========================
-    # ambil receiving_item terbaru
+    # kurva harga dari price_points_json (cache per JSON, dipakai ulang
+    # selama harga invoice tidak berubah)
     # =========================
-    items = conn.execute("""
-        SELECT *
-        FROM receiving_item
-        WHERE header_id=?
-        ORDER BY partai_no ASC
-    """, (receiving_id,)).fetchall()
-
-    # hapus lines lama
-    conn.execute("DELETE FROM invoice_line WHERE invoice_id=?", (invoice_id,))
-
-    subtotal_rp = 0
-    total_paid_g = 0
+    price_points = price_curve(inv["price_points_json"] or "{}")
 
     # =========================
-    # rebuild lines
+    # receiving_item + invoice_line lama yang terdampak
     # =========================
-    for it in items:
-
-        rid = int(it["id"])
-        partai_no = int(it["partai_no"])
-        rs = it["round_size"]
-
-        used_price = 0
-
-        if is_manual:
-
-            used_price = int(old_prices.get(rid) or 0)
-
-            if used_price <= 0:
-                raise ValueError(
-                    f"Invoice manual_grade tidak punya harga untuk partai {partai_no}. "
-                    f"Edit invoice lalu isi harga grade."
-                )
-
-        else:
-
-            base_price = interpolate_price(rs, price_points) if rs else None
-
-            if base_price is None:
-
-                used_price = int(old_prices.get(rid) or 0)
-
-                if used_price <= 0:
-                    raise ValueError(
-                        f"Harga tidak bisa dihitung untuk round_size={rs} "
-                        f"(partai {partai_no})."
-                    )
-            else:
-                used_price = int(base_price)
-
-        net_g = kg_to_g(it["netto"])
-        paid_g = net_g
-
-        line_total = mul_div_round(paid_g, used_price, 1000)
-
-        conn.execute("""
-            INSERT INTO invoice_line (
-                invoice_id,
-                receiving_item_id,
-                partai_no,
-                net_g,
-                paid_g,
-                round_size,
-                price_per_kg_rp,
-                line_total_rp,
-                note
-            ) VALUES (?,?,?,?,?,?,?,?,?)
-        """, (
-            invoice_id,
-            rid,
-            partai_no,
-            net_g,
-            paid_g,
-            rs,
-            used_price,
-            line_total,
-            it["note"],
-        ))
-
-        subtotal_rp += line_total
-        total_paid_g += paid_g
+    removed = {int(i) for i in removed_ids}
+
+    if item_ids is None:
+        items = conn.execute("""
+            SELECT *
+            FROM receiving_item
+            WHERE header_id=?
+            ORDER BY partai_no ASC
+        """, (receiving_id,)).fetchall()
+
+        old_lines = repo.fetch_invoice_lines_by_item_conn(conn, invoice_id)
+        removed |= set(old_lines) - {int(it["id"]) for it in items}
+    else:
+        ids = sorted({int(i) for i in item_ids} - removed)
+
+        items = conn.execute(f"""
+            SELECT *
+            FROM receiving_item
+            WHERE header_id=?
+              AND id IN ({",".join("?" * len(ids))})
+            ORDER BY partai_no ASC
+        """, (receiving_id, *ids)).fetchall() if ids else []
+
+        old_lines = repo.fetch_invoice_lines_by_item_conn(
+            conn, invoice_id, [*ids, *removed]
+        )
 
     # =========================
-    # cash deduction
+    # hitung baris baru (harga lama = fallback, manual selalu harga lama)
     # =========================
-    payment_type = (inv["payment_type"] or "transfer").strip().lower()
-
-    cash_deduct_per_kg_rp = int(inv["cash_deduct_per_kg_rp"] or 0)
-
-    if payment_type != "cash":
-        cash_deduct_per_kg_rp = 0
-
-    cash_deduct_total = 0
-
-    if payment_type == "cash" and cash_deduct_per_kg_rp > 0:
-
-        cash_deduct_total = mul_div_round(
-            total_paid_g,
-            cash_deduct_per_kg_rp,
-            1000
-        )
+    lines, _ = hitung_invoice(
+        [dict(it) for it in items if int(it["id"]) not in removed],
+        is_manual,
+        price_points=price_points,
+        fallback_prices={
+            rid: line["price_per_kg_rp"] for rid, line in old_lines.items()
+        },
+    )
 
-    total_payable = subtotal_rp - cash_deduct_total
+    d_sub, d_paid, ditulis = apply_invoice_lines(
+        conn, invoice_id, lines, old_lines, removed
+    )
 
-    conn.execute("""
-        UPDATE invoice_header
-        SET subtotal_rp=?,
-            total_paid_g=?,
-            cash_deduct_total_rp=?,
-            total_payable_rp=?
-        WHERE id=?
-    """, (
-        subtotal_rp,
-        total_paid_g,
-        cash_deduct_total,
-        total_payable,
-        invoice_id
-    ))
\ No newline at end of file
+    if ditulis:
+        shift_invoice_totals(conn, invoice_id, d_sub, d_paid)
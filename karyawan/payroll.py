@@ -0,0 +1,226 @@
+from helpers.query_plan import register_hot_query
+from .service import resolve_potongan_barang, potong_barang
+
+# =========================
+# ENGINE PAYROLL
+# Baris harian di-stream urut per karyawan, yang keluar 1 agregat
+# per karyawan; tidak ada list semua baris di memori.
+# =========================
+
+PAYROLL_DAYS_QUERY = """
+    SELECT
+        e.id AS employee_id,
+        e.no_id,
+        e.nama,
+        e.bagian,
+
+        a.work_date,
+
+        p.work_type,
+        p.gaji_pokok,
+        p.gaji_lembur,
+        p.insentif,
+        p.potongan_telat,
+        p.potongan_mes,
+
+        COALESCE(b.total_upah, 0) AS total_upah_borongan
+
+    FROM employees e
+    LEFT JOIN attendance_daily a
+        ON e.id = a.employee_id
+       AND a.work_date BETWEEN ? AND ?
+    LEFT JOIN payroll_daily_computed p
+        ON p.employee_id = a.employee_id
+       AND p.work_date = a.work_date
+    LEFT JOIN borongan_logs b
+        ON b.no_id = e.no_id
+       AND b.tanggal = a.work_date
+    WHERE e.status_aktif = 1
+"""
+
+# urutan cetak history: per bagian lalu no_id
+PAYROLL_HISTORY_QUERY = """
+    SELECT h.*{potongan}
+    FROM payroll_history h
+    {join}
+    WHERE h.tanggal_awal = ?
+      AND h.tanggal_akhir = ?
+      AND h.total_gaji != 0
+    ORDER BY
+      CASE LOWER(TRIM(h.bagian))
+        WHEN 'borongan' THEN 1
+        WHEN 'produksi' THEN 2
+        WHEN 'beku' THEN 3
+        WHEN 'coldroom' THEN 4
+        WHEN 'malam' THEN 5
+        WHEN 'umum' THEN 6
+        WHEN 'kebersihan' THEN 7
+        ELSE 99
+      END,
+      CAST(h.no_id AS INTEGER)
+"""
+
+# jumlah potongan per slip dari payroll_items, 1 GROUP BY untuk 1 periode
+POTONGAN_ITEMS_JOIN = """
+    LEFT JOIN (
+        SELECT
+            payroll_id,
+            SUM(CASE WHEN keterangan = 'Potongan Telat' THEN nominal ELSE 0 END) AS potongan_telat,
+            SUM(CASE WHEN keterangan = 'Potongan Mes' THEN nominal ELSE 0 END) AS potongan_mes,
+            SUM(CASE WHEN jenis = 'potongan_barang' THEN nominal ELSE 0 END) AS potongan_barang
+        FROM payroll_items
+        WHERE payroll_id IN (
+            SELECT id
+            FROM payroll_history
+            WHERE tanggal_awal = ?
+              AND tanggal_akhir = ?
+        )
+        GROUP BY payroll_id
+    ) i
+        ON i.payroll_id = h.id
+"""
+
+POTONGAN_COLUMNS = """,
+        COALESCE(i.potongan_telat, 0) AS potongan_telat,
+        COALESCE(i.potongan_mes, 0) AS potongan_mes,
+        COALESCE(i.potongan_barang, 0) AS potongan_barang"""
+
+register_hot_query(
+    "payroll.days",
+    PAYROLL_DAYS_QUERY,
+    ["a", "p", "b"]
+)
+register_hot_query(
+    "payroll.history_print",
+    PAYROLL_HISTORY_QUERY.format(
+        potongan=POTONGAN_COLUMNS,
+        join=POTONGAN_ITEMS_JOIN
+    ),
+    ["h", "payroll_items", "payroll_history"]
+)
+
+# (kolom, jenis, keterangan) item payroll per hari
+KOMPONEN_HARIAN = [
+    ("total_upah_borongan", "pendapatan", "Upah Borongan"),
+    ("gaji_pokok", "pendapatan", "Gaji Pokok"),
+    ("gaji_lembur", "insentif", "Lembur"),
+    ("insentif", "insentif", "Insentif Libur / Tambahan"),
+    ("potongan_telat", "potongan", "Potongan Telat"),
+    ("potongan_mes", "potongan", "Potongan Mes"),
+]
+
+
+def iter_payroll_days(conn, tanggal_awal, tanggal_akhir, bagian=None):
+    """Cursor baris harian (sqlite3.Row), urut per karyawan lalu tanggal."""
+    query = PAYROLL_DAYS_QUERY
+    params = [tanggal_awal, tanggal_akhir]
+
+    if bagian and bagian.lower() != "semua":
+        query += " AND LOWER(TRIM(e.bagian)) = ? "
+        params.append(bagian.lower())
+
+    query += " ORDER BY CAST(e.no_id AS INTEGER), e.id, a.work_date "
+
+    return conn.execute(query, params)
+
+
+def _agregat_baru(r):
+    return {
+        "employee_id": r["employee_id"],
+        "no_id": r["no_id"],
+        "nama": r["nama"],
+        "bagian": r["bagian"],
+        "hari_masuk": 0,
+        "hari_full": 0,
+        "total_upah_borongan": 0,
+        "total_gaji_pokok": 0,
+        "total_lembur": 0,
+        "total_insentif": 0,
+        "total_potongan": 0,
+        "total_potongan_barang": 0,
+        "total_gaji": 0,
+        "items": [],
+    }
+
+
+def _tambah_hari(g, r, with_items):
+    if r["work_type"] == "full":
+        g["hari_masuk"] += 1
+        g["hari_full"] += 1
+    elif r["work_type"] == "half":
+        g["hari_masuk"] += 0.5
+
+    nilai = {
+        kolom: int(round(r[kolom] or 0))
+        for kolom, _, _ in KOMPONEN_HARIAN
+    }
+
+    g["total_upah_borongan"] += nilai["total_upah_borongan"]
+    g["total_gaji_pokok"] += nilai["gaji_pokok"]
+    g["total_lembur"] += nilai["gaji_lembur"]
+    g["total_insentif"] += nilai["insentif"]
+
+    g["total_potongan"] += nilai["potongan_telat"] + nilai["potongan_mes"]
+
+    g["total_gaji"] += (
+        nilai["total_upah_borongan"]
+        + nilai["gaji_pokok"]
+        + nilai["gaji_lembur"]
+        + nilai["insentif"]
+        - nilai["potongan_telat"]
+        - nilai["potongan_mes"]
+    )
+
+    if not with_items:
+        return
+
+    for kolom, jenis, keterangan in KOMPONEN_HARIAN:
+        if nilai[kolom] > 0:
+            g["items"].append({
+                "tanggal": r["work_date"],
+                "jenis": jenis,
+                "keterangan": keterangan,
+                "nominal": nilai[kolom],
+            })
+
+
+def iter_payroll(conn, tanggal_awal, tanggal_akhir, bagian=None, with_items=False):
+    """
+    Yield agregat payroll per karyawan (sudah termasuk potongan barang).
+    with_items=True: sertakan rincian items untuk payroll_items.
+    """
+    potongan = resolve_potongan_barang(conn, tanggal_awal, tanggal_akhir)
+
+    g = None
+
+    for r in iter_payroll_days(conn, tanggal_awal, tanggal_akhir, bagian):
+        if g is None or r["employee_id"] != g["employee_id"]:
+            if g is not None:
+                potong_barang(g, potongan.get(g["employee_id"], []), with_items)
+                yield g
+            g = _agregat_baru(r)
+
+        _tambah_hari(g, r, with_items)
+
+    if g is not None:
+        potong_barang(g, potongan.get(g["employee_id"], []), with_items)
+        yield g
+
+
+def iter_payroll_history(conn, tanggal_awal, tanggal_akhir, with_potongan=False):
+    """
+    Yield payroll_history periode ini (dict) urut cetak.
+    with_potongan=True: tambah potongan_telat / potongan_mes / potongan_barang.
+    """
+    if with_potongan:
+        query = PAYROLL_HISTORY_QUERY.format(
+            potongan=POTONGAN_COLUMNS,
+            join=POTONGAN_ITEMS_JOIN
+        )
+        params = (tanggal_awal, tanggal_akhir, tanggal_awal, tanggal_akhir)
+    else:
+        query = PAYROLL_HISTORY_QUERY.format(potongan="", join="")
+        params = (tanggal_awal, tanggal_akhir)
+
+    for row in conn.execute(query, params):
+        yield dict(row)
@@ -1,8 +1,12 @@
 from flask import Blueprint, render_template, request, redirect, url_for, json ,jsonify
 from helpers.db import get_conn
 from datetime import date
+import time
 from helpers.auth import login_required, role_required
-from absensi.rules import hitung_gaji_harian_row
+from absensi.archive import raw_tables
+from absensi.payroll_daily import refresh_payroll_daily
+from .payroll import iter_payroll, iter_payroll_history
+from .slip_cache import cached_slip_response
 
 karyawan_bp = Blueprint("karyawan",__name__,url_prefix="/karyawan", template_folder="templates")
 
@@ -804,9 +808,9 @@ def borongan_delete_tanggal(tanggal):
 @karyawan_bp.route("/absensi")
 def absensi_index():
     from datetime import date
-    from absensi.rules import hitung_gaji_harian_row
 
     conn = get_conn()
+    refresh_payroll_daily(conn)
 
     tanggal = request.args.get("tanggal")
     status = request.args.get("status")
@@ -837,11 +841,23 @@ def absensi_index():
             a.status_hadir,
             COALESCE(a.insentif_malam, 0) AS insentif_malam,
             COALESCE(a.insentif_hari_besar, 0) AS insentif_hari_besar,
-            COALESCE(a.total_insentif, 0) AS total_insentif
+            COALESCE(a.total_insentif, 0) AS total_insentif,
+            p.work_type,
+            COALESCE(p.gaji_pokok, 0) AS gaji_pokok,
+            COALESCE(p.gaji_lembur, 0) AS gaji_lembur,
+            COALESCE(p.insentif, 0) AS insentif,
+            COALESCE(p.potongan_telat, 0) AS potongan_telat,
+            COALESCE(p.potongan_mes, 0) AS potongan_mes,
+            COALESCE(p.gaji_final, 0) AS gaji_final,
+            p.note,
+            COALESCE(p.is_valid, 1) AS is_valid
         FROM employees e
         LEFT JOIN attendance_daily a
             ON e.id = a.employee_id
            AND a.work_date = ?
+        LEFT JOIN payroll_daily_computed p
+            ON p.employee_id = a.employee_id
+           AND p.work_date = a.work_date
         WHERE e.status_aktif = 1
         ORDER BY CAST(e.no_id AS INTEGER)
     """, (tanggal,)).fetchall()
@@ -861,21 +877,19 @@ def absensi_index():
     if bagian:
         rows = [r for r in rows if r["bagian"] == bagian]
 
-    # hitung gaji runtime
+    # gaji dari payroll_daily_computed
+    # halaman ini tampil tanpa potongan mes
     for r in rows:
-        hasil = hitung_gaji_harian_row(r)
+        if not r["work_type"]:
+            r["work_type"] = "none"
+            r["note"] = "Tidak hadir"
 
-        r["work_type"] = hasil["work_type"]
-        r["gaji_pokok"] = hasil["gaji_pokok"]
-        r["gaji_lembur"] = hasil["gaji_lembur"]
-        r["insentif"] = hasil["insentif"]
-        r["potongan_telat"] = hasil["potongan_telat"]
-        r["gaji_final"] = hasil["gaji_final"]
-        r["note"] = hasil["note"]
-        r["is_valid"] = hasil["is_valid"]
+        r["gaji_final"] += r.pop("potongan_mes")
+        r["note"] = r["note"] or ""
+        r["is_valid"] = bool(r["is_valid"])
 
         # biar template lama tetap jalan
-        r["gaji_draft"] = hasil["gaji_final"]
+        r["gaji_draft"] = r["gaji_final"]
 
     total = {
         "gaji": sum(int(r.get("gaji_final") or 0) for r in rows),
@@ -985,22 +999,6 @@ def rekap_mingguan():
         summary=summary
     )
 
-def cek_tinggal_di_mes(conn, employee_id, work_date):
-    row = conn.execute("""
-        SELECT id
-        FROM employee_mes_history
-        WHERE employee_id = ?
-          AND tanggal_mulai <= ?
-          AND (
-                tanggal_selesai IS NULL
-                OR tanggal_selesai = ''
-                OR tanggal_selesai > ?
-              )
-        LIMIT 1
-    """, (employee_id, work_date, work_date)).fetchone()
-
-    return row is not None
-
 @karyawan_bp.route("/payroll", methods=["GET"])
 
 def payroll_index():
@@ -1022,151 +1020,15 @@ def payroll_index():
 
     if tanggal_awal and tanggal_akhir:
         conn = get_conn()
+        refresh_payroll_daily(conn)
 
-        query = """
-            SELECT
-                e.id AS employee_id,
-                e.no_id,
-                e.nama,
-                e.bagian,
-                e.shift_default AS shift_code,
-                COALESCE(e.gaji_harian, 100000) AS gaji_harian,
-                COALESCE(e.tinggal_di_mes, 0) AS tinggal_di_mes,
-
-                a.work_date,
-                a.period1_in,
-                a.period1_out,
-                a.period2_in,
-                a.period2_out,
-                a.period3_in,
-                a.period3_out,
-                a.actual_hours,
-                a.late_minutes,
-                a.early_leave_minutes,
-                a.overtime_hours,
-                a.status_hadir,
-
-                COALESCE(b.total_upah, 0) AS total_upah_borongan
-
-            FROM employees e
-            LEFT JOIN attendance_daily a
-                ON e.id = a.employee_id
-               AND a.work_date BETWEEN ? AND ?
-            LEFT JOIN (
-                SELECT
-                     no_id,
-                     tanggal,
-                     SUM(total_upah) AS total_upah
-              FROM borongan_logs
-             GROUP BY no_id, tanggal
-            ) b
-    ON b.no_id = e.no_id
-    AND b.tanggal = a.work_date
-            WHERE e.status_aktif = 1
-        """
-
-        params = [tanggal_awal, tanggal_akhir]
-
-        if bagian and bagian.lower() != "semua":
-            query += " AND LOWER(TRIM(e.bagian)) = ? "
-            params.append(bagian.lower())
-
-        query += " ORDER BY CAST(e.no_id AS INTEGER), a.work_date "
-
-        data = conn.execute(query, params).fetchall()
-        data = [dict(r) for r in data]
-
-        grouped = {}
-
-        for r in data:
-            emp_id = r["employee_id"]
-
-            if emp_id not in grouped:
-                grouped[emp_id] = {
-                    "employee_id": emp_id,
-                    "no_id": r["no_id"],
-                    "nama": r["nama"],
-                    "bagian": r["bagian"],
-                    "hari_masuk": 0,
-                    "total_upah_borongan": 0,
-                    "total_gaji_pokok": 0,
-                    "total_lembur": 0,
-                    "total_insentif": 0,
-                    "total_potongan": 0,
-                    "total_potongan_barang": 0,  # ✅ tambah ini
-                    "total_gaji": 0,
-                }
-
-            # hitung absensi runtime
-            # inject status mes dari history (per hari)
-            if r.get("work_date"):
-                r["tinggal_di_mes"] = 1 if cek_tinggal_di_mes(
-                    conn,
-                    r["employee_id"],
-                    r["work_date"]
-                ) else 0
-            else:
-                r["tinggal_di_mes"] = 0
-
-            # hitung absensi runtime
-            hasil = hitung_gaji_harian_row(r)
-
-            if hasil["work_type"] == "full":
-                grouped[emp_id]["hari_masuk"] += 1
-
-            grouped[emp_id]["total_upah_borongan"] += int(round(r.get("total_upah_borongan") or 0))
-            grouped[emp_id]["total_gaji_pokok"] += int(round(hasil["gaji_pokok"] or 0))
-            grouped[emp_id]["total_lembur"] += int(round(hasil["gaji_lembur"] or 0))
-            grouped[emp_id]["total_insentif"] += int(round(hasil["insentif"] or 0))
-
-            grouped[emp_id]["total_potongan"] += (
-                    int(round(hasil.get("potongan_telat", 0) or 0))
-                    + int(round(hasil.get("potongan_mes", 0) or 0))
+        # preview: hari_masuk hanya hari full
+        rows = []
+        for g in iter_payroll(conn, tanggal_awal, tanggal_akhir, bagian):
+            g["hari_masuk"] = g.pop("hari_full")
+            del g["items"]
+            rows.append(g)
 
-            )
-
-            grouped[emp_id]["total_gaji"] += (
-                    int(round(r.get("total_upah_borongan") or 0))
-                    + int(round(hasil["gaji_pokok"] or 0))
-                    + int(round(hasil["gaji_lembur"] or 0))
-                    + int(round(hasil["insentif"] or 0))
-                    - int(round(hasil.get("potongan_telat", 0) or 0))
-                    - int(round(hasil.get("potongan_mes", 0) or 0))
-            )
-        # =========================
-        # POTONGAN BARANG PER PERIODE
-        # hitung sekali per karyawan, bukan per hari
-        # =========================
-        for emp_id, g in grouped.items():
-            potongan_barang = conn.execute("""
-                SELECT
-                    COALESCE(SUM(
-                        CASE
-                            WHEN metode_potong = 'sekali' THEN total
-                            WHEN metode_potong = 'cicilan' THEN
-                                CASE
-                                    WHEN sisa < cicilan_per_minggu THEN sisa
-                                    ELSE cicilan_per_minggu
-                                END
-                            ELSE 0
-                        END
-                    ), 0) AS total
-                FROM employee_items
-                WHERE employee_id = ?
-                  AND status = 'aktif'
-                  AND tanggal BETWEEN ? AND ?
-            """, (
-                emp_id,
-                tanggal_awal,
-                tanggal_akhir
-            )).fetchone()["total"]
-
-            potongan_barang = int(potongan_barang or 0)
-
-            g["total_potongan_barang"] = potongan_barang
-            g["total_potongan"] += potongan_barang
-            g["total_gaji"] -= potongan_barang
-        rows = list(grouped.values())
         bagian_order = {
             "borongan": 1,
             "produksi": 2,
@@ -1478,8 +1340,6 @@ def employee_items():
     )
 @karyawan_bp.route("/payroll/finalize", methods=["POST"])
 def payroll_finalize():
-    from absensi.rules import hitung_gaji_harian_row
-
     conn = get_conn()
 
     tanggal_awal = request.form.get("tanggal_awal")
@@ -1490,6 +1350,15 @@ def payroll_finalize():
         conn.close()
         return redirect(url_for("karyawan.payroll_index"))
 
+    waktu = {}
+    t0 = time.perf_counter()
+
+    refresh_payroll_daily(conn)
+    waktu["refresh"] = time.perf_counter() - t0
+
+    # 1 transaksi untuk hapus + tulis ulang periode ini
+    conn.execute("BEGIN IMMEDIATE")
+
     # hapus history lama untuk periode yang sama agar tidak dobel finalize
     conn.execute("""
         DELETE FROM payroll_items
@@ -1506,220 +1375,34 @@ def payroll_finalize():
           AND tanggal_akhir = ?
     """, (tanggal_awal, tanggal_akhir))
 
-    query = """
-        SELECT
-            e.id AS employee_id,
-            e.no_id,
-            e.nama,
-            e.bagian,
-            e.shift_default AS shift_code,
-            COALESCE(e.gaji_harian, 100000) AS gaji_harian,
-            COALESCE(e.tinggal_di_mes, 0) AS tinggal_di_mes,
-
-            a.work_date,
-            a.period1_in,
-            a.period1_out,
-            a.period2_in,
-            a.period2_out,
-            a.period3_in,
-            a.period3_out,
-            a.actual_hours,
-            a.late_minutes,
-            a.early_leave_minutes,
-            a.overtime_hours,
-            a.status_hadir,
-
-            COALESCE(b.total_upah, 0) AS total_upah_borongan
-
-        FROM employees e
-        LEFT JOIN attendance_daily a
-            ON e.id = a.employee_id
-           AND a.work_date BETWEEN ? AND ?
-        LEFT JOIN borongan_logs b
-            ON b.no_id = e.no_id
-           AND b.tanggal = a.work_date
-        WHERE e.status_aktif = 1
-    """
-
-    params = [tanggal_awal, tanggal_akhir]
-
-    if bagian and bagian.lower() != "semua":
-        query += " AND LOWER(TRIM(e.bagian)) = ? "
-        params.append(bagian.lower())
-
-    query += " ORDER BY CAST(e.no_id AS INTEGER), a.work_date "
-
-    data = conn.execute(query, params).fetchall()
-    data = [dict(r) for r in data]
-
-    grouped = {}
-
-    for r in data:
-        emp_id = r["employee_id"]
-
-        if emp_id not in grouped:
-            grouped[emp_id] = {
-                "employee_id": emp_id,
-                "no_id": r["no_id"],
-                "nama": r["nama"],
-                "bagian": r["bagian"],
-                "hari_masuk": 0,
-                "total_upah_borongan": 0,
-                "total_gaji_pokok": 0,
-                "total_lembur": 0,
-                "total_insentif": 0,
-                "total_potongan": 0,
-                "total_potongan_barang": 0,
-                "total_gaji": 0,
-                "items": [],
-            }
-
-        if r.get("work_date"):
-            r["tinggal_di_mes"] = 1 if cek_tinggal_di_mes(
-                conn,
-                r["employee_id"],
-                r["work_date"]
-            ) else 0
-        else:
-            r["tinggal_di_mes"] = 0
-
-        hasil = hitung_gaji_harian_row(r)
-
-        if hasil["work_type"] == "full":
-            grouped[emp_id]["hari_masuk"] += 1
-        elif hasil["work_type"] == "half":
-            grouped[emp_id]["hari_masuk"] += 0.5
-
-        upah_borongan = int(round(r.get("total_upah_borongan") or 0))
-        gaji_pokok = int(round(hasil.get("gaji_pokok") or 0))
-        gaji_lembur = int(round(hasil.get("gaji_lembur") or 0))
-        insentif = int(round(hasil.get("insentif") or 0))
-        potongan_telat = int(round(hasil.get("potongan_telat") or 0))
-        potongan_mes = int(round(hasil.get("potongan_mes") or 0))
-
-        grouped[emp_id]["total_upah_borongan"] += upah_borongan
-        grouped[emp_id]["total_gaji_pokok"] += gaji_pokok
-        grouped[emp_id]["total_lembur"] += gaji_lembur
-        grouped[emp_id]["total_insentif"] += insentif
-
-        grouped[emp_id]["total_potongan"] += potongan_telat + potongan_mes
-
-        grouped[emp_id]["total_gaji"] += (
-            upah_borongan
-            + gaji_pokok
-            + gaji_lembur
-            + insentif
-            - potongan_telat
-            - potongan_mes
+    # hasil rule harian sudah ada di payroll_daily_computed
+    t0 = time.perf_counter()
+    grouped = {
+        g["employee_id"]: g
+        for g in iter_payroll(
+            conn, tanggal_awal, tanggal_akhir, bagian, with_items=True
         )
-
-        if upah_borongan > 0:
-            grouped[emp_id]["items"].append({
-                "tanggal": r.get("work_date"),
-                "jenis": "pendapatan",
-                "keterangan": "Upah Borongan",
-                "nominal": upah_borongan,
-            })
-
-        if gaji_pokok > 0:
-            grouped[emp_id]["items"].append({
-                "tanggal": r.get("work_date"),
-                "jenis": "pendapatan",
-                "keterangan": "Gaji Pokok",
-                "nominal": gaji_pokok,
-            })
-
-        if gaji_lembur > 0:
-            grouped[emp_id]["items"].append({
-                "tanggal": r.get("work_date"),
-                "jenis": "insentif",
-                "keterangan": "Lembur",
-                "nominal": gaji_lembur,
-            })
-
-        if insentif > 0:
-            grouped[emp_id]["items"].append({
-                "tanggal": r.get("work_date"),
-                "jenis": "insentif",
-                "keterangan": "Insentif Libur / Tambahan",
-                "nominal": insentif,
-            })
-
-        if potongan_telat > 0:
-            grouped[emp_id]["items"].append({
-                "tanggal": r.get("work_date"),
-                "jenis": "potongan",
-                "keterangan": "Potongan Telat",
-                "nominal": potongan_telat,
-            })
-
-        if potongan_mes > 0:
-            grouped[emp_id]["items"].append({
-                "tanggal": r.get("work_date"),
-                "jenis": "potongan",
-                "keterangan": "Potongan Mes",
-                "nominal": potongan_mes,
-            })
-
-    # potongan barang per karyawan
-    for emp_id, g in grouped.items():
-        barang_rows = conn.execute("""
-            SELECT
-                id,
-                tanggal,
-                nama_item,
-                total,
-                metode_potong,
-                cicilan_per_minggu,
-                sisa
-            FROM employee_items
-            WHERE employee_id = ?
-              AND status = 'aktif'
-              AND tanggal BETWEEN ? AND ?
-        """, (emp_id, tanggal_awal, tanggal_akhir)).fetchall()
-
-        for item in barang_rows:
-            if item["metode_potong"] == "sekali":
-                nominal = int(item["total"] or 0)
-            elif item["metode_potong"] == "cicilan":
-                nominal = min(
-                    int(item["sisa"] or 0),
-                    int(item["cicilan_per_minggu"] or 0)
-                )
-            else:
-                nominal = 0
-
-            if nominal <= 0:
-                continue
-
-            g["total_potongan_barang"] += nominal
-            g["total_potongan"] += nominal
-            g["total_gaji"] -= nominal
-
-            g["items"].append({
-                "tanggal": item["tanggal"],
-                "jenis": "potongan_barang",
-                "keterangan": item["nama_item"],
-                "nominal": nominal,
-            })
-
-    # simpan payroll_history dan payroll_items
-    for emp_id, g in grouped.items():
-        cur = conn.execute("""
-            INSERT INTO payroll_history (
-                employee_id, no_id, nama, bagian,
-                tanggal_awal, tanggal_akhir,
-                hari_masuk,
-                total_upah_borongan,
-                total_gaji_pokok,
-                total_lembur,
-                total_insentif,
-                total_potongan,
-                total_potongan_barang,
-                total_gaji
-            )
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        """, (
+    }
+    waktu["hitung"] = time.perf_counter() - t0
+
+    # simpan payroll_history (1 batch)
+    t0 = time.perf_counter()
+    conn.executemany("""
+        INSERT INTO payroll_history (
+            employee_id, no_id, nama, bagian,
+            tanggal_awal, tanggal_akhir,
+            hari_masuk,
+            total_upah_borongan,
+            total_gaji_pokok,
+            total_lembur,
+            total_insentif,
+            total_potongan,
+            total_potongan_barang,
+            total_gaji
+        )
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    """, [
+        (
             g["employee_id"],
             g["no_id"],
             g["nama"],
@@ -1734,29 +1417,47 @@ def payroll_finalize():
             g["total_potongan"],
             g["total_potongan_barang"],
             g["total_gaji"],
-        ))
-
-        payroll_id = cur.lastrowid
+        )
+        for g in grouped.values()
+    ])
+    waktu["history"] = time.perf_counter() - t0
+
+    # payroll_id hasil insert: periode ini sudah dihapus di atas,
+    # jadi 1 baris per employee_id
+    t0 = time.perf_counter()
+    payroll_ids = {
+        r["employee_id"]: r["id"]
+        for r in conn.execute("""
+            SELECT id, employee_id
+            FROM payroll_history
+            WHERE tanggal_awal = ?
+              AND tanggal_akhir = ?
+        """, (tanggal_awal, tanggal_akhir)).fetchall()
+    }
 
-        for item in g["items"]:
-            conn.execute("""
-                INSERT INTO payroll_items (
-                    payroll_id,
-                    employee_id,
-                    tanggal,
-                    jenis,
-                    keterangan,
-                    nominal
-                )
-                VALUES (?, ?, ?, ?, ?, ?)
-            """, (
-                payroll_id,
-                g["employee_id"],
-                item["tanggal"],
-                item["jenis"],
-                item["keterangan"],
-                item["nominal"],
-            ))
+    conn.executemany("""
+        INSERT INTO payroll_items (
+            payroll_id,
+            employee_id,
+            tanggal,
+            jenis,
+            keterangan,
+            nominal
+        )
+        VALUES (?, ?, ?, ?, ?, ?)
+    """, [
+        (
+            payroll_ids[emp_id],
+            g["employee_id"],
+            item["tanggal"],
+            item["jenis"],
+            item["keterangan"],
+            item["nominal"],
+        )
+        for emp_id, g in grouped.items()
+        for item in g["items"]
+    ])
+    waktu["items"] = time.perf_counter() - t0
 
     # potongan sekali: tandai sudah dipotong
     # COMMENT sementara
@@ -1792,8 +1493,16 @@ def payroll_finalize():
         #         WHERE id = ?
         #     """, ...)
 
+    t0 = time.perf_counter()
     conn.commit()
     conn.close()
+    waktu["commit"] = time.perf_counter() - t0
+
+    print(
+        f"⏱️ Finalize {tanggal_awal} s/d {tanggal_akhir}: "
+        f"{len(grouped)} karyawan, "
+        + ", ".join(f"{k} {v:.3f}s" for k, v in waktu.items())
+    )
 
     return redirect(url_for(
         "karyawan.payroll_index",
@@ -2001,61 +1710,22 @@ def payroll_print_bulk():
     tanggal_awal = request.args.get("tanggal_awal")
     tanggal_akhir = request.args.get("tanggal_akhir")
 
-    rows = conn.execute("""
-        SELECT *
-        FROM payroll_history
-        WHERE tanggal_awal = ?
-          AND tanggal_akhir = ?
-          AND total_gaji != 0
-        ORDER BY
-          CASE LOWER(TRIM(bagian))
-            WHEN 'borongan' THEN 1
-            WHEN 'produksi' THEN 2
-            WHEN 'beku' THEN 3
-            WHEN 'coldroom' THEN 4
-            WHEN 'malam' THEN 5
-            WHEN 'umum' THEN 6
-            WHEN 'kebersihan' THEN 7
-            ELSE 99
-          END,
-          CAST(no_id AS INTEGER)
-    """, (tanggal_awal, tanggal_akhir)).fetchall()
-
-    rows = [dict(r) for r in rows]
-
-    for r in rows:
-        items = conn.execute("""
-            SELECT *
-            FROM payroll_items
-            WHERE payroll_id = ?
-        """, (r["id"],)).fetchall()
-
-        items = [dict(i) for i in items]
-
-        r["potongan_telat"] = sum(
-            int(i["nominal"] or 0)
-            for i in items
-            if i["keterangan"] == "Potongan Telat"
-        )
+    template = "karyawan/payroll_print_bulk.html"
 
-        r["potongan_mes"] = sum(
-            int(i["nominal"] or 0)
-            for i in items
-            if i["keterangan"] == "Potongan Mes"
+    def render():
+        return render_template(
+            template,
+            rows=list(iter_payroll_history(
+                conn, tanggal_awal, tanggal_akhir, with_potongan=True
+            ))
         )
 
-        r["potongan_barang"] = sum(
-            int(i["nominal"] or 0)
-            for i in items
-            if i["jenis"] == "potongan_barang"
+    try:
+        return cached_slip_response(
+            conn, "print", tanggal_awal, tanggal_akhir, template, render
         )
-
-    conn.close()
-
-    return render_template(
-        "karyawan/payroll_print_bulk.html",
-        rows=rows
-    )
+    finally:
+        conn.close()
 @karyawan_bp.route("/payroll/history/receipt")
 def payroll_receipt_print():
     conn = get_conn()
@@ -2063,35 +1733,22 @@ def payroll_receipt_print():
     tanggal_awal = request.args.get("tanggal_awal")
     tanggal_akhir = request.args.get("tanggal_akhir")
 
-    rows = conn.execute("""
-        SELECT *
-        FROM payroll_history
-        WHERE tanggal_awal = ?
-          AND tanggal_akhir = ?
-          AND total_gaji != 0
-        ORDER BY
-          CASE LOWER(TRIM(bagian))
-            WHEN 'borongan' THEN 1
-            WHEN 'produksi' THEN 2
-            WHEN 'beku' THEN 3
-            WHEN 'coldroom' THEN 4
-            WHEN 'malam' THEN 5
-            WHEN 'umum' THEN 6
-            WHEN 'kebersihan' THEN 7
-            ELSE 99
-          END,
-          CAST(no_id AS INTEGER)
-    """, (tanggal_awal, tanggal_akhir)).fetchall()
+    template = "karyawan/payroll_receipt_print.html"
 
-    rows = [dict(r) for r in rows]
-    conn.close()
+    def render():
+        return render_template(
+            template,
+            rows=list(iter_payroll_history(conn, tanggal_awal, tanggal_akhir)),
+            tanggal_awal=tanggal_awal,
+            tanggal_akhir=tanggal_akhir
+        )
 
-    return render_template(
-        "karyawan/payroll_receipt_print.html",
-        rows=rows,
-        tanggal_awal=tanggal_awal,
-        tanggal_akhir=tanggal_akhir
-    )
+    try:
+        return cached_slip_response(
+            conn, "receipt", tanggal_awal, tanggal_akhir, template, render
+        )
+    finally:
+        conn.close()
 @karyawan_bp.route("/payroll/confirm", methods=["POST"])
 def payroll_confirm():
     conn = get_conn()
@@ -2156,7 +1813,22 @@ def raw_index():
     tanggal = request.args.get("tanggal")
     no_id = request.args.get("no_id")
 
-    query = """
+    where = " WHERE 1=1"
+    params = []
+
+    if tanggal:
+        where += " AND tanggal = ?"
+        params.append(tanggal)
+
+    if no_id:
+        where += " AND no_id = ?"
+        params.append(no_id)
+
+    # tanggal lama bisa ada di tabel arsip bulanan
+    tables = raw_tables(conn, [tanggal] if tanggal else None)
+
+    query = " UNION ALL ".join(
+        f"""
         SELECT
             tanggal,
             waktu,
@@ -2166,19 +1838,12 @@ def raw_index():
             status_absen,
             sumber,
             processed
-        FROM attendance_raw
-        WHERE 1=1
-    """
-
-    params = []
-
-    if tanggal:
-        query += " AND tanggal = ?"
-        params.append(tanggal)
-
-    if no_id:
-        query += " AND no_id = ?"
-        params.append(no_id)
+        FROM {table}
+        {where}
+        """
+        for table in tables
+    )
+    params = params * len(tables)
 
     query += " ORDER BY waktu DESC LIMIT 500"
 
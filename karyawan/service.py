@@ -0,0 +1,82 @@
+from helpers.query_plan import register_hot_query
+
+POTONGAN_BARANG_QUERY = """
+    SELECT
+        id,
+        employee_id,
+        tanggal,
+        nama_item,
+        total,
+        metode_potong,
+        cicilan_per_minggu,
+        sisa
+    FROM employee_items
+    WHERE status = 'aktif'
+      AND tanggal BETWEEN ? AND ?
+    ORDER BY employee_id, id
+"""
+
+register_hot_query(
+    "payroll.potongan_barang",
+    POTONGAN_BARANG_QUERY,
+    ["employee_items"]
+)
+
+
+def nominal_potongan_barang(item):
+    """Nominal yang dipotong periode ini untuk 1 baris employee_items."""
+    if item["metode_potong"] == "sekali":
+        return int(item["total"] or 0)
+
+    if item["metode_potong"] == "cicilan":
+        return min(
+            int(item["sisa"] or 0),
+            int(item["cicilan_per_minggu"] or 0)
+        )
+
+    return 0
+
+
+def resolve_potongan_barang(conn, tanggal_awal, tanggal_akhir):
+    """
+    Semua potongan barang aktif periode ini dalam 1 query.
+    Return {employee_id: [item, ...]}, item berisi nominal > 0.
+    Dipakai preview payroll dan finalize.
+    """
+    rows = conn.execute(
+        POTONGAN_BARANG_QUERY,
+        (tanggal_awal, tanggal_akhir)
+    ).fetchall()
+
+    hasil = {}
+
+    for item in rows:
+        nominal = nominal_potongan_barang(item)
+
+        if nominal <= 0:
+            continue
+
+        hasil.setdefault(item["employee_id"], []).append({
+            "id": item["id"],
+            "tanggal": item["tanggal"],
+            "nama_item": item["nama_item"],
+            "nominal": nominal,
+        })
+
+    return hasil
+
+
+def potong_barang(g, items, with_items=False):
+    """Kurangi total 1 agregat karyawan dengan item dari resolve_potongan_barang."""
+    for item in items:
+        g["total_potongan_barang"] += item["nominal"]
+        g["total_potongan"] += item["nominal"]
+        g["total_gaji"] -= item["nominal"]
+
+        if with_items:
+            g["items"].append({
+                "tanggal": item["tanggal"],
+                "jenis": "potongan_barang",
+                "keterangan": item["nama_item"],
+                "nominal": item["nominal"],
+            })
@@ -0,0 +1,107 @@
+import hashlib
+import os
+
+from flask import current_app, make_response, request
+
+from helpers.db import DB_PATH
+
+# hasil render slip per (jenis, periode, versi finalize), default di samping DB
+CACHE_DIR = os.environ.get("PAYROLL_SLIP_CACHE") or os.path.join(
+    os.path.dirname(os.path.abspath(DB_PATH)), "slip_cache"
+)
+
+
+def period_version(conn, tanggal_awal, tanggal_akhir):
+    """
+    Versi data slip 1 periode.
+
+    Slip / receipt hanya membaca payroll_history + payroll_items; nama,
+    no_id, bagian sudah di-snapshot saat finalize, jadi edit employees baru
+    tampil setelah finalize ulang (dan finalize ulang ganti versi).
+    payroll_period_versions naik lewat trigger di kedua tabel hanya untuk
+    periode baris yang berubah, termasuk edit langsung dari admin DB.
+    """
+    row = conn.execute("""
+        SELECT
+            COUNT(*) AS jumlah,
+            COALESCE(MAX(id), 0) AS max_id,
+            COALESCE(SUM(CASE WHEN status = 'paid' THEN 1 ELSE 0 END), 0) AS paid,
+            (
+                SELECT versi
+                FROM payroll_period_versions
+                WHERE tanggal_awal = ?
+                  AND tanggal_akhir = ?
+            ) AS data_versi
+        FROM payroll_history
+        WHERE tanggal_awal = ?
+          AND tanggal_akhir = ?
+    """, (tanggal_awal, tanggal_akhir, tanggal_awal, tanggal_akhir)).fetchone()
+
+    return f"{row['jumlah']}-{row['max_id']}-{row['paid']}-{row['data_versi'] or 0}"
+
+
+def template_version(template):
+    """mtime file template, supaya deploy template baru tidak dapat HTML lama."""
+    path = current_app.jinja_env.get_or_select_template(template).filename
+
+    try:
+        return int(os.path.getmtime(path))
+    except (OSError, TypeError):
+        return 0
+
+
+def _periode_key(jenis, tanggal_awal, tanggal_akhir):
+    # tanggal dari query string: jangan dipakai langsung sebagai nama file
+    return hashlib.sha1(
+        f"{jenis}|{tanggal_awal}|{tanggal_akhir}".encode()
+    ).hexdigest()[:16]
+
+
+def _hapus_versi_lama(prefix, keep):
+    for nama in os.listdir(CACHE_DIR):
+        path = os.path.join(CACHE_DIR, nama)
+        if nama.startswith(prefix) and path != keep:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+
+def cached_slip_response(conn, jenis, tanggal_awal, tanggal_akhir, template, render):
+    """
+    Response HTML slip dari cache disk (render() hanya dipanggil kalau
+    versi periode / template belum pernah dirender). Browser selalu
+    revalidasi pakai ETag: periode paid pun masih bisa difinalize ulang.
+    """
+    versi = f"{period_version(conn, tanggal_awal, tanggal_akhir)}-{template_version(template)}"
+
+    prefix = f"{jenis}_{_periode_key(jenis, tanggal_awal, tanggal_akhir)}_"
+    etag = f"{prefix}{versi}"
+
+    if etag in request.if_none_match:
+        resp = make_response("", 304)
+    else:
+        path = os.path.join(CACHE_DIR, f"{etag}.html")
+
+        try:
+            with open(path, encoding="utf-8") as f:
+                html = f.read()
+        except OSError:
+            html = render()
+
+            try:
+                os.makedirs(CACHE_DIR, exist_ok=True)
+                tmp = f"{path}.{os.getpid()}.tmp"
+                with open(tmp, "w", encoding="utf-8") as f:
+                    f.write(html)
+                os.replace(tmp, path)
+                _hapus_versi_lama(prefix, path)
+            except OSError as e:
+                print("⚠️ Gagal simpan cache slip:", e)
+
+        resp = make_response(html)
+
+    resp.set_etag(etag)
+    resp.headers["Cache-Control"] = "private, no-cache"
+
+    return resp
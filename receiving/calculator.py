@@ -1,10 +1,9 @@
 
 from helpers.number_utils import to_float
-import json
+from receiving.weighing import clean_timbangan
 
 def hitung_partai(p):
-    timbangan = p.get("timbangan") or []
-    timbangan = [to_float(x) for x in timbangan if to_float(x) > 0]
+    timbangan = clean_timbangan(p.get("timbangan"))
 
     tara = to_float(p.get("tara_per_keranjang"))
 
@@ -31,28 +30,30 @@ def hitung_partai(p):
         "netto": netto,
         "size": size,
         "round_size": round_size,
-        "timbangan_json": json.dumps(timbangan)
+        "timbangan": timbangan
     }
 
-import json
-
 def recalc_receiving(conn, header_id: int):
     cur = conn.cursor()
 
+    # jumlah & total berat keranjang langsung dari receiving_weighing
     rows = cur.execute("""
-        SELECT id, pcs, kg_sample, tara_per_keranjang, timbangan_json, fiber
-        FROM receiving_item
-        WHERE header_id=?
+        SELECT
+            i.id, i.pcs, i.kg_sample, i.tara_per_keranjang, i.fiber,
+            COUNT(w.id) AS keranjang,
+            COALESCE(SUM(w.berat), 0) AS bruto
+        FROM receiving_item i
+        LEFT JOIN receiving_weighing w
+            ON w.item_id = i.id
+        WHERE i.header_id=?
+        GROUP BY i.id
     """, (header_id,)).fetchall()
 
     total_fiber = 0.0
 
     for r in rows:
-        timbangan = json.loads(r["timbangan_json"] or "[]")
-        timbangan = [float(x) for x in timbangan if x]
-
-        keranjang = len(timbangan)
-        bruto = sum(timbangan)
+        keranjang = r["keranjang"]
+        bruto = r["bruto"]
 
         tara = float(r["tara_per_keranjang"] or 0)
         total_tara = keranjang * tara
@@ -1,17 +1,18 @@
 from flask import render_template, request, redirect, url_for, jsonify, session
 from datetime import date
-import json
 from flask import current_app
 from . import receiving_bp
 from invoice.service import rebuild_invoice_from_receiving_if_exists
 from helpers.auth import require_login, login_required
 from helpers.db import init_db, get_conn
 from helpers.number_utils import to_int, to_float
-from helpers.db import get_conn, DB_PATH
+from helpers.db import get_conn, DB_PATH, begin_immediate
+from helpers.sequences import next_sequence
 from receiving.calculator import hitung_partai
-from receiving.service import update_receiving
+from receiving.service import update_receiving, diff_partai, ITEM_COLUMNS, nilai_sama
+from receiving.weighing import save_weighing, save_weighing_many, load_weighing
 from invoice.service import create_invoice_from_receiving
-from invoice.repository import get_invoice_by_receiving, get_jenis_mode
+from invoice.repository import get_invoice_by_receiving
 
 @receiving_bp.get("/")
 def receiving():
@@ -50,10 +51,9 @@ def receiving_save():
 
     try:
         # ===== GENERATE RECEIVING_NO =====
-        row = cur.execute(
-            "SELECT COALESCE(MAX(receiving_no), 0) + 1 AS next_no FROM receiving_header"
-        ).fetchone()
-        receiving_no = row["next_no"]
+        # kunci tulis dari awal: nomor + insert dalam 1 transaksi
+        begin_immediate(conn)
+        receiving_no = next_sequence(conn, "receiving_no")
 
         # ===== INSERT HEADER =====
         cur.execute("""
@@ -72,12 +72,7 @@ def receiving_save():
 
         # ===== INSERT PARTAI =====
         for p in partai_list:
-            timbangan = p.get("timbangan") or []
-
-            h = hitung_partai({
-                **p,
-                "timbangan": timbangan
-            })
+            h = hitung_partai(p)
 
             cur.execute("""
                 INSERT INTO receiving_item (
@@ -93,11 +88,10 @@ def receiving_save():
                     total_tara,
                     netto,
                     note,
-                    timbangan_json,
                     kategori_kupasan,
                     grade_manual,
                     fiber
-                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
             """, (
                 header_id,
                 p.get("partai_no"),
@@ -111,11 +105,11 @@ def receiving_save():
                 h.get("total_tara"),
                 h.get("netto"),
                 p.get("note"),
-                json.dumps(timbangan),
                 p.get("kategori_kupasan"),
                 (p.get("grade_manual") or None),
                 p.get("fiber")
             ))
+            save_weighing(conn, cur.lastrowid, h["timbangan"])
 
         conn.commit()
         return jsonify({
@@ -148,153 +142,105 @@ def receiving_update(header_id):
     cur = conn.cursor()
 
     try:
-        # ===== UPDATE HEADER (opsional) =====
+        invoice_berubah = False
+
+        # ===== UPDATE HEADER (opsional, hanya kalau berubah) =====
         if header:
-            cur.execute("""
-                UPDATE receiving_header
-                SET tanggal = ?, supplier = ?, jenis = ?, fiber = ?
+            lama = cur.execute("""
+                SELECT tanggal, supplier, jenis, fiber
+                FROM receiving_header
                 WHERE id = ?
-            """, (
+            """, (header_id,)).fetchone()
+
+            baru = (
                 header.get("tanggal"),
                 header.get("supplier"),
                 header.get("jenis"),
-                header.get("fiber"),
-                header_id
-            ))
-
-        # ===== AMBIL DATA LAMA UNTUK KUPASAN + EXISTING IDS =====
-        old_kupasan = {}
-        existing_ids = set()
+                header.get("fiber")
+            )
 
-        rows = cur.execute("""
-            SELECT id, partai_no, kategori_kupasan
+            if lama is None or any(
+                not nilai_sama(lama[i], baru[i]) for i in range(len(baru))
+            ):
+                cur.execute("""
+                    UPDATE receiving_header
+                    SET tanggal = ?, supplier = ?, jenis = ?, fiber = ?
+                    WHERE id = ?
+                """, (*baru, header_id))
+
+                # jenis menentukan mode harga invoice
+                if lama is not None and lama["jenis"] != baru[2]:
+                    invoice_berubah = True
+
+        # ===== DIFF PARTAI VS DATA TERSIMPAN =====
+        rows = cur.execute(f"""
+            SELECT id, {", ".join(ITEM_COLUMNS)}
             FROM receiving_item
             WHERE header_id = ?
         """, (header_id,)).fetchall()
 
-        for r in rows:
-            existing_ids.add(r["id"])
-            old_kupasan[r["partai_no"]] = r["kategori_kupasan"]
-
-        # ===== UPSERT ITEM =====
-        incoming_existing_ids = set()
-
-        for p in partai_list:
-            pid = p.get("id")  # bisa negatif (baru) atau positif (existing)
-            timbangan = p.get("timbangan") or []
-
-            h = hitung_partai({**p, "timbangan": timbangan})
-
-            kategori = p.get("kategori_kupasan")
-            if header and (header.get("jenis") or "").strip().lower() == "kupasan" and not kategori:
-                kategori = old_kupasan.get(p.get("partai_no"))
+        kupasan = bool(header) and (header.get("jenis") or "").strip().lower() == "kupasan"
+
+        diff = diff_partai(
+            rows,
+            load_weighing(conn, header_id),
+            partai_list,
+            kupasan=kupasan
+        )
+
+        # ===== UPDATE (hanya baris yang berubah) =====
+        if diff["updates"]:
+            cur.executemany(f"""
+                UPDATE receiving_item SET
+                    {", ".join(f"{k} = ?" for k in ITEM_COLUMNS)}
+                WHERE id = ? AND header_id = ?
+            """, [
+                (*(nilai[k] for k in ITEM_COLUMNS), pid, header_id)
+                for pid, nilai in diff["updates"]
+            ])
+
+        timbangan = dict(diff["weighing"])
+        invoice_ids = set(diff["invoice_ids"])
+
+        # ===== INSERT BARU (id baru dibuat DB, perlu untuk timbangan) =====
+        for nilai, berat in diff["inserts"]:
+            cur.execute(f"""
+                INSERT INTO receiving_item (
+                    header_id, {", ".join(ITEM_COLUMNS)}
+                ) VALUES ({", ".join(["?"] * (len(ITEM_COLUMNS) + 1))})
+            """, (header_id, *(nilai[k] for k in ITEM_COLUMNS)))
+            timbangan[cur.lastrowid] = berat
+            invoice_ids.add(cur.lastrowid)
 
-            if pid and isinstance(pid, (int, float)) and int(pid) > 0:
-                pid = int(pid)
-
-                # UPDATE (id tetap)
-                cur.execute("""
-                    UPDATE receiving_item SET
-                        partai_no = ?,
-                        pcs = ?,
-                        kg_sample = ?,
-                        size = ?,
-                        round_size = ?,
-                        keranjang = ?,
-                        tara_per_keranjang = ?,
-                        bruto = ?,
-                        total_tara = ?,
-                        netto = ?,
-                        note = ?,
-                        timbangan_json = ?,
-                        kategori_kupasan = ?,
-                        fiber = ?
-                    WHERE id = ? AND header_id = ?
-                """, (
-                    p.get("partai_no"),
-                    p.get("pcs"),
-                    p.get("kg_sample"),
-                    h.get("size"),
-                    h.get("round_size"),
-                    h.get("keranjang"),
-                    p.get("tara_per_keranjang"),
-                    h.get("bruto"),
-                    h.get("total_tara"),
-                    h.get("netto"),
-                    p.get("note"),
-                    json.dumps(timbangan),
-                    kategori,
-                    p.get("fiber"),
-                    pid,
-                    header_id
-                ))
-                print("OLD round_size:", p.get("round_size"))
-                print("NEW round_size:", h.get("round_size"))
-                incoming_existing_ids.add(pid)
-
-            else:
-                # INSERT baru (id baru dibuat DB)
-                cur.execute("""
-                    INSERT INTO receiving_item (
-                        header_id,
-                        partai_no,
-                        pcs,
-                        kg_sample,
-                        size,
-                        round_size,
-                        keranjang,
-                        tara_per_keranjang,
-                        bruto,
-                        total_tara,
-                        netto,
-                        note,
-                        timbangan_json,
-                        kategori_kupasan,
-                        fiber
-                    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                """, (
-                    header_id,
-                    p.get("partai_no"),
-                    p.get("pcs"),
-                    p.get("kg_sample"),
-                    h.get("size"),
-                    h.get("round_size"),
-                    h.get("keranjang"),
-                    p.get("tara_per_keranjang"),
-                    h.get("bruto"),
-                    h.get("total_tara"),
-                    h.get("netto"),
-                    p.get("note"),
-                    json.dumps(timbangan),
-                    kategori,
-                    p.get("fiber")
-                ))
-
-        # ===== DELETE YANG TIDAK ADA DI PAYLOAD =====
-        ids_to_delete = existing_ids - incoming_existing_ids
-        if ids_to_delete:
-            placeholders = ",".join(["?"] * len(ids_to_delete))
-            cur.execute(
-                f"DELETE FROM receiving_item WHERE header_id = ? AND id IN ({placeholders})",
-                (header_id, *ids_to_delete)
-            )
+        save_weighing_many(conn, timbangan)
 
         # ==========================================================
-        # ✅ AUTO REBUILD INVOICE (HANYA UNTUK mode udang_size)
+        # ✅ AUTO UPDATE INVOICE: hanya baris partai yang netto /
+        # round_size / grade berubah, baru, atau dihapus. Jenis berubah
+        # = semua baris. Dijalankan sebelum DELETE supaya total invoice
+        # bisa dikurangi baris lama.
         # ==========================================================
-        rh = cur.execute(
-            "SELECT jenis FROM receiving_header WHERE id=?",
-            (header_id,)
-        ).fetchone()
+        if invoice_berubah or invoice_ids or diff["deletes"]:
+            rebuild_invoice_from_receiving_if_exists(
+                conn, header_id,
+                item_ids=(None if invoice_berubah else invoice_ids),
+                removed_ids=diff["deletes"]
+            )
 
-        jenis = (rh["jenis"] or "").strip().lower() if rh else ""
-        mode = get_jenis_mode(jenis)
+        # ===== DELETE YANG TIDAK ADA DI PAYLOAD =====
+        if diff["deletes"]:
+            cur.executemany(
+                "DELETE FROM receiving_item WHERE header_id = ? AND id = ?",
+                [(header_id, pid) for pid in diff["deletes"]]
+            )
 
-        # hanya udang_size yang aman auto-sync
-        if mode == "udang_size":
-            rebuild_invoice_from_receiving_if_exists(conn, header_id)
+        print(
+            f"🔁 Update receiving {header_id}: "
+            f"{len(diff['updates'])} ubah, {len(diff['inserts'])} baru, "
+            f"{len(diff['deletes'])} hapus, {len(diff['weighing'])} timbangan, "
+            f"{len(invoice_ids) + len(diff['deletes'])} baris invoice"
+        )
 
-        rebuild_invoice_from_receiving_if_exists(conn, header_id)
         conn.commit()
         return jsonify({"ok": True})
 
@@ -407,6 +353,8 @@ def receiving_detail(header_id):
         ORDER BY partai_no
     """, (header_id,)).fetchall()
 
+    timbangan = load_weighing(conn, header_id)
+
     conn.close()
 
     partai = []
@@ -416,7 +364,7 @@ def receiving_detail(header_id):
 
     for r in partai_rows:
         d = dict(r)
-        d["timbangan"] = json.loads(d.get("timbangan_json") or "[]")
+        d["timbangan"] = timbangan.get(d["id"], [])
         total_netto += d.get("netto") or 0
         total_fiber += d.get("fiber") or 0
         total_size += d.get("kg_sample") or 0   # size bisa diganti sesuai formula kamu
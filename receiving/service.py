@@ -1,5 +1,5 @@
 from receiving.calculator import hitung_partai, recalc_receiving
-import json
+from receiving.weighing import save_weighing
 
 def update_receiving(conn, header_id: int, partai_list: list):
     """
@@ -25,7 +25,7 @@ def update_receiving(conn, header_id: int, partai_list: list):
                 netto=?,
                 size=?,
                 round_size=?,
-                timbangan_json=?
+                timbangan_json=NULL
             WHERE id=?
         """, (
             p.get("pcs"),
@@ -37,11 +37,118 @@ def update_receiving(conn, header_id: int, partai_list: list):
             hasil["netto"],
             hasil["size"],
             hasil["round_size"],
-            hasil["timbangan_json"],
             pid
         ))
+        save_weighing(conn, pid, hasil["timbangan"])
 
     # 🔁 hitung ulang header (fiber, dll)
     recalc_receiving(conn, header_id)
     from invoice.service import rebuild_invoice_from_receiving_if_exists
     rebuild_invoice_from_receiving_if_exists(conn, header_id)
+
+
+# =========================
+# DIFF PARTAI (receiving_update)
+# Payload dibandingkan dengan receiving_item tersimpan; hanya baris yang
+# berubah yang ditulis.
+# =========================
+
+# kolom receiving_item yang diisi dari payload update
+ITEM_COLUMNS = (
+    "partai_no", "pcs", "kg_sample", "size", "round_size", "keranjang",
+    "tara_per_keranjang", "bruto", "total_tara", "netto", "note",
+    "kategori_kupasan", "fiber",
+)
+
+# kolom yang ikut tersalin / menentukan harga di invoice_line
+INVOICE_COLUMNS = ("partai_no", "netto", "round_size", "kategori_kupasan", "note")
+
+
+def nilai_sama(a, b):
+    # "100" dari form vs 100 tersimpan (affinity kolom) dianggap sama
+    if a == b:
+        return True
+    try:
+        return float(a) == float(b)
+    except (TypeError, ValueError):
+        return False
+
+
+def nilai_partai(p, hasil, kategori):
+    """Nilai ITEM_COLUMNS 1 partai dari payload + hasil hitung_partai."""
+    return {
+        "partai_no": p.get("partai_no"),
+        "pcs": p.get("pcs"),
+        "kg_sample": p.get("kg_sample"),
+        "size": hasil.get("size"),
+        "round_size": hasil.get("round_size"),
+        "keranjang": hasil.get("keranjang"),
+        "tara_per_keranjang": p.get("tara_per_keranjang"),
+        "bruto": hasil.get("bruto"),
+        "total_tara": hasil.get("total_tara"),
+        "netto": hasil.get("netto"),
+        "note": p.get("note"),
+        "kategori_kupasan": kategori,
+        "fiber": p.get("fiber"),
+    }
+
+
+def diff_partai(rows, weighing, partai_list, kupasan=False):
+    """
+    rows: receiving_item tersimpan 1 header, weighing: {item_id: [berat]}.
+    kupasan=True: kategori kosong di payload pakai kategori lama per partai_no.
+
+    Return dict:
+      updates  -> [(id, nilai)] hanya yang berubah
+      inserts  -> [(nilai, timbangan)] partai baru (id kosong / negatif)
+      deletes  -> [id] yang tidak ada lagi di payload
+      weighing -> {id: timbangan} partai lama yang timbangannya berubah
+      invoice_ids -> id partai lama yang perubahannya mempengaruhi invoice_line
+    """
+    lama = {r["id"]: r for r in rows}
+    kategori_lama = {r["partai_no"]: r["kategori_kupasan"] for r in rows}
+
+    hasil = {
+        "updates": [],
+        "inserts": [],
+        "deletes": [],
+        "weighing": {},
+        "invoice_ids": set(),
+    }
+    dipakai = set()
+
+    for p in partai_list:
+        pid = p.get("id")  # bisa negatif (baru) atau positif (existing)
+
+        h = hitung_partai(p)
+
+        kategori = p.get("kategori_kupasan")
+        if kupasan and not kategori:
+            kategori = kategori_lama.get(p.get("partai_no"))
+
+        nilai = nilai_partai(p, h, kategori)
+
+        if not (pid and isinstance(pid, (int, float)) and int(pid) > 0):
+            hasil["inserts"].append((nilai, h["timbangan"]))
+            continue
+
+        pid = int(pid)
+        row = lama.get(pid)
+        if row is None:
+            # id milik header lain: dulu UPDATE-nya juga tidak kena baris apa pun
+            continue
+
+        dipakai.add(pid)
+
+        berubah = [k for k in ITEM_COLUMNS if not nilai_sama(row[k], nilai[k])]
+        if berubah:
+            hasil["updates"].append((pid, nilai))
+            if any(k in INVOICE_COLUMNS for k in berubah):
+                hasil["invoice_ids"].add(pid)
+
+        if weighing.get(pid, []) != h["timbangan"]:
+            hasil["weighing"][pid] = h["timbangan"]
+
+    hasil["deletes"] = [pid for pid in lama if pid not in dipakai]
+
+    return hasil
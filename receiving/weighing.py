@@ -0,0 +1,52 @@
+from helpers.number_utils import to_float
+
+# =========================
+# TIMBANGAN PER KERANJANG (receiving_weighing)
+# 1 baris = 1 keranjang, urutan mulai 1.
+# =========================
+
+
+def clean_timbangan(timbangan):
+    """Berat valid (> 0) sebagai float, urutan input dipertahankan."""
+    return [to_float(x) for x in (timbangan or []) if to_float(x) > 0]
+
+
+def save_weighing(conn, item_id, timbangan):
+    """Ganti semua timbangan 1 partai. timbangan sudah dibersihkan."""
+    save_weighing_many(conn, {item_id: timbangan})
+
+
+def save_weighing_many(conn, per_item):
+    """{item_id: [berat]} -> ganti timbangan semua partai itu sekaligus."""
+    if not per_item:
+        return
+
+    conn.executemany(
+        "DELETE FROM receiving_weighing WHERE item_id = ?",
+        [(item_id,) for item_id in per_item]
+    )
+    conn.executemany("""
+        INSERT INTO receiving_weighing (item_id, urutan, berat)
+        VALUES (?, ?, ?)
+    """, [
+        (item_id, urutan, berat)
+        for item_id, timbangan in per_item.items()
+        for urutan, berat in enumerate(timbangan, start=1)
+    ])
+
+
+def load_weighing(conn, header_id):
+    """{item_id: [berat, ...]} untuk semua partai 1 receiving."""
+    hasil = {}
+
+    for r in conn.execute("""
+        SELECT w.item_id, w.berat
+        FROM receiving_weighing w
+        JOIN receiving_item i
+            ON i.id = w.item_id
+        WHERE i.header_id = ?
+        ORDER BY w.item_id, w.urutan
+    """, (header_id,)).fetchall():
+        hasil.setdefault(r["item_id"], []).append(r["berat"])
+
+    return hasil
@@ -1,4 +1,5 @@
 from helpers.db import get_conn
+from absensi.archive import raw_scans
 from absensi.processor import process_attendance
 from datetime import datetime, timedelta
 
@@ -13,25 +14,18 @@ def plus_one_day(date_str):
     ).strftime("%Y-%m-%d")
 
 
-def reset_raw_processed(start_date, end_date):
+def load_raw_scans(start_date, end_date):
+    # tabel utama + arsip bulanan; raw yang sudah diarsip tidak bisa
+    # di-reset processed = 0, jadi scan dikirim langsung ke processor
     conn = get_conn()
-    cur = conn.cursor()
     try:
-        cur.execute("""
-            UPDATE attendance_raw
-            SET processed = 0
-            WHERE tanggal BETWEEN ? AND ?
-        """, (start_date, end_date))
-
-        updated = cur.rowcount
-        conn.commit()
-        print(f"Reset processed raw : {updated} baris")
-    except Exception:
-        conn.rollback()
-        raise
+        scans = raw_scans(conn, start_date, end_date)
     finally:
         conn.close()
 
+    print(f"Raw dibaca : {len(scans)} baris")
+    return scans
+
 
 def delete_attendance_daily(start_date, end_date):
     conn = get_conn()
@@ -59,10 +53,10 @@ def main():
     print(f"Work date : {START_DATE} s/d {END_DATE}")
     print(f"Raw date  : {START_DATE} s/d {raw_end_date}")
 
+    scans = load_raw_scans(START_DATE, raw_end_date)
     delete_attendance_daily(START_DATE, END_DATE)
-    reset_raw_processed(START_DATE, raw_end_date)
 
-    process_attendance()
+    process_attendance(scans=scans)
 
     print("Selesai reprocess.")
 
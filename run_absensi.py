@@ -1,4 +1,12 @@
-from absensi.listener import start_listener
+from helpers.db import init_db
+from absensi.archive import archive_attendance_raw
+from absensi.pipeline import start_pipeline
+
+# pastikan tabel/trigger terbaru ada (payroll_daily_computed, dll)
+init_db()
+
+# raw lama yang sudah diproses pindah ke tabel arsip bulanan
+archive_attendance_raw()
 
 print("🚀 Listener Absensi Jalan...")
-start_listener()
\ No newline at end of file
+start_pipeline()
@@ -1,4 +1,6 @@
 from helpers.db import get_conn
+from absensi.archive import raw_scans
+from absensi.processor import process_attendance
 
 TANGGAL = "2026-04-17"
 SHIFT = "BORONGAN"
@@ -8,6 +10,24 @@ def main():
     cur = conn.cursor()
 
     try:
+        fingerprints = {
+            r["fingerprint_id"]
+            for r in cur.execute("""
+                SELECT fingerprint_id
+                FROM employees
+                WHERE shift_default = ?
+                  AND fingerprint_id IS NOT NULL
+                  AND TRIM(fingerprint_id) != ''
+            """, (SHIFT,)).fetchall()
+        }
+
+        # tabel utama + arsip bulanan (reset processed = 0 tidak sampai arsip)
+        keys = sorted({
+            (fingerprint_id, TANGGAL)
+            for fingerprint_id, _, _ in raw_scans(conn, TANGGAL, TANGGAL)
+            if fingerprint_id in fingerprints
+        })
+
         cur.execute("""
             DELETE FROM attendance_daily
             WHERE work_date = ?
@@ -19,35 +39,23 @@ def main():
         """, (TANGGAL, SHIFT))
         deleted_daily = cur.rowcount
 
-        cur.execute("""
-            UPDATE attendance_raw
-            SET processed = 0
-            WHERE tanggal = ?
-              AND fingerprint_id IN (
-                  SELECT fingerprint_id
-                  FROM employees
-                  WHERE shift_default = ?
-                    AND fingerprint_id IS NOT NULL
-                    AND TRIM(fingerprint_id) != ''
-              )
-        """, (TANGGAL, SHIFT))
-        reset_raw = cur.rowcount
-
         conn.commit()
 
-        print("=== RESET SELESAI ===")
-        print(f"Tanggal      : {TANGGAL}")
-        print(f"Shift        : {SHIFT}")
-        print(f"Daily hapus  : {deleted_daily}")
-        print(f"Raw di-reset : {reset_raw}")
-        print("Silakan jalankan processor.py lagi.")
-
     except Exception as e:
         conn.rollback()
         print("Gagal:", e)
+        return
 
     finally:
         conn.close()
 
+    process_attendance(keys=keys)
+
+    print("=== PROSES ULANG SELESAI ===")
+    print(f"Tanggal      : {TANGGAL}")
+    print(f"Shift        : {SHIFT}")
+    print(f"Daily hapus  : {deleted_daily}")
+    print(f"Karyawan     : {len(keys)}")
+
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()